@@ -5,6 +5,7 @@ from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from typing import Set, Dict, List
 from collections import defaultdict
+from league_db import get_league_db_path, CODED_COLUMNS
 
 def setup_logging():
     """Konfigurerer logging med rotation"""
@@ -71,6 +72,34 @@ def get_unique_actions(db_path: str) -> Dict[str, Set[str]]:
         logging.error(f"Uventet fejl ved behandling af {db_path}: {str(e)}")
         return unique_values
 
+def get_league_value_counts(db_path: str) -> Dict[str, Dict[str, int]]:
+    """Antal kampe hver værdi af Action_1, Position og Action_2 findes i, fra den samlede database"""
+    value_counts = {
+        'Action_1': {},
+        'Position': {},
+        'Action_2': {}
+    }
+    
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        
+        # Der grupperes på heltalskoderne og slås op i opslagstabellen bagefter
+        for column in ['Action_1', 'Position', 'Action_2']:
+            code_column, table, key = CODED_COLUMNS[column]
+            cursor.execute(f"""
+                SELECT d.name, counts.matches
+                FROM (
+                    SELECT {code_column} AS code, COUNT(DISTINCT match_id) AS matches
+                    FROM events
+                    WHERE {code_column} IS NOT NULL
+                    GROUP BY {code_column}
+                ) counts
+                JOIN {table} d ON d.{key} = counts.code
+            """)
+            value_counts[column] = dict(cursor.fetchall())
+    
+    return value_counts
+
 def analyze_all_databases():
     """Analyserer alle databaser i Databases mappen"""
     setup_logging()
@@ -98,6 +127,15 @@ def analyze_all_databases():
     processed_dbs = 0
     db_files = [f for f in os.listdir(databases_dir) if f.endswith('.db')]
     
+    # Findes den samlede database, er optællingen én forespørgsel pr. kolonne
+    league_db_path = get_league_db_path(databases_dir)
+    if os.path.exists(league_db_path):
+        logging.info(f"Analyserer den samlede database: {league_db_path}")
+        db_files = []
+        for category, counts in get_league_value_counts(league_db_path).items():
+            all_unique_values[category].update(counts)
+            value_counts[category].update(counts)
+    
     for db_file in db_files:
         db_path = os.path.join(databases_dir, db_file)
         logging.info(f"Analyserer database: {db_file}")
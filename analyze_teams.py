@@ -5,6 +5,7 @@ from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from typing import Set, Dict, Tuple
 from pathlib import Path
+from league_db import get_league_db_path
 
 # Custom exceptions
 class TeamAnalysisError(Exception):
@@ -78,6 +79,32 @@ def get_team_initials_from_db(db_path: str) -> Set[str]:
         logging.error(f"Database fejl for {db_path}: {str(e)}")
         return set()
 
+def get_league_team_initials(db_path: str) -> Dict[str, Set[str]]:
+    """Team_initials for hver kampdatabase fra den samlede database i én forespørgsel"""
+    team_initials = {}
+    try:
+        with sqlite3.connect(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT m.database, t.name
+                FROM (
+                    SELECT DISTINCT match_id, team_id
+                    FROM events
+                    WHERE team_id IS NOT NULL
+                ) e
+                JOIN matches m ON m.match_id = e.match_id
+                JOIN teams t ON t.team_id = e.team_id
+            """)
+            
+            for db_file, initial in cursor.fetchall():
+                team_initials.setdefault(db_file, set()).add(initial)
+                
+        return team_initials
+        
+    except sqlite3.Error as e:
+        logging.error(f"Database fejl for {db_path}: {str(e)}")
+        return {}
+
 def analyze_teams():
     """Analyserer alle hold på tværs af databaser"""
     setup_logging()
@@ -94,6 +121,14 @@ def analyze_teams():
     team_mapping = {}          # Mapper team_initials til fulde navne
     
     db_files = [f for f in os.listdir(databases_dir) if f.endswith('.db')]
+    
+    # Findes den samlede database, hentes alle kampes hold i én forespørgsel
+    league_initials = None
+    league_db_path = get_league_db_path(databases_dir)
+    if os.path.exists(league_db_path):
+        logging.info(f"Bruger den samlede database: {league_db_path}")
+        league_initials = get_league_team_initials(league_db_path)
+        db_files = sorted(league_initials)
     logging.info(f"Fundet {len(db_files)} databaser at analysere")
     
     # Gennemgå hver database
@@ -109,7 +144,10 @@ def analyze_teams():
                 all_team_names.add(away_team)
             
             # Hent team initials fra databasen
-            db_team_initials = get_team_initials_from_db(db_path)
+            if league_initials is not None:
+                db_team_initials = league_initials[db_file]
+            else:
+                db_team_initials = get_team_initials_from_db(db_path)
             all_team_initials.update(db_team_initials)
             
             # Forsøg at mappe initials til fulde navne
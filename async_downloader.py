@@ -0,0 +1,218 @@
+import os
+import time
+import hashlib
+import asyncio
+import logging
+import tempfile
+from urllib.parse import urlsplit
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+import aiohttp
+from rate_limiter import parse_retry_after
+from download_manifest import get_conditional_headers, get_previous_sha256, record_response
+
+# Samtidige forbindelser pr. host og i alt - forbindelserne genbruges med keep-alive
+PER_HOST_LIMIT = int(os.getenv("SCRAPER_PER_HOST", "4"))
+TOTAL_LIMIT = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "16"))
+KEEPALIVE_SECONDS = 30
+
+# Tid mellem starten af to forespørgsler til samme host. Intervallet starter ved
+# MIN_INTERVAL, fordobles når serveren svarer 429/5xx (eller venter Retry-After)
+# og skrumper igen langsomt ved succes. Det er den tilpassede pacing der skåner
+# sitet, ikke en fast pause: 0.25 sekunder er højst 4 forespørgsler i sekundet til
+# samme host, så en sæson på ~180 rapporter tager under et minut mod 3 minutter
+# med den gamle sleep(1) løkke, og beder serveren os sænke farten, gør vi det.
+# SCRAPER_HOST_INTERVALS sætter intervallet pr. host, fx "tophaandbold.dk=1,127.0.0.1=0"
+MIN_INTERVAL = float(os.getenv("SCRAPER_MIN_INTERVAL", "0.25"))
+MAX_INTERVAL = 30.0
+INTERVAL_DECREASE = 0.9
+
+# Svar der betyder "prøv igen senere"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 4
+
+CHUNK_BYTES = 64 * 1024
+REQUEST_TIMEOUT_SECONDS = 60
+
+# Pacing tilstand pr. host for den aktuelle kørsel
+_hosts: Dict[str, Dict] = {}
+
+
+def parse_host_intervals(value: str) -> Dict[str, float]:
+    """Læser SCRAPER_HOST_INTERVALS ("host=sekunder,host=sekunder") - ugyldige par logges og springes over"""
+    intervals = {}
+    for pair in filter(None, (part.strip() for part in value.split(','))):
+        host, _, seconds = pair.partition('=')
+        try:
+            intervals[host.strip().lower()] = float(seconds)
+        except ValueError:
+            logging.warning(f"Ugyldigt interval i SCRAPER_HOST_INTERVALS: {pair}")
+    return intervals
+
+
+HOST_INTERVALS = parse_host_intervals(os.getenv("SCRAPER_HOST_INTERVALS", ""))
+
+
+def get_min_interval(host: str) -> float:
+    """Det mindste interval for en host (evt. med port) - fra SCRAPER_HOST_INTERVALS eller MIN_INTERVAL"""
+    host = host.lower()
+    return HOST_INTERVALS.get(host, HOST_INTERVALS.get(host.rsplit(':', 1)[0], MIN_INTERVAL))
+
+
+def _host_state(host: str) -> Dict:
+    """Henter eller opretter pacing tilstanden for en host"""
+    if host not in _hosts:
+        min_interval = get_min_interval(host)
+        _hosts[host] = {'min_interval': min_interval, 'interval': min_interval, 'next_start': 0.0, 'throttled': 0}
+    return _hosts[host]
+
+
+async def wait_for_slot(host: str):
+    """
+    Venter til næste ledige starttidspunkt for hosten.
+
+    Tidspunktet tjekkes igen efter hver ventetid, så en pause eller et større
+    interval efter et 429 svar også gælder downloads der allerede venter.
+    """
+    state = _host_state(host)
+    while True:
+        now = time.monotonic()
+        if now >= state['next_start']:
+            state['next_start'] = now + state['interval']
+            return
+        await asyncio.sleep(state['next_start'] - now)
+
+
+def report_host_success(host: str):
+    """Sænker intervallet lidt efter et vellykket svar"""
+    state = _host_state(host)
+    state['interval'] = max(state['min_interval'], state['interval'] * INTERVAL_DECREASE)
+
+
+def report_host_throttled(host: str, retry_after: Optional[float] = None):
+    """Fordobler intervallet og udskyder hostens næste forespørgsel, evt. til Retry-After"""
+    state = _host_state(host)
+    # Et interval på 0 (en lokal server) skal også kunne fordobles
+    state['interval'] = min(MAX_INTERVAL, max(state['interval'] * 2, 0.1))
+    state['throttled'] += 1
+    pause = retry_after if retry_after is not None else state['interval']
+    state['next_start'] = max(state['next_start'], time.monotonic() + pause)
+    logging.info(f"{host} beder os sænke farten - venter {pause:.2f} sekunder, "
+                 f"interval nu {state['interval']:.2f} sekunder")
+
+
+async def stream_to_file(response: aiohttp.ClientResponse, filepath: str) -> Tuple[int, str]:
+    """
+    Skriver svaret til en midlertidig fil i samme mappe og omdøber den til sidst.
+
+    os.replace er atomisk, så filepath enten er den gamle eller den nye komplette
+    version - en afbrudt download efterlader aldrig en halv PDF.
+
+    Returns:
+        Tuple[int, str]: Antal skrevne bytes og SHA-256 af indholdet
+    """
+    folder, filename = os.path.split(filepath)
+    fd, temp_path = tempfile.mkstemp(dir=folder or '.', prefix=f".{filename}.", suffix='.part')
+    written = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async for chunk in response.content.iter_chunked(CHUNK_BYTES):
+                f.write(chunk)
+                digest.update(chunk)
+                written += len(chunk)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return written, digest.hexdigest()
+
+
+async def download_file(session: aiohttp.ClientSession, url: str, filepath: str,
+                        manifest: Dict[str, Dict]) -> str:
+    """
+    Downloader én fil med betinget GET, pacing og genforsøg.
+
+    Args:
+        manifest (Dict[str, Dict]): Download manifestet - opdateres når filen hentes
+
+    Returns:
+        str: 'downloaded' (ny eller ændret), 'unchanged' eller 'failed'
+    """
+    filename = os.path.basename(filepath)
+    host = urlsplit(url).netloc
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        await wait_for_slot(host)
+        try:
+            async with session.get(url, headers=get_conditional_headers(manifest, url, filepath)) as response:
+                if response.status == 304:
+                    report_host_success(host)
+                    logging.debug(f"Uændret: {filename}")
+                    return 'unchanged'
+                if response.status in RETRY_STATUSES:
+                    logging.warning(f"{url} svarede {response.status} (forsøg {attempt}/{MAX_ATTEMPTS})")
+                    report_host_throttled(host, parse_retry_after(response.headers.get('Retry-After')))
+                    continue
+                response.raise_for_status()
+                previous_sha256 = get_previous_sha256(manifest, url, filepath)
+                size, sha256 = await stream_to_file(response, filepath)
+                record_response(manifest, url, response.headers, filepath, size, sha256)
+            report_host_success(host)
+            if sha256 == previous_sha256:
+                logging.info(f"Hentet igen men uændret: {filename}")
+                return 'unchanged'
+            logging.info(f"Gemt fil: {filename} ({size} bytes)")
+            return 'downloaded'
+        except aiohttp.ClientResponseError as e:
+            # 404 og lignende ændrer sig ikke ved at prøve igen
+            logging.error(f"Fejl ved download af {url}: {str(e)}")
+            return 'failed'
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Fejl ved download af {url} (forsøg {attempt}/{MAX_ATTEMPTS}): {str(e)}")
+            report_host_throttled(host)
+
+    logging.error(f"Opgiver download af {url} efter {MAX_ATTEMPTS} forsøg")
+    return 'failed'
+
+
+async def download_files_async(jobs: List[Tuple[str, str]], manifest: Dict[str, Dict],
+                               headers: Optional[Dict] = None, per_host: int = PER_HOST_LIMIT,
+                               total: int = TOTAL_LIMIT,
+                               on_result: Optional[Callable[[str, str, str], Awaitable]] = None) -> Dict[str, str]:
+    """
+    Downloader alle (url, filsti) par samtidigt over én fælles forbindelsespulje.
+
+    Args:
+        jobs (List[Tuple[str, str]]): URL og destination for hver fil
+        manifest (Dict[str, Dict]): Download manifestet - bruges til betinget GET og opdateres
+        headers (Optional[Dict]): Headers der sendes med alle forespørgsler
+        per_host (int): Maksimalt antal samtidige forbindelser pr. host
+        total (int): Maksimalt antal samtidige forbindelser i alt
+        on_result: Kaldes med (url, filsti, udfald) så snart en fil er færdig, fx for at
+            sende den videre i pipeline.py. Venter den, venter kun den ene download
+
+    Returns:
+        Dict[str, str]: Udfaldet for hver filsti ('downloaded', 'unchanged', 'failed')
+    """
+    _hosts.clear()
+    connector = aiohttp.TCPConnector(limit=total, limit_per_host=per_host, keepalive_timeout=KEEPALIVE_SECONDS)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout) as session:
+        async def download_and_report(url: str, filepath: str) -> str:
+            result = await download_file(session, url, filepath, manifest)
+            if on_result is not None:
+                await on_result(url, filepath, result)
+            return result
+
+        results = await asyncio.gather(*(download_and_report(url, filepath) for url, filepath in jobs))
+
+    throttled = sum(state['throttled'] for state in _hosts.values())
+    if throttled:
+        logging.info(f"Serveren bad os sænke farten {throttled} gange")
+    return {filepath: result for (_, filepath), result in zip(jobs, results)}
+
+
+def download_files(jobs: List[Tuple[str, str]], manifest: Dict[str, Dict], headers: Optional[Dict] = None,
+                   per_host: int = PER_HOST_LIMIT, total: int = TOTAL_LIMIT) -> Dict[str, str]:
+    """Synkron indgang til download_files_async"""
+    return asyncio.run(download_files_async(jobs, manifest, headers, per_host, total))
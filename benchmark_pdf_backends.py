@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Dict, List
+from pdf import iter_pdf_pages, available_backends, PDF_BACKENDS
+from parse_events import split_event_lines
+
+
+def get_event_lines(text: str) -> List[str]:
+    """Hændelseslinjerne i en rapport - det der faktisk parses videre"""
+    _, event_lines = split_event_lines('\n' + text)
+    return event_lines
+
+
+def benchmark_backend(backend: str, pdf_paths: List[str]) -> Dict:
+    """
+    Udtrækker alle PDF'er med én backend.
+
+    Returns:
+        Dict: Samlet tid, antal sider, fejl og hændelseslinjerne pr. fil
+    """
+    pages = 0
+    seconds = 0.0
+    errors = {}
+    event_lines = {}
+    for pdf_path in pdf_paths:
+        started = time.perf_counter()
+        try:
+            page_texts = list(iter_pdf_pages(pdf_path, backend))
+        except Exception as e:
+            errors[os.path.basename(pdf_path)] = str(e)
+            continue
+        seconds += time.perf_counter() - started
+        pages += len(page_texts)
+        event_lines[os.path.basename(pdf_path)] = get_event_lines(''.join(page + '\n' for page in page_texts))
+
+    return {'pages': pages, 'seconds': seconds, 'errors': errors, 'event_lines': event_lines}
+
+
+def compare_event_lines(reference: Dict[str, List[str]], candidate: Dict[str, List[str]]) -> Dict:
+    """Tæller filer hvor hændelseslinjerne er identiske med referencen og gemmer første forskel"""
+    identical = 0
+    differences = {}
+    for pdf_file, lines in candidate.items():
+        if pdf_file not in reference:
+            continue
+        if lines == reference[pdf_file]:
+            identical += 1
+            continue
+        first = next(
+            (index for index, (a, b) in enumerate(zip(reference[pdf_file], lines)) if a != b),
+            min(len(lines), len(reference[pdf_file]))
+        )
+        differences[pdf_file] = {
+            'line': first,
+            'reference': reference[pdf_file][first] if first < len(reference[pdf_file]) else None,
+            'backend': lines[first] if first < len(lines) else None,
+            'reference_lines': len(reference[pdf_file]),
+            'backend_lines': len(lines)
+        }
+    return {'identical': identical, 'compared': len(candidate), 'differences': differences}
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Sammenligner hastighed og output for PDF backends")
+    parser.add_argument('--pdf-dir', default='Processed', help="Mappe med PDF-filer (standard: Processed)")
+    parser.add_argument('--backends', nargs='+', choices=list(PDF_BACKENDS), default=None,
+                        help="Backends der skal testes (standard: alle installerede)")
+    parser.add_argument('--reference', default='pypdf2', help="Backend de andre sammenlignes med")
+    parser.add_argument('--limit', type=int, default=None, help="Brug kun de første N filer")
+    parser.add_argument('--output', default=None, help="Skriv resultatet som JSON til denne fil")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+
+    pdf_paths = sorted(
+        os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith('.pdf')
+    )[:args.limit]
+    if not pdf_paths:
+        logging.error(f"Ingen PDF-filer fundet i {args.pdf_dir}")
+        sys.exit(1)
+
+    installed = available_backends()
+    backends = [backend for backend in (args.backends or list(PDF_BACKENDS)) if backend in installed]
+    missing = [backend for backend in (args.backends or list(PDF_BACKENDS)) if backend not in installed]
+    if missing:
+        logging.warning(f"Springer over backends der ikke er installeret: {', '.join(missing)}")
+    if args.reference not in backends:
+        backends.insert(0, args.reference)
+
+    results = {}
+    for backend in backends:
+        logging.info(f"Udtrækker {len(pdf_paths)} filer med {backend}")
+        results[backend] = benchmark_backend(backend, pdf_paths)
+
+    reference_lines = results[args.reference]['event_lines']
+    report = {}
+    print(f"\n{len(pdf_paths)} filer, reference: {args.reference}")
+    print(f"{'backend':12}{'sider':>8}{'sek':>10}{'sider/sek':>12}{'fejl':>6}{'identiske':>12}")
+    for backend, result in results.items():
+        comparison = compare_event_lines(reference_lines, result['event_lines'])
+        pages_per_second = result['pages'] / result['seconds'] if result['seconds'] else 0.0
+        print(f"{backend:12}{result['pages']:>8}{result['seconds']:>10.2f}{pages_per_second:>12.1f}"
+              f"{len(result['errors']):>6}{comparison['identical']:>7}/{comparison['compared']:<4}")
+        for pdf_file, difference in list(comparison['differences'].items())[:3]:
+            print(f"    {pdf_file} linje {difference['line']}: "
+                  f"{difference['reference']!r} != {difference['backend']!r}")
+        report[backend] = {
+            'pages': result['pages'],
+            'seconds': round(result['seconds'], 3),
+            'pages_per_second': round(pages_per_second, 1),
+            'errors': result['errors'],
+            'identical_files': comparison['identical'],
+            'compared_files': comparison['compared'],
+            'differences': comparison['differences']
+        }
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResultat gemt i {args.output}")
@@ -0,0 +1,192 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from typing import Dict, List
+from mock_deepseek_server import start_mock_server, stop_mock_server, DEFAULT_CONFIG, DEFAULT_RECORDINGS
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Returnerer percentilen (0-1) af en liste med lineær interpolation"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(
+        description="Kører process_pdf_files mod en lokal DeepSeek stand-in og måler pipelinen"
+    )
+    parser.add_argument('--pdf-dir', default='Processed', help="Mappe med PDF-filer der bruges som input")
+    parser.add_argument('--mode', choices=['replay', 'record', 'synthetic'], default='replay')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS)
+    parser.add_argument('--latency-base-ms', type=float, default=DEFAULT_CONFIG['latency_base_ms'])
+    parser.add_argument('--latency-per-token-ms', type=float, default=DEFAULT_CONFIG['latency_per_token_ms'])
+    parser.add_argument('--latency-sigma', type=float, default=DEFAULT_CONFIG['latency_sigma'])
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--server-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--async', dest='async_mode', action='store_true')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--no-parser', dest='use_parser', action='store_false',
+                        help="Send alle sektioner til API'et i stedet for kun ukendte linjer")
+    parser.add_argument('--chunk-strategy', choices=['tokens', 'fixed'], default=None)
+    parser.add_argument('--response-format', choices=['verbose', 'compact', 'both'], default='verbose',
+                        help="Svarformat fra DeepSeek - 'both' kører begge og sammenligner tokens")
+    parser.add_argument('--with-cache', action='store_true', help="Brug LLM cachen under målingen")
+    parser.add_argument('--output', default=None, help="Skriv rapporten som JSON til denne fil")
+    parser.add_argument('--keep-workdir', action='store_true')
+    return parser.parse_args()
+
+
+def run_benchmark(args: argparse.Namespace, response_format: str = 'verbose') -> Dict:
+    """Starter stand-in serveren, kører hele PDF -> SQLite forløbet og samler målinger"""
+    source_dir = os.path.abspath(args.pdf_dir)
+    pdf_files = [f for f in os.listdir(source_dir) if f.lower().endswith('.pdf')]
+    if not pdf_files:
+        raise ValueError(f"Ingen PDF-filer fundet i {source_dir}")
+
+    server, base_url = start_mock_server(config={
+        'mode': args.mode,
+        'recordings_path': os.path.abspath(args.recordings),
+        'latency_base_ms': args.latency_base_ms,
+        'latency_per_token_ms': args.latency_per_token_ms,
+        'latency_sigma': args.latency_sigma,
+        'rate_limit_rate': args.rate_limit_rate,
+        'server_error_rate': args.server_error_rate,
+        'seed': args.seed
+    })
+
+    # Miljøet skal sættes før process_output importeres, da klienten oprettes ved import
+    os.environ['DEEPSEEK_BASE_URL'] = base_url
+    # I record tilstand bruges den rigtige nøgle til videresendelse, ellers er enhver nøgle god nok
+    os.environ.setdefault('DEEPSEEK_API_KEY', 'mock-key')
+    if not args.with_cache:
+        os.environ['LLM_CACHE'] = '0'
+    if args.chunk_strategy:
+        os.environ['CHUNK_STRATEGY'] = args.chunk_strategy
+
+    import process_output
+    from pipeline_metrics import get_run_metrics
+
+    # Ved --response-format both er modulet allerede importeret med den første, nu stoppede server
+    process_output.DEEPSEEK_BASE_URL = base_url
+    process_output.client = process_output.init_api_client()
+    process_output.async_client = None
+
+    work_dir = tempfile.mkdtemp(prefix='handball_bench_')
+    original_dir = os.getcwd()
+
+    try:
+        os.makedirs(os.path.join(work_dir, process_output.NOT_PROCESSED_DIR))
+        for pdf_file in pdf_files:
+            shutil.copy2(os.path.join(source_dir, pdf_file),
+                         os.path.join(work_dir, process_output.NOT_PROCESSED_DIR, pdf_file))
+        os.chdir(work_dir)
+
+        started = time.perf_counter()
+        process_output.process_pdf_files(use_parser=args.use_parser, async_mode=args.async_mode,
+                                         concurrency=args.concurrency, response_format=response_format)
+        wall_seconds = time.perf_counter() - started
+    finally:
+        os.chdir(original_dir)
+        stop_mock_server(server)
+        if args.keep_workdir:
+            logging.info(f"Arbejdsmappe bevaret: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    stats = server.stats
+    latencies = stats['latencies']
+    metrics = get_run_metrics()
+    stages = metrics['totals']['stages']
+    sections = metrics['totals']['counters'].get('sections', 0)
+    return {
+        'files': len(pdf_files),
+        'sections': sections,
+        'wall_seconds': round(wall_seconds, 3),
+        'sections_per_second': round(sections / wall_seconds, 2) if wall_seconds else 0.0,
+        'api_requests': stats['requests'],
+        'api_latency_p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'api_latency_p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'rate_limited': stats['rate_limited'],
+        'server_errors': stats['server_errors'],
+        'responses': {source: stats[source] for source in ('replay', 'record', 'synthetic')},
+        'prompt_tokens': stats['prompt_tokens'],
+        'completion_tokens': stats['completion_tokens'],
+        'completion_tokens_per_request': round(stats['completion_tokens'] / max(1, len(latencies)), 1),
+        'seconds_per_section': round(wall_seconds / sections, 3) if sections else 0.0,
+        'db_write_seconds': round(stages.get('db_write', 0.0), 4),
+        'stage_seconds': stages,
+        'settings': {
+            'mode': args.mode,
+            'response_format': response_format,
+            'async': args.async_mode,
+            'concurrency': args.concurrency,
+            'use_parser': args.use_parser,
+            'chunk_strategy': os.getenv('CHUNK_STRATEGY', 'tokens'),
+            'with_cache': args.with_cache
+        }
+    }
+
+
+def print_report(report: Dict):
+    """Skriver rapporten til konsollen"""
+    print("\n=== Pipeline benchmark ===")
+    print(f"Filer:               {report['files']}")
+    print(f"Sektioner:           {report['sections']}")
+    print(f"Samlet tid:          {report['wall_seconds']} s")
+    print(f"Sektioner/sek:       {report['sections_per_second']}")
+    print(f"API kald:            {report['api_requests']} "
+          f"(429: {report['rate_limited']}, 500: {report['server_errors']})")
+    print(f"API latens p50/p95:  {report['api_latency_p50_ms']} / {report['api_latency_p95_ms']} ms")
+    print(f"Tokens (prompt/svar): {report['prompt_tokens']} / {report['completion_tokens']}")
+    print(f"DB skrivetid:        {report['db_write_seconds']} s")
+    stages = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in report['stage_seconds'].items())
+    print(f"Tid pr. trin (sum):  {stages}")
+
+
+def print_format_comparison(reports: Dict[str, Dict]):
+    """Sammenligner genererede tokens og tid pr. sektion mellem svarformaterne"""
+    verbose, compact = reports['verbose'], reports['compact']
+    print("\n=== Svarformat: verbose vs compact ===")
+    print(f"{'':28}{'verbose':>12}{'compact':>12}{'ændring':>10}")
+    for label, key in (('Output tokens i alt', 'completion_tokens'),
+                       ('Output tokens pr. kald', 'completion_tokens_per_request'),
+                       ('Sekunder pr. sektion', 'seconds_per_section'),
+                       ('API latens p50 (ms)', 'api_latency_p50_ms')):
+        before, after = verbose[key], compact[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "-"
+        print(f"{label:28}{before:>12}{after:>12}{change:>10}")
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    formats = ['verbose', 'compact'] if args.response_format == 'both' else [args.response_format]
+    reports = {}
+    try:
+        for response_format in formats:
+            reports[response_format] = run_benchmark(args, response_format)
+    except Exception as e:
+        logging.error(f"Benchmark fejlede: {str(e)}", exc_info=True)
+        sys.exit(1)
+
+    for response_format, format_report in reports.items():
+        print(f"\n[{response_format}]")
+        print_report(format_report)
+    if len(reports) > 1:
+        print_format_comparison(reports)
+    report = reports if len(reports) > 1 else reports[formats[0]]
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nRapport gemt i {args.output}")
@@ -2,6 +2,7 @@ import sqlite3
 import os
 import glob
 from update_match_data import get_final_score, get_team_initials, get_team_players
+from db_schema import ensure_schema
 
 def get_team_name(cursor, team_initial):
     cursor.execute('SELECT official_name FROM team_mapping WHERE team_initial = ?', (team_initial,))
@@ -50,6 +51,7 @@ def clean_database(db_path):
         ''')
         
         # Brug update_match_data.py funktioner til at beregne data
+        ensure_schema(cursor)
         home_score, away_score = get_final_score(cursor)
         home_team, away_team = get_team_initials(cursor)
         
@@ -0,0 +1,70 @@
+from typing import Dict, List, Optional
+
+# Kolonnernes rækkefølge i det kompakte format - samme felter som det udførlige format
+COMPACT_FIELDS = [
+    "Time",
+    "ScoreUpdate",
+    "TeamInitials",
+    "Action1",
+    "Position",
+    "PlayerNumber",
+    "PlayerName",
+    "Action2",
+    "Player2Number",
+    "Player2Name",
+    "GoalkeeperNumber",
+    "GoalkeeperName"
+]
+
+
+def encode_events(events: List[Dict]) -> Dict:
+    """
+    Pakker begivenheder som positionelle rækker i COMPACT_FIELDS rækkefølgen.
+
+    Header rækken står i system prompten og gentages ikke i svaret. Tomme felter
+    i slutningen af en række udelades, tomme felter midt i en række skrives som "".
+    """
+    rows = []
+    for event in events:
+        row = [event.get(field) or "" for field in COMPACT_FIELDS]
+        while row and row[-1] == "":
+            row.pop()
+        rows.append(row)
+    return {"rows": rows}
+
+
+def decode_row(columns: List[str], row) -> Optional[Dict]:
+    """Mapper en positionel række tilbage til et event dictionary uden tomme felter"""
+    if isinstance(row, dict):
+        return row
+    if not isinstance(row, list):
+        return None
+
+    event = {}
+    for field, value in zip(columns, row):
+        if value is None or value == "":
+            continue
+        # Modellen skriver af og til numre uden anførselstegn i arrays
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = str(value)
+        event[field] = value
+    return event
+
+
+def decode_events(parsed_data: Dict) -> List:
+    """
+    Returnerer begivenhederne fra et svar i enten kompakt eller udførligt format.
+
+    Det kompakte format genkendes på "rows". Sender modellen alligevel en
+    "columns" header med, bruges den i stedet for COMPACT_FIELDS. Rækker der
+    ikke kan mappes returneres uændret, så validate_event kan afvise og logge dem.
+    """
+    if "rows" not in parsed_data:
+        return parsed_data.get("events", [])
+
+    columns = parsed_data.get("columns") or COMPACT_FIELDS
+    events = []
+    for row in parsed_data.get("rows") or []:
+        event = decode_row(columns, row)
+        events.append(event if event is not None else row)
+    return events
@@ -0,0 +1,149 @@
+import sqlite3
+import os
+import time
+import logging
+from typing import Iterable, List, Optional, Set, Tuple
+
+FRONTIER_FILE = 'crawl_frontier.db'
+
+# En URL der har fejlet så mange gange, opgives indtil næste --recheck
+MAX_ATTEMPTS = 5
+
+
+def open_frontier(download_folder: str) -> sqlite3.Connection:
+    """
+    Åbner crawlerens frontier og opretter tabellerne hvis de mangler.
+
+    frontier indeholder alle kendte URL'er - kampprogrammer (kind='program') og
+    PDF'er (kind='pdf') - med status, så en afbrudt crawl kan fortsætte hvor den
+    slap, og samme URL aldrig står der to gange.
+    """
+    conn = sqlite3.connect(os.path.join(download_folder, FRONTIER_FILE), timeout=30)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS frontier (
+        url TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        tournament TEXT,
+        season TEXT,
+        parent_url TEXT,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        discovered_at REAL NOT NULL,
+        fetched_at REAL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_frontier_kind_status ON frontier(kind, status)')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS crawl_state (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )
+    ''')
+    conn.commit()
+    return conn
+
+
+def start_crawl(conn: sqlite3.Connection, recheck: bool = False) -> bool:
+    """
+    Starter en crawl eller fortsætter en afbrudt.
+
+    En ny crawl sætter alle kampprogrammer til 'pending', så de hentes igen
+    (betinget, så uændrede sider koster et 304). PDF'er der er hentet, forbliver
+    'done' medmindre recheck er sat - de sættes kun til 'pending' igen når den
+    side de står på har ændret sig.
+
+    Returns:
+        bool: True hvis en afbrudt crawl fortsættes
+    """
+    row = conn.execute("SELECT value FROM crawl_state WHERE key = 'in_progress'").fetchone()
+    resuming = row is not None and row[0] == '1'
+    if resuming:
+        pending = conn.execute("SELECT COUNT(*) FROM frontier WHERE status = 'pending'").fetchone()[0]
+        logging.info(f"Fortsætter afbrudt crawl med {pending} ventende URL'er")
+    else:
+        conn.execute("UPDATE frontier SET status = 'pending', attempts = 0 WHERE kind = 'program'")
+        if recheck:
+            conn.execute("UPDATE frontier SET status = 'pending', attempts = 0 WHERE kind = 'pdf'")
+        else:
+            # Fejlede PDF'er får nye forsøg i hver crawl
+            conn.execute("UPDATE frontier SET status = 'pending', attempts = 0 "
+                         "WHERE kind = 'pdf' AND status = 'failed'")
+    conn.execute("INSERT OR REPLACE INTO crawl_state (key, value) VALUES ('in_progress', '1')")
+    conn.commit()
+    return resuming
+
+
+def finish_crawl(conn: sqlite3.Connection):
+    """Markerer crawlen som afsluttet, så næste kørsel starter forfra"""
+    conn.execute("INSERT OR REPLACE INTO crawl_state (key, value) VALUES ('in_progress', '0')")
+    conn.commit()
+
+
+def add_urls(conn: sqlite3.Connection, urls: Iterable[str], kind: str, tournament: Optional[str] = None,
+             season: Optional[str] = None, parent_url: Optional[str] = None, reset: bool = False) -> int:
+    """
+    Tilføjer URL'er til frontieren. Kendte URL'er tilføjes ikke igen.
+
+    Args:
+        reset (bool): Sæt allerede kendte URL'er tilbage til 'pending' (fx når siden de står på er ændret)
+
+    Returns:
+        int: Antal URL'er der ikke var kendt i forvejen
+    """
+    now = time.time()
+    before = conn.total_changes
+    rows = [(url, kind, tournament, season, parent_url, now) for url in urls]
+    conn.executemany('''
+        INSERT OR IGNORE INTO frontier (url, kind, tournament, season, parent_url, discovered_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    added = conn.total_changes - before
+    if reset:
+        conn.executemany(
+            "UPDATE frontier SET status = 'pending', attempts = 0 WHERE url = ? AND status != 'pending'",
+            [(row[0],) for row in rows]
+        )
+    conn.commit()
+    return added
+
+
+def get_pending(conn: sqlite3.Connection, kind: str) -> List[Tuple[str, Optional[str], Optional[str]]]:
+    """(url, turnering, sæson) for de ventende URL'er af en slags i den rækkefølge de blev fundet"""
+    return conn.execute('''
+        SELECT url, tournament, season FROM frontier
+        WHERE kind = ? AND status = 'pending'
+        ORDER BY discovered_at, rowid
+    ''', (kind,)).fetchall()
+
+
+def get_retried(conn: sqlite3.Connection, kind: str) -> Set[str]:
+    """De ventende URL'er af en slags der har fejlet før i denne crawl"""
+    return {url for (url,) in conn.execute(
+        "SELECT url FROM frontier WHERE kind = ? AND status = 'pending' AND attempts > 0", (kind,))}
+
+
+def mark_done(conn: sqlite3.Connection, urls: Iterable[str]):
+    """Markerer URL'er som hentet"""
+    now = time.time()
+    conn.executemany("UPDATE frontier SET status = 'done', fetched_at = ? WHERE url = ?",
+                     [(now, url) for url in urls])
+    conn.commit()
+
+
+def mark_failed(conn: sqlite3.Connection, urls: Iterable[str]):
+    """Tæller et fejlet forsøg op - URL'en opgives for denne crawl efter MAX_ATTEMPTS forsøg"""
+    conn.executemany('''
+        UPDATE frontier SET attempts = attempts + 1,
+            status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+        WHERE url = ?
+    ''', [(MAX_ATTEMPTS, url) for url in urls])
+    conn.commit()
+
+
+def get_frontier_stats(conn: sqlite3.Connection) -> dict:
+    """Antal URL'er pr. slags og status"""
+    stats = {}
+    for kind, status, count in conn.execute(
+            'SELECT kind, status, COUNT(*) FROM frontier GROUP BY kind, status'):
+        stats[f"{kind}_{status}"] = count
+    return stats
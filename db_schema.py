@@ -0,0 +1,436 @@
+import sqlite3
+import os
+import sys
+import logging
+import argparse
+from contextlib import closing
+from typing import Dict, List, Optional, Set, Tuple
+
+DATABASES_DIR = 'Databases'
+
+# Filer i Databases der ikke er kampdatabaser
+SKIPPED_FILES = {'team_mapping.db'}
+
+
+def time_seconds_sql(column: str = 'Time') -> str:
+    """
+    SQL udtryk der omregner en kamptid i formatet mm.ss (eller mm:ss) til sekunder.
+
+    Samme resultat som parse_events.time_to_seconds, så rækker der backfilles,
+    får samme værdi som rækker der gemmes af save_events_batch.
+    """
+    time = f"REPLACE(TRIM({column}), ':', '.')"
+    return (f"(CAST(SUBSTR({time}, 1, INSTR({time}, '.') - 1) AS INTEGER) * 60 + "
+            f"CAST(SUBSTR({time}, INSTR({time}, '.') + 1) AS INTEGER))")
+
+
+# Aktioner bag de afledte kolonner - samme lister som web interfacets statistik
+SHOT_ACTIONS = ('Mål', 'Mål på straffe', 'Skud reddet', 'Skud forbi', 'Skud på stolpe', 'Skud blokeret')
+GOAL_ACTIONS = ('Mål', 'Mål på straffe')
+SAVE_ACTIONS = ('Skud reddet',)
+PENALTY_ACTIONS = ('Mål på straffe', 'Straffekast forbi', 'Straffekast på stolpe', 'Straffekast reddet')
+
+# En halvleg er 30 minutter - hændelser efter 60 minutter er forlænget spilletid (half = 3)
+HALF_SECONDS = 30 * 60
+
+EVENT_FLAG_COLUMNS = ('is_shot', 'is_goal', 'is_save', 'is_penalty', 'half')
+
+# Tabeller fra tidligere versioner - se drop_obsolete_tables
+OBSOLETE_TABLES = ('ingest_checkpoints',)
+
+# Hændelsens naturlige nøgle i kampdatabasen: tid, hold, aktion, spillernummer og
+# løbenummer blandt ens hændelser i samme sekund. Tomme værdier tæller som '', da
+# et UNIQUE indeks ellers ser alle NULL værdier som forskellige
+EVENT_KEY_COLUMNS = ('time_seconds', "IFNULL(Team_initials, '')", "IFNULL(Action_1, '')", "IFNULL(Player_number, '')")
+EVENT_KEY_SQL = ', '.join(EVENT_KEY_COLUMNS + ('Event_seq',))
+
+# Kolonnerne to hændelser skal have ens for at være den samme hændelse gemt to gange
+EVENT_CONTENT_COLUMNS = (
+    'Time', 'Score_update', 'Team_initials', 'Action_1', 'Position', 'Player_number', 'Player_Name',
+    'Action_2', 'Player2_Number', 'Player2_Name', 'Goalkeeper_Number', 'Goalkeeper_Name'
+)
+
+
+def get_half(time_seconds: Optional[int]) -> Optional[int]:
+    """Halvlegen (1, 2 eller 3 for forlænget spilletid) for en kamptid i sekunder"""
+    if time_seconds is None:
+        return None
+    if time_seconds <= HALF_SECONDS:
+        return 1
+    return 2 if time_seconds <= 2 * HALF_SECONDS else 3
+
+
+def get_event_flags(action_1: Optional[str], time_seconds: Optional[int]) -> Tuple[int, int, int, int, Optional[int]]:
+    """(is_shot, is_goal, is_save, is_penalty, half) for en hændelse - samme værdier som backfill_event_flags"""
+    return (
+        int(action_1 in SHOT_ACTIONS),
+        int(action_1 in GOAL_ACTIONS),
+        int(action_1 in SAVE_ACTIONS),
+        int(action_1 in PENALTY_ACTIONS),
+        get_half(time_seconds)
+    )
+
+
+def _sql_list(values: Tuple[str, ...]) -> str:
+    """Værdierne som en SQL liste til IN"""
+    return '(' + ', '.join("'" + value.replace("'", "''") + "'" for value in values) + ')'
+
+
+def get_columns(cursor: sqlite3.Cursor, table: str) -> Set[str]:
+    """Kolonnenavnene i en tabel"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {column[1] for column in cursor.fetchall()}
+
+
+def ensure_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str) -> bool:
+    """
+    Tilføjer en kolonne til en tabel fra en ældre version hvis den mangler.
+
+    Returns:
+        bool: True hvis kolonnen blev tilføjet
+    """
+    if column in get_columns(cursor, table):
+        return False
+    logging.info(f"Tilføjer {column} kolonne til {table}")
+    cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    return True
+
+
+def backfill_time_seconds(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Udfylder time_seconds for rækker gemt før kolonnen fandtes.
+
+    Returns:
+        int: Antal opdaterede rækker
+    """
+    cursor.execute(f'''
+        UPDATE {table} SET time_seconds = {time_seconds_sql()}
+        WHERE time_seconds IS NULL AND Time IS NOT NULL AND Time != ''
+    ''')
+    return cursor.rowcount
+
+
+def ensure_time_seconds(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Sikrer at kampdatabasens game_events har en udfyldt og indekseret time_seconds kolonne.
+
+    Tidslinjen og "hvilket hold kom først" sorteres på time_seconds, så de
+    bliver et indeks-opslag i stedet for en sortering af TEXT tiden.
+
+    Returns:
+        int: Antal rækker der blev backfillet
+    """
+    ensure_column(cursor, table, 'time_seconds', 'INTEGER')
+    updated = backfill_time_seconds(cursor, table)
+    if updated:
+        logging.info(f"time_seconds udfyldt for {updated} hændelser")
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_time_seconds ON {table}(time_seconds)')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_team_time ON {table}(Team_initials, time_seconds)')
+    return updated
+
+
+def event_flag_sql(time_seconds: str = 'time_seconds') -> Dict[str, str]:
+    """SQL udtrykket bag hver af de afledte kolonner ud fra Action_1 og tiden i sekunder"""
+    return {
+        'is_shot': f"IFNULL(Action_1, '') IN {_sql_list(SHOT_ACTIONS)}",
+        'is_goal': f"IFNULL(Action_1, '') IN {_sql_list(GOAL_ACTIONS)}",
+        'is_save': f"IFNULL(Action_1, '') IN {_sql_list(SAVE_ACTIONS)}",
+        'is_penalty': f"IFNULL(Action_1, '') IN {_sql_list(PENALTY_ACTIONS)}",
+        'half': f"""CASE
+                WHEN {time_seconds} IS NULL THEN NULL
+                WHEN {time_seconds} <= {HALF_SECONDS} THEN 1
+                WHEN {time_seconds} <= {2 * HALF_SECONDS} THEN 2
+                ELSE 3
+            END"""
+    }
+
+
+def backfill_event_flags(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Udfylder de afledte kolonner for rækker gemt før de fandtes.
+
+    Returns:
+        int: Antal opdaterede rækker
+    """
+    assignments = ',\n            '.join(f'{column} = {sql}' for column, sql in event_flag_sql().items())
+    cursor.execute(f'''
+        UPDATE {table} SET
+            {assignments}
+        WHERE is_shot IS NULL
+    ''')
+    return cursor.rowcount
+
+
+def create_legacy_view(cursor: sqlite3.Cursor) -> bool:
+    """
+    Gør en ikke-opgraderet kampdatabase læsbar uden at skrive til den.
+
+    Mangler game_events time_seconds eller de afledte kolonner, oprettes et
+    midlertidigt view med samme navn, der beregner dem ved hver forespørgsel.
+    Viewet findes kun på forbindelsen og skygger for tabellen, så forespørgsler
+    mod game_events virker uændret. Opgraderingen selv sker med db_schema.py.
+
+    Returns:
+        bool: True hvis databasen manglede kolonner og viewet blev oprettet
+    """
+    cursor.execute('PRAGMA table_info(game_events)')
+    columns = [column[1] for column in cursor.fetchall()]
+    if not columns or {'time_seconds', *EVENT_FLAG_COLUMNS} <= set(columns):
+        return False
+    time_seconds = 'time_seconds' if 'time_seconds' in columns else time_seconds_sql()
+    derived = {'time_seconds': time_seconds, **event_flag_sql(time_seconds)}
+    cursor.execute(f'''
+        CREATE TEMP VIEW game_events AS
+        SELECT {', '.join(column for column in columns if column not in derived)},
+            {', '.join(f'{sql} AS {column}' for column, sql in derived.items())}
+        FROM main.game_events
+    ''')
+    return True
+
+
+def ensure_event_flags(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Sikrer at game_events har de afledte kolonner is_shot, is_goal, is_save, is_penalty og half.
+
+    Kolonnerne sættes når hændelsen gemmes, så skud, mål og redninger pr. hold
+    tælles fra de partielle indekser i stedet for at sammenligne Action_1 med
+    lister af tekster i hver række. Kræver time_seconds (ensure_time_seconds).
+
+    Returns:
+        int: Antal rækker der blev backfillet
+    """
+    for column in EVENT_FLAG_COLUMNS:
+        ensure_column(cursor, table, column, 'INTEGER')
+    # Aktioner uden for listerne er 0, så en række der mangler kolonnerne, kendes på NULL
+    updated = backfill_event_flags(cursor, table)
+    if updated:
+        logging.info(f"Afledte kolonner udfyldt for {updated} hændelser")
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_goals_team ON {table}(Team_initials) WHERE is_goal = 1')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_shots_team ON {table}(Team_initials, is_save) WHERE is_shot = 1')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_penalties_team ON {table}(Team_initials, is_goal) '
+                   f'WHERE is_penalty = 1')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_half_team ON {table}(half, Team_initials)')
+    return updated
+
+
+def load_event_sequences(cursor: sqlite3.Cursor, keys: List[Tuple],
+                         table: str = 'game_events') -> Dict[Tuple, List[Tuple[int, Optional[int]]]]:
+    """
+    Henter (Event_seq, Source_line) for de gemte hændelser med hver af nøglerne.
+
+    Nøglerne er (time_seconds, Team_initials, Action_1, Player_number) som i EVENT_KEY_COLUMNS.
+    """
+    existing = {}
+    for key in set(keys):
+        cursor.execute(f'''
+            SELECT Event_seq, Source_line FROM {table}
+            WHERE time_seconds = ? AND IFNULL(Team_initials, '') = ? AND IFNULL(Action_1, '') = ?
+                AND IFNULL(Player_number, '') = ?
+            ORDER BY Event_seq
+        ''', key)
+        existing[key] = cursor.fetchall()
+    return existing
+
+
+def get_event_sequences(keys: List[Tuple], source_lines: Optional[List[Optional[int]]] = None,
+                        existing: Optional[Dict[Tuple, List[Tuple[int, Optional[int]]]]] = None) -> List[int]:
+    """
+    Løbenummeret (Event_seq) for hver hændelse blandt hændelser med samme nøgle.
+
+    En hændelse fra en linje der allerede har rækker med nøglen, genbruger deres numre,
+    så et genforsøg rammer de rækker der allerede er gemt. Øvrige hændelser nummereres
+    efter de gemte rækker (se load_event_sequences), så de ikke overskriver en anden
+    linjes hændelse.
+    """
+    if source_lines is None:
+        source_lines = [None] * len(keys)
+    existing = existing or {}
+    reusable: Dict[Tuple, Dict[Optional[int], List[int]]] = {}
+    next_free: Dict[Tuple, int] = {}
+    for key, rows in existing.items():
+        for sequence, source_line in rows:
+            reusable.setdefault(key, {}).setdefault(source_line, []).append(sequence)
+        next_free[key] = max((sequence + 1 for sequence, _ in rows), default=0)
+    
+    sequences = []
+    for key, source_line in zip(keys, source_lines):
+        own = reusable.get(key, {}).get(source_line)
+        if own:
+            sequences.append(own.pop(0))
+        else:
+            sequences.append(next_free.get(key, 0))
+            next_free[key] = sequences[-1] + 1
+    return sequences
+
+
+def remove_duplicate_events(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Sletter hændelser der er gemt mere end én gang - den først gemte beholdes.
+
+    Ens hændelser kan også være sket to gange, så sletningen køres kun når den
+    vælges eksplicit (db_schema.py --remove-duplicates), og hver slettet række logges.
+
+    Returns:
+        int: Antal slettede rækker
+    """
+    cursor.execute(f'''
+        SELECT rowid, Time, Team_initials, Action_1, Player_number, Player_Name FROM {table}
+        WHERE rowid NOT IN (SELECT MIN(rowid) FROM {table} GROUP BY {', '.join(EVENT_CONTENT_COLUMNS)})
+        ORDER BY rowid
+    ''')
+    duplicates = cursor.fetchall()
+    for rowid, time, team, action, number, name in duplicates:
+        logging.info(f"Sletter dublet (række {rowid}): {time} {team or ''} {action or ''} {number or ''} {name or ''}")
+    cursor.executemany(f'DELETE FROM {table} WHERE rowid = ?', [(row[0],) for row in duplicates])
+    return len(duplicates)
+
+
+def ensure_event_key(cursor: sqlite3.Cursor, table: str = 'game_events') -> int:
+    """
+    Sikrer at game_events har løbenummeret Event_seq og et UNIQUE indeks på den naturlige nøgle.
+
+    Ens hændelser i databaser fra før nøglen beholdes og får hvert sit løbenummer
+    i den rækkefølge de er gemt - de kan være sket flere gange i samme sekund.
+
+    Returns:
+        int: Antal rækker der blev nummereret
+    """
+    ensure_column(cursor, table, 'Event_seq', 'INTEGER')
+    cursor.execute(f'SELECT COUNT(*) FROM {table} WHERE Event_seq IS NULL')
+    unnumbered = cursor.fetchone()[0]
+    if not unnumbered:
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS idx_event_key ON {table}({EVENT_KEY_SQL})')
+        return 0
+
+    # Nummereres forfra, så rækker der allerede har et løbenummer, ikke kolliderer med de nye
+    cursor.execute('DROP INDEX IF EXISTS idx_event_key')
+    cursor.execute(f'''
+        UPDATE {table} SET Event_seq = ranked.seq
+        FROM (
+            SELECT rowid AS id, ROW_NUMBER() OVER (
+                PARTITION BY {', '.join(EVENT_KEY_COLUMNS)}
+                ORDER BY Event_seq IS NULL, Event_seq, rowid
+            ) - 1 AS seq
+            FROM {table}
+        ) AS ranked
+        WHERE ranked.id = {table}.rowid
+    ''')
+    cursor.execute(f'CREATE UNIQUE INDEX idx_event_key ON {table}({EVENT_KEY_SQL})')
+    return unnumbered
+
+
+def drop_obsolete_tables(cursor: sqlite3.Cursor) -> List[str]:
+    """
+    Sletter tabeller fra tidligere versioner, som ikke længere bruges.
+
+    ingest_checkpoints gemte hvilke sektioner der var committed, med en hash af
+    sektionens tekst. report_lines gemmer nu hver committed linje, så en genkørsel
+    kun behandler de linjer der mangler - også når rapporten er ændret undervejs.
+    Tabellen slettes kun hvis den findes, så det sker én gang pr. database.
+
+    Returns:
+        List[str]: De slettede tabeller
+    """
+    cursor.execute(f"SELECT name FROM sqlite_master WHERE type = 'table' AND name IN {_sql_list(OBSOLETE_TABLES)}")
+    dropped = [row[0] for row in cursor.fetchall()]
+    for table in dropped:
+        logging.info(f"Sletter den forældede tabel {table}")
+        cursor.execute(f'DROP TABLE {table}')
+    return dropped
+
+
+def ensure_schema(cursor: sqlite3.Cursor, table: str = 'game_events') -> Dict[str, int]:
+    """
+    Opgraderer en kampdatabases game_events til det aktuelle skema.
+
+    Returns:
+        Dict[str, int]: Antal rækker der blev backfillet pr. ændring
+    """
+    result = {
+        'time_seconds': ensure_time_seconds(cursor, table),
+        'event_flags': ensure_event_flags(cursor, table),
+        'event_seq': ensure_event_key(cursor, table)
+    }
+    # 1 når rækken er standardiseret (af process_output eller standardize_actions.py)
+    ensure_column(cursor, table, 'Standardized', 'INTEGER')
+    cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_unstandardized ON {table}(Standardized) '
+                   f'WHERE Standardized IS NULL')
+    drop_obsolete_tables(cursor)
+    return result
+
+
+def upgrade_database(db_path: str, remove_duplicates: bool = False) -> Dict[str, int]:
+    """
+    Opgraderer én kampdatabase til det aktuelle skema.
+
+    Med remove_duplicates slettes ens hændelser også (se remove_duplicate_events),
+    og er der slettet nogen, komprimeres filen bagefter med VACUUM.
+
+    Returns:
+        Dict[str, int]: Antal rækker der blev backfillet pr. ændring og slettede dubletter
+    """
+    # sqlite3's context manager afslutter kun transaktionen - closing lukker forbindelsen
+    with closing(sqlite3.connect(db_path, timeout=30)) as conn:
+        cursor = conn.cursor()
+        if 'Time' not in get_columns(cursor, 'game_events'):
+            logging.warning(f"{db_path} har ingen game_events tabel - springes over")
+            return {}
+        result = ensure_schema(cursor)
+        result['duplicates'] = remove_duplicate_events(cursor) if remove_duplicates else 0
+        conn.commit()
+        if result['duplicates']:
+            conn.execute('VACUUM')
+    return result
+
+
+def find_match_databases(databases_dir: str = DATABASES_DIR) -> List[str]:
+    """Alle kampdatabaser i mappen sorteret efter navn"""
+    if not os.path.exists(databases_dir):
+        return []
+    return sorted(
+        os.path.join(databases_dir, db_file) for db_file in os.listdir(databases_dir)
+        if db_file.endswith('.db') and db_file not in SKIPPED_FILES
+    )
+
+
+def upgrade_databases(databases_dir: str = DATABASES_DIR, remove_duplicates: bool = False) -> Dict[str, int]:
+    """
+    Opgraderer alle kampdatabaser i mappen.
+
+    Returns:
+        Dict[str, int]: Antal opgraderede og fejlede databaser, backfillede rækker og slettede dubletter
+    """
+    result = {'databases': 0, 'failed': 0, 'rows': 0, 'duplicates': 0}
+    for db_path in find_match_databases(databases_dir):
+        try:
+            changes = upgrade_database(db_path, remove_duplicates)
+        except sqlite3.Error as e:
+            logging.error(f"Kunne ikke opgradere {db_path}: {str(e)}")
+            result['failed'] += 1
+            continue
+        result['databases'] += 1
+        result['duplicates'] += changes.get('duplicates', 0)
+        result['rows'] += sum(value for change, value in changes.items() if change != 'duplicates')
+    return result
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Opgraderer kampdatabaserne til det aktuelle skema")
+    parser.add_argument('--databases-dir', default=DATABASES_DIR,
+                        help="Mappe med kampdatabaserne (standard: Databases)")
+    parser.add_argument('--remove-duplicates', action='store_true',
+                        help="Slet ens hændelser fra tidligere genkørsler (hver slettet række logges)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+    try:
+        result = upgrade_databases(args.databases_dir, args.remove_duplicates)
+    except Exception:
+        logging.error("Kunne ikke opgradere databaserne", exc_info=True)
+        sys.exit(1)
+    logging.info(f"Opgraderet {result['databases']} databaser ({result['failed']} fejlede), "
+                 f"{result['rows']} rækker backfillet, {result['duplicates']} dubletter slettet")
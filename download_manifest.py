@@ -0,0 +1,125 @@
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional
+
+MANIFEST_FILE = 'download_manifest.json'
+CHANGED_FILES = 'changed_files.txt'
+
+
+def get_manifest_path(download_folder: str) -> str:
+    """Stien til manifestet i download mappen"""
+    return os.path.join(download_folder, MANIFEST_FILE)
+
+
+def load_manifest(download_folder: str) -> Dict[str, Dict]:
+    """
+    Indlæser manifestet med URL -> ETag, Last-Modified, størrelse og sha256.
+
+    Returns:
+        Dict[str, Dict]: En post pr. URL, tom hvis manifestet ikke findes endnu
+    """
+    path = get_manifest_path(download_folder)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        # Et defekt manifest betyder blot at alt hentes ubetinget igen
+        logging.error(f"Kunne ikke læse {path}: {str(e)}")
+        return {}
+
+
+def save_manifest(manifest: Dict[str, Dict], download_folder: str):
+    """Skriver manifestet til en midlertidig fil og omdøber den, så det aldrig er halvt skrevet"""
+    path = get_manifest_path(download_folder)
+    temp_path = f"{path}.part"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def hash_file(filepath: str) -> str:
+    """SHA-256 af en fil på disken"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_conditional_headers(manifest: Dict[str, Dict], url: str, filepath: Optional[str] = None) -> Dict[str, str]:
+    """
+    If-None-Match/If-Modified-Since headers for en URL.
+
+    Filer der er hentet før manifestet fandtes, har ingen post. For dem bruges
+    filens ændringstid som If-Modified-Since, så de ikke hentes igen uden grund.
+    Er filen slettet lokalt, hentes den ubetinget.
+    """
+    headers = {}
+    if filepath and not os.path.exists(filepath):
+        return headers
+    entry = manifest.get(url)
+    if entry:
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+    elif filepath:
+        modified = datetime.fromtimestamp(os.path.getmtime(filepath), timezone.utc)
+        headers['If-Modified-Since'] = format_datetime(modified, usegmt=True)
+    return headers
+
+
+def get_previous_sha256(manifest: Dict[str, Dict], url: str, filepath: Optional[str] = None) -> Optional[str]:
+    """SHA-256 af den version vi har i forvejen - fra manifestet, ellers fra filen på disken"""
+    entry = manifest.get(url)
+    if entry and entry.get('sha256'):
+        return entry['sha256']
+    if filepath and os.path.exists(filepath):
+        return hash_file(filepath)
+    return None
+
+
+def record_response(manifest: Dict[str, Dict], url: str, headers, filepath: Optional[str] = None,
+                    size: Optional[int] = None, sha256: Optional[str] = None, **extra):
+    """
+    Opdaterer manifestet efter et 200 svar.
+
+    Args:
+        headers: Svarets headers (ETag og Last-Modified gemmes)
+        filepath (Optional[str]): Hvor indholdet er gemt
+        size (Optional[int]): Antal bytes
+        sha256 (Optional[str]): SHA-256 af indholdet
+        extra: Andre felter der gemmes i posten, fx links fra kampprogrammet
+    """
+    entry = {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+        'size': size,
+        'sha256': sha256,
+        'fetched_at': datetime.now().isoformat()
+    }
+    if filepath:
+        entry['filename'] = os.path.basename(filepath)
+    entry.update(extra)
+    manifest[url] = entry
+
+
+def write_changed_files(changed: List[str], download_folder: str) -> str:
+    """
+    Skriver de filer der faktisk er nye eller ændret i denne kørsel, én pr. linje.
+
+    Listen er tænkt til de næste trin (fx kopiering til Not_Processed), så kun
+    ændrede rapporter behandles igen.
+    """
+    path = os.path.join(download_folder, CHANGED_FILES)
+    with open(path, 'w', encoding='utf-8') as f:
+        for filename in changed:
+            f.write(filename + '\n')
+    logging.info(f"{len(changed)} nye eller ændrede filer skrevet til {path}")
+    return path
@@ -0,0 +1,458 @@
+import sqlite3
+import os
+import sys
+import logging
+import argparse
+from datetime import datetime
+from typing import Dict, Optional
+from update_match_data import get_final_score, get_team_initials, get_team_players, OPPONENT_ACTION2
+from db_schema import ensure_schema, find_match_databases, DATABASES_DIR
+from standardize_actions import VALID_ACTION1, VALID_ACTION2, VALID_POSITIONS
+
+# Den samlede database ligger i en undermappe, så scripts der gennemløber
+# Databases/*.db ikke forveksler den med en kampdatabase
+LEAGUE_DIR = 'league'
+LEAGUE_FILE = 'league.db'
+
+# Version af layoutet (PRAGMA user_version). Den samlede database kan altid bygges
+# igen fra kampdatabaserne, så en ældre version tømmes og importeres forfra
+LEAGUE_SCHEMA_VERSION = 3
+
+# Kolonnerne der kopieres uændret fra kampdatabasernes game_events
+EVENT_COLUMNS = [
+    'Time', 'Score_update', 'Player_number', 'Player_Name', 'Player2_Number', 'Player2_Name',
+    'Goalkeeper_Number', 'Goalkeeper_Name', 'Section_number', 'Source_line', 'time_seconds',
+    'is_shot', 'is_goal', 'is_save', 'is_penalty', 'half'
+]
+
+# Tekstkolonner der gemmes som heltalskoder: kolonne -> (kode kolonne, opslagstabel, tabellens nøgle)
+CODED_COLUMNS = {
+    'Team_initials': ('team_id', 'teams', 'team_id'),
+    'Action_1': ('action1_id', 'actions', 'action_id'),
+    'Position': ('position_id', 'positions', 'position_id'),
+    'Action_2': ('action2_id', 'actions', 'action_id')
+}
+
+# Spillerkolonner der får et player_id: (navn, nummer, id kolonne, SQL betingelse for at
+# spilleren er fra modstanderholdet). Som i update_match_data.get_team_players er Player2
+# fra modstanderholdet ved de defensive aktioner og målmanden altid
+_OPPONENT_ACTION2_SQL = ', '.join("'" + action.replace("'", "''") + "'" for action in OPPONENT_ACTION2)
+PLAYER_COLUMNS = [
+    ('Player_Name', 'Player_number', 'player_id', '0'),
+    ('Player2_Name', 'Player2_Number', 'player2_id', f"IFNULL(s.Action_2, '') IN ({_OPPONENT_ACTION2_SQL})"),
+    ('Goalkeeper_Name', 'Goalkeeper_Number', 'goalkeeper_id', '1')
+]
+
+
+def normalize_player_name(name: Optional[str]) -> Optional[str]:
+    """Spillernavn uden ekstra mellemrum og forskel på store og små bogstaver (også æ, ø og å)"""
+    if not name or not name.strip():
+        return None
+    return ' '.join(name.split()).casefold()
+
+
+def normalize_shirt_number(number) -> str:
+    """Trøjenummer uden foranstillede nuller, tom streng hvis det mangler"""
+    number = str(number).strip() if number is not None else ''
+    return str(int(number)) if number.isdigit() else number
+
+
+def get_league_db_path(databases_dir: str = DATABASES_DIR) -> str:
+    """Stien til den samlede database for en Databases mappe"""
+    return os.path.join(databases_dir, LEAGUE_DIR, LEAGUE_FILE)
+
+
+def open_league_db(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """
+    Åbner den samlede database og opretter tabellerne hvis de mangler.
+
+    matches har én række pr. kampdatabase med det match_data og team_info
+    indeholder, og events har alle kampenes hændelser med match_id som
+    fremmednøgle, så forespørgsler på tværs af kampe er én SQL sætning.
+
+    Hold, aktioner og positioner gemmes som heltalskoder fra de små opslagstabeller
+    teams, actions og positions, så rækkerne er mindre og sammenligninger sker
+    på heltal. Viewet game_events viser hændelserne med teksten som hidtil.
+
+    players giver hver spiller et fast player_id på tværs af kampe, nøglet på
+    hold, normaliseret navn og trøjenummer. Rækkerne slettes aldrig, så et id
+    ændrer sig ikke når kampe importeres igen.
+    """
+    db_path = db_path or get_league_db_path()
+    folder = os.path.dirname(db_path)
+    if folder and not os.path.exists(folder):
+        logging.info(f"Opretter {folder} mappe")
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA foreign_keys = ON')
+    # Spillernøglen normaliseres i Python, da SQLite's LOWER ikke kender æ, ø og å
+    conn.create_function('normalize_player_name', 1, normalize_player_name, deterministic=True)
+    conn.create_function('normalize_shirt_number', 1, normalize_shirt_number, deterministic=True)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS matches (
+        match_id INTEGER PRIMARY KEY,
+        database TEXT NOT NULL UNIQUE,
+        match_date TEXT,
+        home_team TEXT,
+        away_team TEXT,
+        home_team_initial TEXT,
+        away_team_initial TEXT,
+        home_score INTEGER,
+        away_score INTEGER,
+        home_team_players INTEGER,
+        away_team_players INTEGER,
+        home_team_goalkeepers INTEGER,
+        away_team_goalkeepers INTEGER,
+        event_count INTEGER NOT NULL DEFAULT 0,
+        source_size INTEGER,
+        source_mtime REAL,
+        imported_at TEXT NOT NULL
+    )
+    ''')
+    if conn.execute('PRAGMA user_version').fetchone()[0] < LEAGUE_SCHEMA_VERSION:
+        # Den første version havde teksten direkte i en game_events tabel
+        old_tables = [row for row in conn.execute(
+            "SELECT type, name FROM sqlite_master WHERE name IN ('game_events', 'events')"
+        )]
+        if old_tables:
+            logging.warning("Den samlede database har et ældre layout - kør league_db.py for at importere igen")
+            for kind, name in old_tables:
+                conn.execute(f"DROP {'VIEW' if kind == 'view' else 'TABLE'} {name}")
+            conn.execute('DELETE FROM matches')
+    conn.execute('CREATE TABLE IF NOT EXISTS teams (team_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    conn.execute('CREATE TABLE IF NOT EXISTS actions (action_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    conn.execute('CREATE TABLE IF NOT EXISTS positions (position_id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)')
+    # Kendte værdier får faste koder i sorteret rækkefølge, ukendte tilføjes ved import
+    conn.executemany('INSERT OR IGNORE INTO actions (name) VALUES (?)',
+                     [(name,) for name in sorted(VALID_ACTION1 | VALID_ACTION2)])
+    conn.executemany('INSERT OR IGNORE INTO positions (name) VALUES (?)',
+                     [(name,) for name in sorted(VALID_POSITIONS)])
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS players (
+        player_id INTEGER PRIMARY KEY,
+        team_id INTEGER NOT NULL REFERENCES teams(team_id),
+        name_key TEXT NOT NULL,
+        number TEXT NOT NULL DEFAULT '',
+        name TEXT NOT NULL,
+        UNIQUE (team_id, name_key, number)
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS events (
+        Event_id INTEGER PRIMARY KEY,
+        match_id INTEGER NOT NULL REFERENCES matches(match_id) ON DELETE CASCADE,
+        Time TEXT NOT NULL,
+        Score_update TEXT,
+        team_id INTEGER REFERENCES teams(team_id),
+        action1_id INTEGER REFERENCES actions(action_id),
+        position_id INTEGER REFERENCES positions(position_id),
+        Player_number TEXT,
+        Player_Name TEXT,
+        action2_id INTEGER REFERENCES actions(action_id),
+        Player2_Number TEXT,
+        Player2_Name TEXT,
+        Goalkeeper_Number TEXT,
+        Goalkeeper_Name TEXT,
+        player_id INTEGER REFERENCES players(player_id),
+        player2_id INTEGER REFERENCES players(player_id),
+        goalkeeper_id INTEGER REFERENCES players(player_id),
+        Section_number INTEGER,
+        Source_line INTEGER,
+        time_seconds INTEGER,
+        is_shot INTEGER,
+        is_goal INTEGER,
+        is_save INTEGER,
+        is_penalty INTEGER,
+        half INTEGER
+    )
+    ''')
+    # Samme kolonner som kampdatabasernes game_events, så ældre læsere virker uændret
+    conn.execute('''
+    CREATE VIEW IF NOT EXISTS game_events AS
+    SELECT
+        e.Event_id, e.match_id, e.Time, e.Score_update,
+        t.name AS Team_initials,
+        a1.name AS Action_1,
+        p.name AS Position,
+        e.Player_number, e.Player_Name,
+        a2.name AS Action_2,
+        e.Player2_Number, e.Player2_Name, e.Goalkeeper_Number, e.Goalkeeper_Name,
+        e.Section_number, e.Source_line, e.time_seconds,
+        e.is_shot, e.is_goal, e.is_save, e.is_penalty, e.half,
+        e.player_id, e.player2_id, e.goalkeeper_id
+    FROM events e
+    LEFT JOIN teams t ON t.team_id = e.team_id
+    LEFT JOIN actions a1 ON a1.action_id = e.action1_id
+    LEFT JOIN positions p ON p.position_id = e.position_id
+    LEFT JOIN actions a2 ON a2.action_id = e.action2_id
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_date ON matches(match_date)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_home ON matches(home_team_initial)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_matches_away ON matches(away_team_initial)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_match_seconds ON events(match_id, time_seconds)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_team_action ON events(team_id, action1_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_action ON events(action1_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_player ON events(Player_Name)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_player_match ON events(player_id, match_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_player2_match ON events(player2_id, match_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_goalkeeper_match ON events(goalkeeper_id, match_id)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_goals ON events(match_id, team_id) WHERE is_goal = 1')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_events_shots ON events(match_id, team_id, is_save) '
+                 'WHERE is_shot = 1')
+    conn.execute(f'PRAGMA user_version = {LEAGUE_SCHEMA_VERSION}')
+    conn.commit()
+    return conn
+
+
+def parse_match_filename(db_file: str) -> Dict[str, Optional[str]]:
+    """
+    Dato (ÅÅÅÅ-MM-DD) og holdnavne fra et kampdatabase navn som dd-mm-yyyy_Hjemme_vs_Ude.db.
+
+    Datoen gemmes i ISO format, så kampene kan sorteres direkte i SQL.
+    """
+    info = {'match_date': None, 'home_team': None, 'away_team': None}
+    try:
+        date_str, teams = os.path.basename(db_file)[:-len('.db')].split('_', 1)
+        info['match_date'] = datetime.strptime(date_str, '%d-%m-%Y').strftime('%Y-%m-%d')
+        home_team, away_team = teams.split('_vs_', 1)
+        info['home_team'] = home_team
+        info['away_team'] = away_team
+    except ValueError as e:
+        logging.warning(f"Kunne ikke læse dato og hold fra {db_file}: {str(e)}")
+    return info
+
+
+def get_match_summary(source_path: str) -> Optional[Dict]:
+    """
+    Beregner kampens hold, score og antal spillere med funktionerne fra update_match_data.
+
+    Kampdatabaser fra før time_seconds og de afledte kolonner opgraderes først.
+
+    Returns:
+        Optional[Dict]: None hvis filen ikke har en game_events tabel
+    """
+    conn = sqlite3.connect(source_path, timeout=30)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'game_events'")
+        if not cursor.fetchone():
+            return None
+        ensure_schema(cursor)
+        conn.commit()
+        home_score, away_score = get_final_score(cursor)
+        home_team, away_team = get_team_initials(cursor)
+        home_players, home_goalkeepers = get_team_players(cursor, home_team) if home_team else (set(), set())
+        away_players, away_goalkeepers = get_team_players(cursor, away_team) if away_team else (set(), set())
+        return {
+            'home_team_initial': home_team or None,
+            'away_team_initial': away_team or None,
+            'home_score': home_score,
+            'away_score': away_score,
+            'home_team_players': len(home_players),
+            'away_team_players': len(away_players),
+            'home_team_goalkeepers': len(home_goalkeepers),
+            'away_team_goalkeepers': len(away_goalkeepers)
+        }
+    finally:
+        conn.close()
+
+
+def get_player_team_sql(conn: sqlite3.Connection, match: Dict, team_sql: str) -> Dict[str, str]:
+    """
+    SQL udtryk for holdets team_id pr. spillerkolonne i PLAYER_COLUMNS.
+
+    Spillere fra modstanderholdet får det andet af kampens to hold.
+    """
+    team_ids = {}
+    for side in ('home', 'away'):
+        row = conn.execute('SELECT team_id FROM teams WHERE name = ?',
+                           (match[f'{side}_team_initial'],)).fetchone()
+        team_ids[side] = str(row[0]) if row else 'NULL'
+    opponent_sql = (f"CASE {team_sql} WHEN {team_ids['home']} THEN {team_ids['away']} "
+                    f"WHEN {team_ids['away']} THEN {team_ids['home']} END")
+    return {id_column: f"(CASE WHEN {from_opponent} THEN {opponent_sql} ELSE {team_sql} END)"
+            for _, _, id_column, from_opponent in PLAYER_COLUMNS}
+
+
+def import_match_database(conn: sqlite3.Connection, source_path: str, force: bool = False) -> str:
+    """
+    Importerer én kampdatabase i den samlede database.
+
+    Kampen identificeres ved filnavnet. En kamp der allerede er importeret,
+    erstattes helt (hændelserne slettes og kopieres igen i samme transaktion),
+    så importen kan køres igen uden dubletter. Uden force springes filer over
+    hvis størrelse og ændringstid er uændret siden sidste import.
+
+    Returns:
+        str: 'imported', 'unchanged' eller 'skipped' (ikke en kampdatabase)
+    """
+    db_file = os.path.basename(source_path)
+    stat = os.stat(source_path)
+    if not force:
+        row = conn.execute('SELECT source_size, source_mtime FROM matches WHERE database = ?',
+                           (db_file,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return 'unchanged'
+
+    summary = get_match_summary(source_path)
+    if summary is None:
+        logging.warning(f"{db_file} har ingen game_events tabel - springes over")
+        return 'skipped'
+
+    # Opgraderingen kan have ændret filen
+    stat = os.stat(source_path)
+    match = parse_match_filename(db_file)
+    match.update(summary)
+    match.update({
+        'database': db_file,
+        'source_size': stat.st_size,
+        'source_mtime': stat.st_mtime,
+        'imported_at': datetime.now().isoformat()
+    })
+
+    # ATTACH kan ikke ske inde i en transaktion, så det gøres før ændringerne
+    conn.execute('ATTACH DATABASE ? AS source', (source_path,))
+    try:
+        source_columns = {row[1] for row in conn.execute('PRAGMA source.table_info(game_events)')}
+        columns = [column for column in EVENT_COLUMNS if column in source_columns]
+        coded = [column for column in CODED_COLUMNS if column in source_columns]
+        # Tomme værdier findes ikke i opslagstabellerne og gemmes derfor som NULL
+        joins = ' '.join(
+            f"LEFT JOIN {CODED_COLUMNS[column][1]} d{index} ON d{index}.name = s.{column}"
+            for index, column in enumerate(coded)
+        )
+        players = [player for player in PLAYER_COLUMNS
+                   if 'Team_initials' in coded and player[0] in source_columns and player[1] in source_columns]
+        try:
+            names = list(match)
+            conn.execute(f'''
+                INSERT INTO matches ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})
+                ON CONFLICT(database) DO UPDATE SET
+                {', '.join(f"{name} = excluded.{name}" for name in names if name != 'database')}
+            ''', [match[name] for name in names])
+            match_id = conn.execute('SELECT match_id FROM matches WHERE database = ?', (db_file,)).fetchone()[0]
+            for column in coded:
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO {CODED_COLUMNS[column][1]} (name)
+                    SELECT DISTINCT {column} FROM source.game_events
+                    WHERE {column} IS NOT NULL AND {column} != ''
+                ''')
+            player_teams = get_player_team_sql(conn, match, f"d{coded.index('Team_initials')}.team_id") \
+                if players else {}
+            for name_column, number_column, id_column, _ in players:
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO players (team_id, name_key, number, name)
+                    SELECT {player_teams[id_column]}, normalize_player_name(s.{name_column}),
+                           normalize_shirt_number(s.{number_column}), TRIM(s.{name_column})
+                    FROM source.game_events s {joins}
+                    WHERE {player_teams[id_column]} IS NOT NULL AND normalize_player_name(s.{name_column}) IS NOT NULL
+                    ORDER BY s.rowid
+                ''')
+            player_joins = ' '.join(
+                f"LEFT JOIN players p{index} ON p{index}.team_id = {player_teams[id_column]} "
+                f"AND p{index}.name_key = normalize_player_name(s.{name_column}) "
+                f"AND p{index}.number = normalize_shirt_number(s.{number_column})"
+                for index, (name_column, number_column, id_column, _) in enumerate(players)
+            )
+            conn.execute('DELETE FROM events WHERE match_id = ?', (match_id,))
+            conn.execute(f'''
+                INSERT INTO events (match_id, {', '.join(columns + [CODED_COLUMNS[column][0] for column in coded] +
+                                                         [player[2] for player in players])})
+                SELECT ?, {', '.join([f"s.{column}" for column in columns] +
+                                     [f"d{index}.{CODED_COLUMNS[column][2]}"
+                                      for index, column in enumerate(coded)] +
+                                     [f"p{index}.player_id" for index in range(len(players))])}
+                FROM source.game_events s {joins} {player_joins}
+                ORDER BY s.rowid
+            ''', (match_id,))
+            event_count = conn.execute('SELECT COUNT(*) FROM events WHERE match_id = ?',
+                                       (match_id,)).fetchone()[0]
+            conn.execute('UPDATE matches SET event_count = ? WHERE match_id = ?', (event_count, match_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    finally:
+        conn.execute('DETACH DATABASE source')
+
+    logging.info(f"Importeret {db_file}: {event_count} hændelser")
+    return 'imported'
+
+
+def migrate_databases(databases_dir: str = DATABASES_DIR, db_path: Optional[str] = None,
+                      force: bool = False) -> Dict[str, int]:
+    """
+    Importerer alle kampdatabaser i den samlede database.
+
+    Kampe hvis fil er slettet, fjernes også fra den samlede database.
+
+    Returns:
+        Dict[str, int]: Antal importerede, uændrede, oversprungne, fejlede og fjernede kampe
+    """
+    result = {'imported': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0, 'removed': 0}
+    conn = open_league_db(db_path or get_league_db_path(databases_dir))
+    try:
+        sources = find_match_databases(databases_dir)
+        logging.info(f"Fundet {len(sources)} kampdatabaser i {databases_dir}")
+        for source_path in sources:
+            try:
+                result[import_match_database(conn, source_path, force)] += 1
+            except sqlite3.Error as e:
+                logging.error(f"Kunne ikke importere {source_path}: {str(e)}")
+                result['failed'] += 1
+
+        present = {os.path.basename(source_path) for source_path in sources}
+        removed = [(db_file,) for (db_file,) in conn.execute('SELECT database FROM matches')
+                   if db_file not in present]
+        conn.executemany('DELETE FROM matches WHERE database = ?', removed)
+        conn.commit()
+        result['removed'] = len(removed)
+        if result['imported'] or result['removed']:
+            conn.execute('ANALYZE')
+    finally:
+        conn.close()
+    return result
+
+
+def sync_match_database(source_path: str, db_path: Optional[str] = None) -> bool:
+    """
+    Opdaterer én kamp i den samlede database efter den er gemt i sin kampdatabase.
+
+    Fejl logges men kastes ikke videre - kampdatabasen er stadig den primære
+    kopi, og næste migrering retter op.
+    """
+    try:
+        conn = open_league_db(db_path)
+        try:
+            import_match_database(conn, source_path, force=True)
+        finally:
+            conn.close()
+        return True
+    except Exception as e:
+        logging.error(f"Kunne ikke opdatere den samlede database med {source_path}: {str(e)}")
+        return False
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Importerer kampdatabaserne i én samlet liga database")
+    parser.add_argument('--databases-dir', default=DATABASES_DIR,
+                        help="Mappe med kampdatabaserne (standard: Databases)")
+    parser.add_argument('--output', default=None,
+                        help="Den samlede database (standard: Databases/league/league.db)")
+    parser.add_argument('--force', action='store_true',
+                        help="Importér alle kampe igen, også uændrede")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+    try:
+        result = migrate_databases(args.databases_dir, args.output, args.force)
+    except Exception:
+        logging.error("Kunne ikke opbygge den samlede database", exc_info=True)
+        sys.exit(1)
+    logging.info(f"Samlet database: {result['imported']} importeret, {result['unchanged']} uændrede, "
+                 f"{result['skipped']} sprunget over, {result['failed']} fejlede, {result['removed']} fjernet")
@@ -0,0 +1,178 @@
+import sqlite3
+import os
+import time
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Optional
+
+CACHE_DIR = 'Cache'
+CACHE_DB = os.path.join(CACHE_DIR, 'llm_responses.db')
+
+# Maksimal samlet størrelse af gemte svar før de ældst brugte fjernes
+MAX_CACHE_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# Når cachen er for stor, fjernes de ældst brugte svar indtil denne andel af MAX_CACHE_BYTES
+EVICT_TARGET = 0.9
+
+# Tællere for den aktuelle kørsel - opdateres fra flere tråde under _lock
+cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+_lock = threading.Lock()
+
+# Hver tråd genbruger sin forbindelse, og tabellen oprettes én gang pr. proces
+_local = threading.local()
+_initialized = set()
+
+# Løbende samlet størrelse pr. cache database, så en gemning ikke summerer hele tabellen
+_cache_size: Dict[str, int] = {}
+
+
+def make_cache_key(model: str, system_prompt: str, section_text: str, temperature: float) -> str:
+    """Danner en SHA-256 nøgle ud fra alt der påvirker modellens svar"""
+    payload = json.dumps(
+        [model, system_prompt, section_text, temperature],
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _create_schema(conn: sqlite3.Connection):
+    """Opretter tabellen hvis den mangler og læser den samlede størrelse"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS responses (
+        cache_key TEXT PRIMARY KEY,
+        content TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)')
+    conn.commit()
+    _cache_size[CACHE_DB] = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+
+def _connect() -> sqlite3.Connection:
+    """Trådens forbindelse til cache databasen - åbnes og oprettes første gang den bruges"""
+    conn = getattr(_local, 'connections', {}).get(CACHE_DB)
+    if conn is not None:
+        return conn
+
+    with _lock:
+        if CACHE_DB not in _initialized:
+            if not os.path.exists(CACHE_DIR):
+                logging.info(f"Opretter {CACHE_DIR} mappe")
+                os.makedirs(CACHE_DIR)
+            conn = sqlite3.connect(CACHE_DB, timeout=30)
+            _create_schema(conn)
+            _initialized.add(CACHE_DB)
+    if conn is None:
+        conn = sqlite3.connect(CACHE_DB, timeout=30)
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    _local.connections[CACHE_DB] = conn
+    return conn
+
+
+def _discard_connection():
+    """Lukker trådens forbindelse efter en fejl, så næste opslag åbner en ny"""
+    conn = getattr(_local, 'connections', {}).pop(CACHE_DB, None)
+    if conn is not None:
+        conn.close()
+
+
+def _count(counter: str, amount: int = 1):
+    """Tæller en af cache_stats op"""
+    with _lock:
+        cache_stats[counter] += amount
+
+
+def get_cached_response(cache_key: str) -> Optional[str]:
+    """
+    Henter et gemt svar og markerer det som senest brugt.
+
+    Returns:
+        Optional[str]: Det rå svar fra modellen, eller None ved cache miss
+    """
+    try:
+        conn = _connect()
+        row = conn.execute(
+            'SELECT content FROM responses WHERE cache_key = ?', (cache_key,)
+        ).fetchone()
+        if row is None:
+            _count('misses')
+            return None
+
+        conn.execute(
+            'UPDATE responses SET last_access = ? WHERE cache_key = ?',
+            (time.time(), cache_key)
+        )
+        conn.commit()
+        _count('hits')
+        logging.debug(f"Cache hit for {cache_key[:12]}")
+        return row[0]
+    except sqlite3.Error as e:
+        # En defekt cache må aldrig stoppe behandlingen
+        logging.error(f"Fejl ved læsning fra LLM cache: {str(e)}")
+        _discard_connection()
+        _count('misses')
+        return None
+
+
+def store_response(cache_key: str, content: str):
+    """Gemmer et svar og fjerner de ældst brugte svar hvis cachen er for stor"""
+    try:
+        conn = _connect()
+        now = time.time()
+        size = len(content.encode('utf-8'))
+        previous = conn.execute('SELECT size FROM responses WHERE cache_key = ?', (cache_key,)).fetchone()
+        conn.execute('''
+            INSERT OR REPLACE INTO responses (cache_key, content, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (cache_key, content, size, now, now))
+        conn.commit()
+        with _lock:
+            cache_stats['stores'] += 1
+            _cache_size[CACHE_DB] += size - (previous[0] if previous else 0)
+            over_limit = _cache_size[CACHE_DB] > MAX_CACHE_BYTES
+        if over_limit:
+            _evict(conn)
+    except sqlite3.Error as e:
+        logging.error(f"Fejl ved skrivning til LLM cache: {str(e)}")
+        _discard_connection()
+
+
+def _evict(conn: sqlite3.Connection):
+    """
+    LRU eviction: sletter de ældst brugte svar indtil cachen er under EVICT_TARGET af MAX_CACHE_BYTES.
+
+    Den løbende størrelse tæller kun denne proces' gemninger, så den samlede
+    størrelse summeres først her, og den løbende størrelse rettes til.
+    Cachen ryddes ned til under grænsen, så tabellen ikke summeres ved hver
+    gemning når den er fuld.
+    """
+    total_size = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+    if total_size > MAX_CACHE_BYTES:
+        to_free = total_size - int(MAX_CACHE_BYTES * EVICT_TARGET)
+        keys = []
+        for cache_key, size in conn.execute('SELECT cache_key, size FROM responses ORDER BY last_access'):
+            keys.append((cache_key,))
+            total_size -= size
+            to_free -= size
+            if to_free <= 0:
+                break
+
+        conn.executemany('DELETE FROM responses WHERE cache_key = ?', keys)
+        conn.commit()
+        _count('evictions', len(keys))
+        logging.info(f"LLM cache: fjernede {len(keys)} ældre svar for at holde størrelsen under "
+                     f"{MAX_CACHE_BYTES} bytes")
+    with _lock:
+        _cache_size[CACHE_DB] = total_size
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Returnerer en kopi af hit/miss tællerne"""
+    with _lock:
+        return dict(cache_stats)
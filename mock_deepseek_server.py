@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from parse_events import split_event_lines, parse_event_line, TIME_PATTERN
+from token_estimator import estimate_tokens
+from compact_format import encode_events
+
+REAL_DEEPSEEK_URL = "https://api.deepseek.com"
+DEFAULT_RECORDINGS = os.path.join('Benchmarks', 'deepseek_recordings.jsonl')
+
+# Standard latens: fast overhead + tid pr. genereret token, med lognormal spredning
+DEFAULT_CONFIG = {
+    'mode': 'replay',               # replay, record eller synthetic
+    'recordings_path': DEFAULT_RECORDINGS,
+    'latency_base_ms': 400.0,
+    'latency_per_token_ms': 20.0,
+    'latency_sigma': 0.25,
+    'rate_limit_rate': 0.0,         # andel af kald der får 429
+    'server_error_rate': 0.0,       # andel af kald der får 500
+    'retry_after_seconds': 1.0,
+    'seed': None
+}
+
+
+def make_request_key(request_body: Dict) -> str:
+    """Nøgle for et chat kald - samme felter som påvirker svaret"""
+    payload = json.dumps(
+        [request_body.get('model'), request_body.get('messages'), request_body.get('temperature')],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def load_recordings(path: str) -> Dict[str, Dict]:
+    """Indlæser optagede svar fra en JSONL fil"""
+    recordings = {}
+    if not os.path.exists(path):
+        return recordings
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                recordings[entry['key']] = entry['response']
+    logging.info(f"Indlæste {len(recordings)} optagede svar fra {path}")
+    return recordings
+
+
+def append_recording(path: str, key: str, response: Dict):
+    """Tilføjer et optaget svar til JSONL filen"""
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + '\n')
+
+
+def synthesize_events(section_text: str) -> List[Dict]:
+    """Danner et plausibelt svar lokalt med den regelbaserede parser"""
+    _, event_lines = split_event_lines(section_text)
+    events = []
+    for line in event_lines:
+        event = parse_event_line(line)
+        if event is None:
+            time_match = TIME_PATTERN.match(line)
+            event = {'Time': f"{time_match.group(1)}.{time_match.group(2)}"}
+        events.append(event)
+    return events
+
+
+def synthesize_response(request_body: Dict) -> Dict:
+    """Bygger et OpenAI-kompatibelt chat svar uden netværk"""
+    messages = request_body.get('messages', [])
+    section_text = messages[-1]['content'] if messages else ''
+    system_prompt = messages[0]['content'] if messages else ''
+    events = synthesize_events(section_text)
+
+    # Svar i det format system prompten beder om, ligesom modellen ville
+    if '"rows"' in system_prompt:
+        content = json.dumps(encode_events(events), ensure_ascii=False)
+    else:
+        content = json.dumps({'events': events}, ensure_ascii=False, indent=2)
+
+    prompt_tokens = sum(estimate_tokens(message.get('content', '')) for message in messages)
+    completion_tokens = estimate_tokens(content)
+    return build_completion(request_body.get('model', 'deepseek-chat'), content,
+                            prompt_tokens, completion_tokens)
+
+
+def build_completion(model: str, content: str, prompt_tokens: int, completion_tokens: int) -> Dict:
+    """Pakker indhold i OpenAI chat.completion formatet"""
+    return {
+        'id': f"mock-{hashlib.md5(content.encode('utf-8')).hexdigest()[:12]}",
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{
+            'index': 0,
+            'message': {'role': 'assistant', 'content': content},
+            'finish_reason': 'stop'
+        }],
+        'usage': {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens
+        }
+    }
+
+
+def forward_to_deepseek(request_body: Dict) -> Dict:
+    """Sender kaldet videre til det rigtige DeepSeek API (record tilstand)"""
+    request = urllib.request.Request(
+        f"{REAL_DEEPSEEK_URL}/chat/completions",
+        data=json.dumps(request_body).encode('utf-8'),
+        headers={
+            'Content-Type': 'application/json',
+            'Authorization': f"Bearer {os.getenv('DEEPSEEK_API_KEY', '')}"
+        },
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def simulated_latency(config: Dict, rng: random.Random, completion_tokens: int) -> float:
+    """Latens i sekunder ud fra antal genererede tokens og en lognormal spredning"""
+    base = (config['latency_base_ms'] + config['latency_per_token_ms'] * completion_tokens) / 1000.0
+    if config['latency_sigma'] > 0:
+        base *= rng.lognormvariate(0, config['latency_sigma'])
+    return base
+
+
+class MockDeepSeekHandler(BaseHTTPRequestHandler):
+    """Håndterer /chat/completions som DeepSeek API'et"""
+
+    def log_message(self, format, *args):
+        logging.debug(f"Mock server: {format % args}")
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        started = time.perf_counter()
+        server = self.server
+        config = server.config
+
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f"Ukendt sti: {self.path}"}})
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        request_body = json.loads(self.rfile.read(length).decode('utf-8'))
+
+        with server.lock:
+            roll = server.rng.random()
+            server.stats['requests'] += 1
+
+        if roll < config['rate_limit_rate']:
+            with server.lock:
+                server.stats['rate_limited'] += 1
+            self._send_json(429, {'error': {'message': 'Rate limit (mock)', 'type': 'rate_limit_error'}},
+                            {'Retry-After': str(config['retry_after_seconds'])})
+            return
+        if roll < config['rate_limit_rate'] + config['server_error_rate']:
+            with server.lock:
+                server.stats['server_errors'] += 1
+            self._send_json(500, {'error': {'message': 'Serverfejl (mock)', 'type': 'server_error'}})
+            return
+
+        key = make_request_key(request_body)
+        response = server.recordings.get(key)
+        source = 'replay'
+
+        if response is None and config['mode'] == 'record':
+            try:
+                response = forward_to_deepseek(request_body)
+                source = 'record'
+                with server.lock:
+                    server.recordings[key] = response
+                    append_recording(config['recordings_path'], key, response)
+            except urllib.error.URLError as e:
+                logging.error(f"Kunne ikke videresende til DeepSeek: {str(e)}")
+                self._send_json(502, {'error': {'message': str(e), 'type': 'upstream_error'}})
+                return
+
+        if response is None:
+            response = synthesize_response(request_body)
+            source = 'synthetic'
+
+        if source != 'record':
+            completion_tokens = response.get('usage', {}).get('completion_tokens', 0)
+            with server.lock:
+                delay = simulated_latency(config, server.rng, completion_tokens)
+            time.sleep(delay)
+
+        self._send_json(200, response)
+
+        with server.lock:
+            server.stats[source] += 1
+            server.stats['latencies'].append(time.perf_counter() - started)
+            usage = response.get('usage', {})
+            server.stats['prompt_tokens'] += usage.get('prompt_tokens', 0)
+            server.stats['completion_tokens'] += usage.get('completion_tokens', 0)
+
+
+def start_mock_server(host: str = '127.0.0.1', port: int = 0,
+                      config: Optional[Dict] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starter stand-in serveren i en baggrundstråd.
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: Serveren og base_url til OpenAI klienten
+    """
+    server_config = dict(DEFAULT_CONFIG)
+    server_config.update(config or {})
+
+    server = ThreadingHTTPServer((host, port), MockDeepSeekHandler)
+    server.daemon_threads = True
+    server.config = server_config
+    server.lock = threading.Lock()
+    server.rng = random.Random(server_config['seed'])
+    if server_config['mode'] == 'synthetic':
+        server.recordings = {}
+    else:
+        server.recordings = load_recordings(server_config['recordings_path'])
+    server.stats = reset_stats()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://{host}:{server.server_address[1]}"
+    logging.info(f"Mock DeepSeek server startet på {base_url} ({server_config['mode']} tilstand)")
+    return server, base_url
+
+
+def reset_stats() -> Dict:
+    """Tomme tællere for serveren"""
+    return {
+        'requests': 0, 'replay': 0, 'record': 0, 'synthetic': 0,
+        'rate_limited': 0, 'server_errors': 0,
+        'prompt_tokens': 0, 'completion_tokens': 0,
+        'latencies': []
+    }
+
+
+def stop_mock_server(server: ThreadingHTTPServer):
+    """Stopper serveren"""
+    server.shutdown()
+    server.server_close()
+    logging.info("Mock DeepSeek server stoppet")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Lokal OpenAI-kompatibel stand-in for DeepSeek")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=['replay', 'record', 'synthetic'], default='replay')
+    parser.add_argument('--recordings', default=DEFAULT_RECORDINGS)
+    parser.add_argument('--latency-base-ms', type=float, default=DEFAULT_CONFIG['latency_base_ms'])
+    parser.add_argument('--latency-per-token-ms', type=float, default=DEFAULT_CONFIG['latency_per_token_ms'])
+    parser.add_argument('--latency-sigma', type=float, default=DEFAULT_CONFIG['latency_sigma'])
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--server-error-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+    server, base_url = start_mock_server(args.host, args.port, {
+        'mode': args.mode,
+        'recordings_path': args.recordings,
+        'latency_base_ms': args.latency_base_ms,
+        'latency_per_token_ms': args.latency_per_token_ms,
+        'latency_sigma': args.latency_sigma,
+        'rate_limit_rate': args.rate_limit_rate,
+        'server_error_rate': args.server_error_rate,
+        'seed': args.seed
+    })
+    print(f"Sæt DEEPSEEK_BASE_URL={base_url} for at bruge serveren. Stop med Ctrl+C.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_mock_server(server)
@@ -0,0 +1,264 @@
+import os
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Dict, Optional, Tuple
+
+PROGRAM_PATH_PREFIX = '/kampprogram/'
+PDF_PATH_PREFIX = '/intranet/pdfs/game/'
+
+DEFAULT_CONFIG = {
+    'matches': 182,                 # kampe pr. turnering og sæson (en sæson i Herreligaen)
+    'tournaments': ['herreligaen'],
+    'seasons': ['2024'],            # den første er den aktuelle sæson
+    'page_size': 0,                 # kampe pr. side i kampprogrammet - 0 slår sideinddeling fra
+    'first_match_id': 740000,
+    'pdf_dir': None,                # mappe med rigtige PDF'er der bruges på skift
+    'pdf_bytes': 60 * 1024,         # størrelse på syntetiske PDF'er
+    'latency_ms': 150.0,
+    'bytes_per_second': 2 * 1024 * 1024,
+    'throttle_rate': 0.0,           # andel af PDF kald der får 429
+    'retry_after_seconds': 1.0,
+    'seed': None
+}
+
+
+def build_program_page(config: Dict, tournament: str, season: str, page: int = 1) -> bytes:
+    """
+    Kampprogram med et "Alle hændelser" link pr. kamp som på tophaandbold.dk.
+
+    Hver turnering og sæson har sine egne kamp-id'er. Med page_size deles kampene
+    over flere sider med et rel="next" link til den næste.
+    """
+    tournament_index = config['tournaments'].index(tournament)
+    season_index = config['seasons'].index(season)
+    first_match_id = config['first_match_id'] + tournament_index * 100000 + season_index * 10000
+    page_size = config['page_size'] or config['matches']
+    first = (page - 1) * page_size
+
+    items = []
+    for index in range(first, min(first + page_size, config['matches'])):
+        match_id = first_match_id + index
+        href = f"{PDF_PATH_PREFIX}{season}/{match_id}?type=all"
+        items.append(
+            '<div class="dropdown-menu">'
+            f'<a class="dropdown-item" href="{href}">Alle hændelser</a>'
+            f'<a class="dropdown-item" href="{PDF_PATH_PREFIX}{season}/{match_id}?type=stats">Statistik</a>'
+            '</div>'
+        )
+    if first + page_size < config['matches']:
+        items.append(
+            '<ul class="pagination"><li class="page-item">'
+            f'<a class="page-link" rel="next" href="{PROGRAM_PATH_PREFIX}{tournament}?season={season}&amp;page={page + 1}">'
+            'Næste</a></li></ul>'
+        )
+    return f"<html><body>{''.join(items)}</body></html>".encode('utf-8')
+
+
+def load_pdf_bodies(config: Dict) -> list:
+    """Rigtige PDF'er fra pdf_dir, ellers én syntetisk PDF på pdf_bytes bytes"""
+    pdf_dir = config['pdf_dir']
+    if pdf_dir and os.path.isdir(pdf_dir):
+        bodies = []
+        for filename in sorted(os.listdir(pdf_dir)):
+            if filename.lower().endswith('.pdf'):
+                with open(os.path.join(pdf_dir, filename), 'rb') as f:
+                    bodies.append(f.read())
+        if bodies:
+            return bodies
+    header = b'%PDF-1.4\n'
+    return [header + b'0' * max(0, config['pdf_bytes'] - len(header))]
+
+
+class MockHandballHandler(BaseHTTPRequestHandler):
+    """Svarer på kampprogrammet og PDF links"""
+
+    # HTTP/1.1 så klienten kan genbruge forbindelsen (keep-alive)
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        logging.debug(f"Mock site: {format % args}")
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.stats['connections'] += 1
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: Optional[Dict] = None,
+              bytes_per_second: float = 0):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not bytes_per_second:
+            self.wfile.write(body)
+            return
+        # Sendes i bidder så overførslen tager realistisk tid
+        chunk = 16 * 1024
+        for offset in range(0, len(body), chunk):
+            self.wfile.write(body[offset:offset + chunk])
+            time.sleep(len(body[offset:offset + chunk]) / bytes_per_second)
+
+    def _not_modified(self, body: bytes) -> bool:
+        """Svarer 304 hvis If-None-Match passer med indholdets ETag, eller If-Modified-Since ikke er ældre"""
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        if self.headers.get('If-None-Match'):
+            if self.headers['If-None-Match'] != etag:
+                return False
+        elif self.headers.get('If-Modified-Since') and body not in self.server.revised.values():
+            try:
+                since = parsedate_to_datetime(self.headers['If-Modified-Since'])
+            except (TypeError, ValueError):
+                return False
+            if since < parsedate_to_datetime(self.server.last_modified):
+                return False
+        else:
+            return False
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+        with self.server.lock:
+            self.server.stats['not_modified'] += 1
+        return True
+
+    def _validators(self, body: bytes) -> Dict:
+        return {'ETag': f'"{hashlib.sha1(body).hexdigest()}"',
+                'Last-Modified': self.server.last_modified}
+
+    def do_GET(self):
+        server = self.server
+        config = server.config
+        with server.lock:
+            server.stats['requests'] += 1
+            server.active += 1
+            server.stats['max_concurrent'] = max(server.stats['max_concurrent'], server.active)
+            roll = server.rng.random()
+        try:
+            time.sleep(config['latency_ms'] / 1000.0)
+            url = urlsplit(self.path)
+            path = url.path
+
+            if path.startswith(PROGRAM_PATH_PREFIX):
+                query = parse_qs(url.query)
+                tournament = path[len(PROGRAM_PATH_PREFIX):].strip('/')
+                season = query.get('season', [config['seasons'][0]])[0]
+                if tournament not in config['tournaments'] or season not in config['seasons']:
+                    self._send(404, b'Not found', 'text/plain')
+                    return
+                page = build_program_page(config, tournament, season, int(query.get('page', ['1'])[0]))
+                with server.lock:
+                    server.stats['program_pages'] += 1
+                if not self._not_modified(page):
+                    self._send(200, page, 'text/html; charset=utf-8', self._validators(page))
+                return
+
+            if not path.startswith(PDF_PATH_PREFIX):
+                self._send(404, b'Not found', 'text/plain')
+                return
+
+            if roll < config['throttle_rate']:
+                with server.lock:
+                    server.stats['throttled'] += 1
+                self._send(429, b'Too many requests', 'text/plain',
+                           {'Retry-After': str(config['retry_after_seconds'])})
+                return
+
+            match_id = int(path.rstrip('/').split('/')[-1])
+            body = server.revised.get(match_id) or server.pdf_bodies[match_id % len(server.pdf_bodies)]
+            if self._not_modified(body):
+                return
+            self._send(200, body, 'application/pdf', self._validators(body),
+                       bytes_per_second=config['bytes_per_second'])
+            with server.lock:
+                server.stats['pdfs'] += 1
+                server.stats['bytes_sent'] += len(body)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+def start_mock_site(host: str = '127.0.0.1', port: int = 0,
+                    config: Optional[Dict] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Starter stand-in siden i en baggrundstråd.
+
+    Returns:
+        Tuple[ThreadingHTTPServer, str]: Serveren og base URL til TOPHAANDBOLD_BASE_URL
+    """
+    site_config = dict(DEFAULT_CONFIG)
+    site_config.update(config or {})
+
+    server = ThreadingHTTPServer((host, port), MockHandballHandler)
+    server.daemon_threads = True
+    server.config = site_config
+    server.lock = threading.Lock()
+    server.rng = random.Random(site_config['seed'])
+    server.pdf_bodies = load_pdf_bodies(site_config)
+    server.last_modified = formatdate(usegmt=True)
+    # match_id -> nyt indhold, til at simulere en rettet rapport bag samme URL
+    server.revised = {}
+    server.active = 0
+    server.stats = {'requests': 0, 'connections': 0, 'program_pages': 0, 'pdfs': 0, 'throttled': 0,
+                    'not_modified': 0, 'bytes_sent': 0, 'max_concurrent': 0}
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    base_url = f"http://{host}:{server.server_address[1]}"
+    logging.info(f"Mock tophaandbold.dk startet på {base_url} med {site_config['matches']} kampe "
+                 f"i {len(site_config['tournaments'])} turneringer og {len(site_config['seasons'])} sæsoner")
+    return server, base_url
+
+
+def stop_mock_site(server: ThreadingHTTPServer):
+    """Stopper serveren"""
+    server.shutdown()
+    server.server_close()
+    logging.info("Mock tophaandbold.dk stoppet")
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Lokal stand-in for kampprogrammet og PDF'erne på tophaandbold.dk")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--matches', type=int, default=DEFAULT_CONFIG['matches'])
+    parser.add_argument('--tournaments', nargs='+', default=DEFAULT_CONFIG['tournaments'])
+    parser.add_argument('--seasons', nargs='+', default=DEFAULT_CONFIG['seasons'])
+    parser.add_argument('--page-size', type=int, default=0)
+    parser.add_argument('--pdf-dir', default=None, help="Server rigtige PDF'er fra denne mappe")
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_CONFIG['latency_ms'])
+    parser.add_argument('--bytes-per-second', type=float, default=DEFAULT_CONFIG['bytes_per_second'])
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+    server, base_url = start_mock_site(args.host, args.port, {
+        'matches': args.matches,
+        'tournaments': args.tournaments,
+        'seasons': args.seasons,
+        'page_size': args.page_size,
+        'pdf_dir': args.pdf_dir,
+        'latency_ms': args.latency_ms,
+        'bytes_per_second': args.bytes_per_second,
+        'throttle_rate': args.throttle_rate,
+        'seed': args.seed
+    })
+    print(f"Sæt TOPHAANDBOLD_BASE_URL={base_url} for at bruge serveren. Stop med Ctrl+C.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop_mock_site(server)
@@ -0,0 +1,207 @@
+import re
+import logging
+from typing import List, Dict, Optional, Tuple
+from standardize_actions import VALID_ACTION1, VALID_ACTION2, VALID_POSITIONS
+
+# Handlinger sorteret efter længde, så "Mål på straffe" matches før "Mål"
+ACTION1_BY_LENGTH = sorted(VALID_ACTION1, key=len, reverse=True)
+ACTION2_BY_LENGTH = sorted(VALID_ACTION2, key=len, reverse=True)
+
+# Handlinger hvor en målmand kan stå efter spilleren
+SHOT_ACTIONS = {
+    'Mål', 'Mål på straffe', 'Skud blokeret', 'Skud forbi', 'Skud på stolpe',
+    'Skud reddet', 'Straffekast forbi', 'Straffekast på stolpe', 'Straffekast reddet'
+}
+
+# Linjer der starter med et tidspunkt: "mm.ss  [score]  [HOLD]  resten"
+TIME_PATTERN = re.compile(r'^\s*(\d{1,2})[.:](\d{2})(?=\s|$)')
+EVENT_LINE_PATTERN = re.compile(
+    r'^\s*(?P<time>\d{1,2}[.:]\d{2})'
+    r'(?:\s+(?P<score>\d{1,2}\s*-\s*\d{1,2}))?'
+    r'(?:\s+(?P<team>[A-ZÆØÅ]{2,5}))?'
+    r'\s+(?P<rest>.+?)\s*$'
+)
+NUMBER_PATTERN = re.compile(r'^\d{1,3}$')
+
+
+def time_to_seconds(time_str: str) -> int:
+    """Konverterer en kamptid i formatet mm.ss til sekunder"""
+    minutes, seconds = re.split(r'[.:]', time_str.strip())
+    return int(minutes) * 60 + int(seconds)
+
+
+def group_event_lines(lines: List[str]) -> List[List[str]]:
+    """
+    Grupperer rå linjer så hver gruppe indeholder præcis én hændelse.
+
+    En hændelse starter altid med et tidspunkt, og efterfølgende linjer uden
+    tidspunkt hører til samme hændelse. Linjer før første tidspunkt udgør deres
+    egen gruppe.
+
+    Returns:
+        List[List[str]]: Grupper af rå linjer i oprindelig rækkefølge
+    """
+    groups = []
+    for line in lines:
+        if TIME_PATTERN.match(line) or not groups:
+            groups.append([line])
+        else:
+            groups[-1].append(line)
+    return groups
+
+
+def split_event_lines(section_text: str) -> Tuple[str, List[str]]:
+    """
+    Opdeler en sektion i header og hændelseslinjer.
+
+    En hændelse starter altid med et tidspunkt. Linjer uden tidspunkt lægges
+    sammen med den foregående hændelse, så ombrudte linjer ikke går tabt.
+
+    Returns:
+        Tuple[str, List[str]]: Sektionens header og en liste af hændelseslinjer
+    """
+    lines = section_text.split('\n')
+    header = lines[0] if lines else ''
+    event_lines = []
+
+    for group in group_event_lines(lines[1:]):
+        parts = [line.strip() for line in group if line.strip()]
+        if not parts:
+            continue
+        if TIME_PATTERN.match(parts[0]):
+            if len(parts) > 1:
+                logging.debug(f"Sammenlægger fortsættelseslinjer: {parts[1:]}")
+            event_lines.append(' '.join(parts))
+        else:
+            logging.debug(f"Ignorerer linjer uden tidspunkt før første hændelse: {parts}")
+
+    return header, event_lines
+
+
+def _match_phrase(text: str, phrases: List[str]) -> Optional[str]:
+    """Finder den længste frase som teksten starter med efterfulgt af mellemrum eller slut"""
+    for phrase in phrases:
+        if text == phrase or text.startswith(phrase + ' '):
+            return phrase
+    return None
+
+
+def _take_player(tokens: List[str]) -> Tuple[Optional[str], Optional[str], List[str]]:
+    """
+    Læser "nummer navn ..." fra starten af tokens.
+
+    Navnet slutter ved næste nummer eller ved starten af en sekundær handling.
+
+    Returns:
+        Tuple: (nummer, navn, resterende tokens) - (None, None, tokens) hvis intet nummer
+    """
+    if not tokens or not NUMBER_PATTERN.match(tokens[0]):
+        return None, None, tokens
+
+    number = tokens[0]
+    name_tokens = []
+    index = 1
+    while index < len(tokens):
+        if NUMBER_PATTERN.match(tokens[index]):
+            break
+        if _match_phrase(' '.join(tokens[index:]), ACTION2_BY_LENGTH):
+            break
+        name_tokens.append(tokens[index])
+        index += 1
+
+    # Rapporten skriver efternavnet med versaler - ellers er linjen ikke entydig
+    if not name_tokens or not name_tokens[-1].isupper():
+        return None, None, tokens
+
+    return number, ' '.join(name_tokens), tokens[index:]
+
+
+def parse_event_line(line: str) -> Optional[Dict]:
+    """
+    Parser en enkelt hændelseslinje regelbaseret.
+
+    Returnerer kun en begivenhed når linjen kan tolkes entydigt ud fra de kendte
+    handlinger og positioner i standardize_actions. Alle andre linjer giver None,
+    så de kan sendes videre til DeepSeek.
+
+    Returns:
+        Optional[Dict]: Begivenhed med samme nøgler som DeepSeek svaret, eller None
+    """
+    match = EVENT_LINE_PATTERN.match(line)
+    if not match:
+        return None
+
+    rest = match.group('rest')
+    action1 = _match_phrase(rest, ACTION1_BY_LENGTH)
+    if not action1:
+        logging.debug(f"Ukendt primær handling i linje: {line}")
+        return None
+
+    event = {'Time': match.group('time').replace(':', '.')}
+    if match.group('score'):
+        event['ScoreUpdate'] = re.sub(r'\s+', '', match.group('score'))
+    if match.group('team'):
+        event['TeamInitials'] = match.group('team')
+    event['Action1'] = action1
+
+    tokens = rest[len(action1):].split()
+
+    if tokens and tokens[0] in VALID_POSITIONS:
+        event['Position'] = tokens.pop(0)
+
+    number, name, tokens = _take_player(tokens)
+    if number:
+        event['PlayerNumber'] = number
+        event['PlayerName'] = name
+
+    extra_players = []
+    action2 = _match_phrase(' '.join(tokens), ACTION2_BY_LENGTH)
+    if action2:
+        event['Action2'] = action2
+        tokens = ' '.join(tokens)[len(action2):].split()
+
+    while tokens:
+        number, name, tokens = _take_player(tokens)
+        if not number:
+            logging.debug(f"Kunne ikke tolke resten af linjen: {line}")
+            return None
+        extra_players.append((number, name))
+
+    if len(extra_players) > 2:
+        return None
+
+    if action2:
+        if action2 == 'Retur' and len(extra_players) == 1:
+            # Tvetydigt om spilleren er returspiller eller målmand
+            return None
+        if extra_players:
+            event['Player2Number'], event['Player2Name'] = extra_players.pop(0)
+
+    if extra_players:
+        if action1 not in SHOT_ACTIONS or len(extra_players) > 1:
+            return None
+        event['GoalkeeperNumber'], event['GoalkeeperName'] = extra_players[0]
+
+    return event
+
+
+def parse_section(section_text: str) -> Tuple[List[Dict], List[str]]:
+    """
+    Parser alle hændelseslinjer i en sektion.
+
+    Returns:
+        Tuple[List[Dict], List[str]]: Parsede begivenheder og linjer der ikke kunne parses
+    """
+    _, event_lines = split_event_lines(section_text)
+    events = []
+    unparsed = []
+
+    for line in event_lines:
+        event = parse_event_line(line)
+        if event:
+            events.append(event)
+        else:
+            unparsed.append(line)
+
+    logging.debug(f"Regelbaseret parsing: {len(events)} begivenheder, {len(unparsed)} ukendte linjer")
+    return events, unparsed
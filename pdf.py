@@ -1,31 +1,162 @@
 import PyPDF2
 import os
+import time
+from importlib import metadata
+from typing import Callable, Dict, Iterator, List, Tuple
 
-def convert_pdf_to_text(pdf_path: str, output_path: str) -> bool:
+# De øvrige backends er valgfrie og bruges kun hvis de er installeret
+try:
+    import pypdf
+except ImportError:
+    pypdf = None
+
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer
+except ImportError:
+    extract_pages = None
+
+try:
+    import pypdfium2
+except ImportError:
+    pypdfium2 = None
+
+# Backend der bruges når intet andet er valgt (PDF_BACKEND i .env)
+DEFAULT_BACKEND = os.getenv("PDF_BACKEND", "pypdf2")
+
+# Tælles op når måden siderne samles til tekst ændres, så gemte tekster i text_cache bliver ugyldige
+EXTRACTOR_VERSION = 1
+
+# Pakkenavnene bag hver backend - bruges til at slå den installerede version op
+BACKEND_DISTRIBUTIONS = {
+    'pypdf2': 'PyPDF2',
+    'pypdf': 'pypdf',
+    'pdfminer': 'pdfminer.six',
+    'pypdfium2': 'pypdfium2'
+}
+
+def iter_pages_pypdf2(pdf_path: str) -> Iterator[str]:
+    """Teksten side for side med PyPDF2"""
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = PyPDF2.PdfReader(pdf_file)
+        for page in pdf_reader.pages:
+            yield page.extract_text()
+
+def iter_pages_pypdf(pdf_path: str) -> Iterator[str]:
+    """Teksten side for side med pypdf (efterfølgeren til PyPDF2)"""
+    with open(pdf_path, 'rb') as pdf_file:
+        pdf_reader = pypdf.PdfReader(pdf_file)
+        for page in pdf_reader.pages:
+            yield page.extract_text()
+
+def iter_pages_pdfminer(pdf_path: str) -> Iterator[str]:
+    """Teksten side for side med pdfminer.six"""
+    for page_layout in extract_pages(pdf_path):
+        yield ''.join(
+            element.get_text() for element in page_layout if isinstance(element, LTTextContainer)
+        ).rstrip('\n')
+
+def iter_pages_pypdfium2(pdf_path: str) -> Iterator[str]:
+    """Teksten side for side med pypdfium2 (PDFium)"""
+    document = pypdfium2.PdfDocument(pdf_path)
+    try:
+        for page_index in range(len(document)):
+            page = document[page_index]
+            text_page = page.get_textpage()
+            try:
+                yield text_page.get_text_range().replace('\r\n', '\n')
+            finally:
+                text_page.close()
+                page.close()
+    finally:
+        document.close()
+
+PDF_BACKENDS: Dict[str, Tuple[Callable[[str], Iterator[str]], object]] = {
+    'pypdf2': (iter_pages_pypdf2, PyPDF2),
+    'pypdf': (iter_pages_pypdf, pypdf),
+    'pdfminer': (iter_pages_pdfminer, extract_pages),
+    'pypdfium2': (iter_pages_pypdfium2, pypdfium2)
+}
+
+def available_backends() -> List[str]:
+    """Navnene på de backends hvis pakke er installeret"""
+    return [name for name, (_, module) in PDF_BACKENDS.items() if module is not None]
+
+def get_extractor_version(backend: str = None) -> str:
+    """
+    Identificerer den udtrækker der danner teksten: backend, pakkens version og EXTRACTOR_VERSION.
+
+    En opgradering af fx PyPDF2 kan ændre teksten, så versionen indgår i text_cache nøglen.
+    """
+    backend = backend or DEFAULT_BACKEND
+    try:
+        package_version = metadata.version(BACKEND_DISTRIBUTIONS[backend])
+    except (KeyError, metadata.PackageNotFoundError):
+        package_version = 'ukendt'
+    return f"{backend}-{package_version}-{EXTRACTOR_VERSION}"
+
+def iter_pdf_pages(pdf_path: str, backend: str = None) -> Iterator[str]:
+    """
+    Streamer teksten fra en PDF-fil én side ad gangen.
+
+    Args:
+        pdf_path (str): Stien til PDF-filen
+        backend (str): pypdf2, pypdf, pdfminer eller pypdfium2 (standard: PDF_BACKEND)
+
+    Returns:
+        Iterator[str]: Teksten for hver side
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Ukendt PDF backend: {backend}")
+    iter_pages, module = PDF_BACKENDS[backend]
+    if module is None:
+        raise ImportError(f"PDF backend {backend} er ikke installeret")
+    return iter_pages(pdf_path)
+
+def extract_pdf_text(pdf_path: str, backend: str = None) -> str:
+    """
+    Udtrækker teksten fra en PDF-fil uden at skrive den til disk.
+
+    Args:
+        pdf_path (str): Stien til PDF-filen
+        backend (str): Backend fra PDF_BACKENDS (standard: PDF_BACKEND)
+
+    Returns:
+        str: Teksten fra alle sider, hver side efterfulgt af et linjeskift
+    """
+    # Siderne samles med join i stedet for += så tiden er lineær i antal sider
+    return ''.join(page + '\n' for page in iter_pdf_pages(pdf_path, backend))
+
+def extract_pdf_text_timed(pdf_path: str, backend: str = None) -> Tuple[str, float]:
+    """
+    Udtrækker teksten og måler hvor lang tid det tog.
+
+    Bruges af process pool'en, så tiden måles i arbejdsprocessen og ikke
+    inkluderer ventetid i køen.
+    """
+    started = time.perf_counter()
+    text = extract_pdf_text(pdf_path, backend)
+    return text, time.perf_counter() - started
+
+def convert_pdf_to_text(pdf_path: str, output_path: str, backend: str = None) -> bool:
     """
     Konverterer en PDF-fil til tekst.
-    
+
     Args:
         pdf_path (str): Stien til PDF-filen
         output_path (str): Stien hvor tekstfilen skal gemmes
-        
+        backend (str): Backend fra PDF_BACKENDS (standard: PDF_BACKEND)
+
     Returns:
         bool: True hvis konverteringen lykkedes, ellers False
     """
     try:
-        # Åbn PDF-filen
-        with open(pdf_path, 'rb') as pdf_file:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ''
-            
-            # Læs hver side i PDF'en
-            for page in pdf_reader.pages:
-                text += page.extract_text() + '\n'
-
-        # Gem teksten i en .txt fil
+        # Gem teksten i en .txt fil side for side
         with open(output_path, 'w', encoding='utf-8') as text_file:
-            text_file.write(text)
-            
+            for page in iter_pdf_pages(pdf_path, backend):
+                text_file.write(page + '\n')
+
         return True
     except Exception as e:
         print(f"Fejl ved konvertering af PDF: {str(e)}")
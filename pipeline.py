@@ -0,0 +1,274 @@
+import os
+import time
+import queue
+import shutil
+import asyncio
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Dict, List, Optional, Set, Tuple
+import process_output
+from process_output import (process_handball_content, get_cached_pdf_text, store_pdf_text, prepare_directories,
+                            set_pdf_backend, keep_incomplete_pdf, IncompleteReportError, NOT_PROCESSED_DIR,
+                            PROCESSED_DIR, ERROR_DIR, PDF_WORKERS, PDF_QUEUE_SIZE)
+from pdf import extract_pdf_text_timed, PDF_BACKENDS
+from scrape_matches import (create_download_folder, get_session, crawl_program_pages, get_pdf_filename,
+                            DEFAULT_HEADERS, TOURNAMENTS, SEASONS)
+from async_downloader import download_files_async, PER_HOST_LIMIT
+from download_manifest import load_manifest, save_manifest, write_changed_files
+from crawl_frontier import (open_frontier, start_crawl, finish_crawl, get_pending, get_retried, mark_done,
+                            mark_failed, get_frontier_stats)
+from pipeline_metrics import start_run, set_current_file, timed, add_counter, add_stage_time, write_metrics
+from rate_limiter import configure_rate_limits
+
+# Downloadede PDF'er der må vente på udtrækning, før downloads holdes tilbage
+DOWNLOAD_QUEUE_SIZE = int(os.getenv("PIPELINE_DOWNLOAD_QUEUE_SIZE", "16"))
+
+# Tråde der parser og gemmer samtidigt - hver kamp har sin egen database
+STORE_WORKERS = int(os.getenv("PIPELINE_STORE_WORKERS", "2"))
+
+
+def download_stage(jobs: List[Tuple[str, str]], manifest: Dict, pdf_queue: queue.Queue,
+                   results: Dict[str, str], per_host: int, retried: Set[str], queued: Set[str]):
+    """
+    Downloader PDF'erne og lægger hver ny eller ændret fil i pdf_queue så snart den er hentet.
+
+    Filer i retried kunne ikke gemmes i en tidligere kørsel og lægges i køen
+    igen, selvom serveren svarer at de er uændrede. Filerne der lægges i køen,
+    samles i queued. put sker i en tråd udenfor event loopet, så en fuld kø kun
+    holder den færdige download tilbage og ikke de andre.
+    """
+    async def on_result(url: str, filepath: str, result: str):
+        add_counter(f"download_{result}", filename=os.path.basename(filepath))
+        if result == 'downloaded' or (result == 'unchanged' and filepath in retried):
+            queued.add(filepath)
+            await asyncio.get_running_loop().run_in_executor(None, pdf_queue.put, filepath)
+
+    try:
+        with timed('download', filename='pipeline'):
+            results.update(asyncio.run(
+                download_files_async(jobs, manifest, DEFAULT_HEADERS, per_host, on_result=on_result)
+            ))
+    except Exception as e:
+        logging.error(f"Fejl i download trinnet: {str(e)}", exc_info=True)
+    finally:
+        pdf_queue.put(None)
+
+
+def extract_stage(pdf_queue: queue.Queue, pool: ProcessPoolExecutor, text_queue: queue.Queue):
+    """
+    Sender downloadede PDF'er til process pool'en og lægger (sti, hash, future) i text_queue.
+
+    Som i process_output.submit_pdf_extractions springes pool'en over for PDF'er
+    der findes i tekst cachen.
+    """
+    try:
+        while True:
+            filepath = pdf_queue.get()
+            if filepath is None:
+                break
+            pdf_file = os.path.basename(filepath)
+            pdf_hash, text = get_cached_pdf_text(filepath, pdf_file)
+            if text is not None:
+                future = Future()
+                future.set_result((text, 0.0))
+                text_queue.put((filepath, None, future))
+                continue
+            future = pool.submit(extract_pdf_text_timed, filepath, process_output.PDF_BACKEND)
+            text_queue.put((filepath, pdf_hash, future))
+    except Exception as e:
+        logging.error(f"Fejl i udtræk trinnet: {str(e)}", exc_info=True)
+    finally:
+        text_queue.put(None)
+
+
+def store_pdf(filepath: str, pdf_hash: Optional[str], future: Future, use_parser: bool) -> bool:
+    """
+    Parser teksten og gemmer hændelserne i kampens database.
+
+    PDF'en bliver liggende i download mappen (manifestet hører til den) og kopieres
+    til Processed eller Error_Appeared som ved process_output.py. Fejlede nogle
+    sektioner, kopieres den til Not_Processed, så process_output.py genoptager den.
+    """
+    pdf_file = os.path.basename(filepath)
+    set_current_file(pdf_file)
+    logging.info(f"Starter behandling af PDF-fil: {pdf_file}")
+    try:
+        with timed('pdf_wait'):
+            text, seconds = future.result()
+        add_stage_time('pdf_extraction', seconds)
+        store_pdf_text(pdf_hash, text)
+
+        process_handball_content(text, use_parser)
+        shutil.copy2(filepath, os.path.join(PROCESSED_DIR, pdf_file))
+        return True
+    except IncompleteReportError as e:
+        keep_incomplete_pdf(pdf_file, e)
+        try:
+            shutil.copy2(filepath, os.path.join(NOT_PROCESSED_DIR, pdf_file))
+        except OSError as copy_error:
+            logging.error(f"Kunne ikke kopiere filen til {NOT_PROCESSED_DIR}: {str(copy_error)}", exc_info=True)
+        return False
+    except Exception as e:
+        logging.error(f"Fejl under behandling af {pdf_file}: {str(e)}", exc_info=True)
+        add_counter('failed_files')
+        try:
+            shutil.copy2(filepath, os.path.join(ERROR_DIR, pdf_file))
+        except OSError as copy_error:
+            logging.error(f"Kunne ikke kopiere fejlet fil til {ERROR_DIR}: {str(copy_error)}", exc_info=True)
+        return False
+
+
+def store_stage(text_queue: queue.Queue, use_parser: bool, stored: List[str]):
+    """Tager udtrukne PDF'er fra køen indtil sentinel og giver den videre til de andre tråde"""
+    while True:
+        item = text_queue.get()
+        if item is None:
+            text_queue.put(None)
+            break
+        if store_pdf(item[0], item[1], item[2], use_parser):
+            stored.append(os.path.basename(item[0]))
+
+
+def get_finished_files(results: Dict[str, str], queued: Set[str], stored: List[str]) -> Set[str]:
+    """
+    De filer hvis URL kan markeres som færdig i frontieren.
+
+    En fil er færdig når den er uændret, eller når den blev lagt i køen og er
+    gemt. En fil der ikke kunne hentes eller gemmes, forbliver ventende, så den
+    lægges i køen igen i næste kørsel.
+    """
+    stored_files = set(stored)
+    return {filepath for filepath, result in results.items()
+            if result != 'failed' and (filepath not in queued or os.path.basename(filepath) in stored_files)}
+
+
+def run_pipeline(use_parser: bool = True, tournaments: Optional[List[str]] = None,
+                 seasons: Optional[List[str]] = None, recheck: bool = False,
+                 per_host: int = PER_HOST_LIMIT, pdf_workers: int = PDF_WORKERS,
+                 store_workers: int = STORE_WORKERS) -> List[str]:
+    """
+    Kører crawl -> download -> udtræk -> parse -> gem som ét forløb.
+
+    Hvert trin er en pulje af arbejdere forbundet med begrænsede køer, så en PDF
+    udtrækkes og gemmes mens de næste stadig downloades, og et langsomt trin
+    holder de foregående tilbage i stedet for at fylde hukommelsen.
+
+    Returns:
+        List[str]: De PDF'er der blev hentet og gemt i denne kørsel
+    """
+    download_folder = create_download_folder()
+    prepare_directories()
+    configure_rate_limits()
+    start_run({
+        'pipeline': True,
+        'use_parser': use_parser,
+        'tournaments': tournaments or TOURNAMENTS,
+        'seasons': SEASONS if seasons is None else seasons,
+        'per_host': per_host,
+        'pdf_workers': pdf_workers,
+        'store_workers': store_workers,
+        'pdf_backend': process_output.PDF_BACKEND
+    })
+
+    session = get_session()
+    manifest = load_manifest(download_folder)
+    frontier = open_frontier(download_folder)
+    results: Dict[str, str] = {}
+    stored: List[str] = []
+    queued: Set[str] = set()
+    started = time.perf_counter()
+    try:
+        start_crawl(frontier, recheck)
+        with timed('crawl', filename='pipeline'):
+            crawl_program_pages(session, manifest, frontier, tournaments or TOURNAMENTS,
+                                SEASONS if seasons is None else seasons)
+        urls = {os.path.join(download_folder, get_pdf_filename(url)): url
+                for url, _, _ in get_pending(frontier, 'pdf')}
+        retried_urls = get_retried(frontier, 'pdf')
+        retried = {filepath for filepath, url in urls.items() if url in retried_urls}
+        logging.info(f"{len(urls)} PDF-filer skal hentes eller tjekkes")
+
+        pdf_queue = queue.Queue(maxsize=DOWNLOAD_QUEUE_SIZE)
+        text_queue = queue.Queue(maxsize=PDF_QUEUE_SIZE)
+        with ProcessPoolExecutor(max_workers=pdf_workers) as pool:
+            threads = [
+                threading.Thread(target=download_stage, daemon=True,
+                                 args=([(url, filepath) for filepath, url in urls.items()],
+                                       manifest, pdf_queue, results, per_host, retried, queued)),
+                threading.Thread(target=extract_stage, args=(pdf_queue, pool, text_queue), daemon=True)
+            ] + [
+                threading.Thread(target=store_stage, args=(text_queue, use_parser, stored), daemon=True)
+                for _ in range(max(1, store_workers))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        finished = get_finished_files(results, queued, stored)
+        mark_done(frontier, [urls[filepath] for filepath in finished])
+        mark_failed(frontier, [urls[filepath] for filepath in results if filepath not in finished])
+        if len(results) == len(urls):
+            finish_crawl(frontier)
+        logging.info(f"Frontier: {get_frontier_stats(frontier)}")
+    finally:
+        save_manifest(manifest, download_folder)
+        frontier.close()
+        write_metrics({'pipeline_results': {
+            'downloaded': sum(1 for result in results.values() if result == 'downloaded'),
+            'unchanged': sum(1 for result in results.values() if result == 'unchanged'),
+            'failed': sum(1 for result in results.values() if result == 'failed'),
+            'stored': len(stored)
+        }})
+
+    # Samme betydning som fra scrape_matches.py: de filer der er nye eller ændrede på serveren
+    write_changed_files(sorted(os.path.basename(filepath) for filepath, result in results.items()
+                               if result == 'downloaded'), download_folder)
+    logging.info(f"Pipeline færdig på {time.perf_counter() - started:.1f} sekunder: "
+                 f"{len(stored)} PDF'er hentet og gemt, {len(results) - len(stored)} uændrede eller fejlede")
+    return stored
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Henter, udtrækker, parser og gemmer nye kamprapporter i ét forløb")
+    parser.add_argument('--no-parser', dest='use_parser', action='store_false',
+                        help="Send alle sektioner til DeepSeek uden regelbaseret parsing")
+    parser.add_argument('--tournaments', nargs='+', default=None,
+                        help="Turneringer der crawles (standard: SCRAPER_TOURNAMENTS)")
+    parser.add_argument('--seasons', nargs='+', default=None,
+                        help="Sæsoner der crawles (standard: SCRAPER_SEASONS eller den aktuelle)")
+    parser.add_argument('--recheck', action='store_true',
+                        help="Tjek også allerede hentede PDF'er for rettelser")
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT,
+                        help="Maksimalt antal samtidige downloads pr. host")
+    parser.add_argument('--pdf-workers', type=int, default=PDF_WORKERS,
+                        help="Antal processer til PDF udtrækning")
+    parser.add_argument('--store-workers', type=int, default=STORE_WORKERS,
+                        help="Antal tråde der parser og gemmer samtidigt")
+    parser.add_argument('--pdf-backend', choices=list(PDF_BACKENDS), default=None,
+                        help="PDF backend (standard: PDF_BACKEND eller pypdf2)")
+    parser.add_argument('--interval', type=float, default=0,
+                        help="Kør igen med dette antal sekunders mellemrum (0 = kør én gang)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    if args.pdf_backend:
+        set_pdf_backend(args.pdf_backend)
+    while True:
+        try:
+            run_pipeline(use_parser=args.use_parser, tournaments=args.tournaments, seasons=args.seasons,
+                         recheck=args.recheck, per_host=args.per_host, pdf_workers=args.pdf_workers,
+                         store_workers=args.store_workers)
+        except Exception:
+            logging.error("Pipeline afsluttet med fejl", exc_info=True)
+            if not args.interval:
+                raise
+        if not args.interval:
+            break
+        logging.info(f"Venter {args.interval} sekunder til næste kørsel")
+        time.sleep(args.interval)
@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import logging
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+METRICS_DIR = 'logs'
+
+# Den fil der behandles i den aktuelle tråd/task, så sektionsfunktionerne ikke skal have filnavnet med
+_current_file = contextvars.ContextVar('current_file', default=None)
+
+_lock = threading.Lock()
+_run: Dict = {}
+
+
+def start_run(settings: Optional[Dict] = None):
+    """Nulstiller målingerne i starten af en process_pdf_files kørsel"""
+    with _lock:
+        _run.clear()
+        _run.update({
+            'started_at': datetime.now().isoformat(),
+            'started': time.perf_counter(),
+            'settings': settings or {},
+            'files': {}
+        })
+
+
+def set_current_file(filename: str):
+    """Markerer hvilken fil efterfølgende målinger i denne tråd/task hører til"""
+    _current_file.set(filename)
+
+
+def _file_entry(filename: Optional[str]) -> Optional[Dict]:
+    """Henter eller opretter målingerne for en fil - kaldes med _lock"""
+    if not _run:
+        return None
+    filename = filename or _current_file.get() or 'ukendt'
+    if filename not in _run['files']:
+        _run['files'][filename] = {'stages': {}, 'counters': {}, 'sections': {}}
+    return _run['files'][filename]
+
+
+def add_stage_time(stage: str, seconds: float, filename: Optional[str] = None):
+    """Lægger tid til et trin for filen"""
+    with _lock:
+        entry = _file_entry(filename)
+        if entry is not None:
+            entry['stages'][stage] = entry['stages'].get(stage, 0.0) + seconds
+
+
+@contextmanager
+def timed(stage: str, filename: Optional[str] = None, section_number: Optional[int] = None):
+    """Måler varigheden af en blok som et trin for filen og eventuelt sektionen"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        add_stage_time(stage, seconds, filename)
+        if section_number is not None:
+            add_section_metric(section_number, f"{stage}_seconds", seconds, filename)
+
+
+def add_counter(name: str, amount: float = 1, filename: Optional[str] = None):
+    """Tæller en værdi op for filen"""
+    with _lock:
+        entry = _file_entry(filename)
+        if entry is not None:
+            entry['counters'][name] = entry['counters'].get(name, 0) + amount
+
+
+def add_section_metric(section_number: int, name: str, amount: float = 1,
+                       filename: Optional[str] = None):
+    """Tæller en værdi op for en sektion og for filen samlet"""
+    with _lock:
+        entry = _file_entry(filename)
+        if entry is None:
+            return
+        section = entry['sections'].setdefault(str(section_number), {})
+        section[name] = section.get(name, 0) + amount
+        if not name.endswith('_seconds'):
+            entry['counters'][name] = entry['counters'].get(name, 0) + amount
+
+
+def _round_values(values: Dict) -> Dict:
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in values.items()}
+
+
+def get_run_metrics() -> Dict:
+    """
+    Returnerer kørslens målinger med totaler på tværs af filer.
+
+    Trin-tider er summer af varigheder. I async tilstand overlapper API kald,
+    så summen kan være større end kørslens samlede tid.
+    """
+    with _lock:
+        if not _run:
+            return {}
+
+        stage_totals: Dict[str, float] = {}
+        counter_totals: Dict[str, float] = {}
+        files = {}
+        for filename, entry in _run['files'].items():
+            for stage, seconds in entry['stages'].items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + seconds
+            for name, value in entry['counters'].items():
+                counter_totals[name] = counter_totals.get(name, 0) + value
+            files[filename] = {
+                'stages': _round_values(entry['stages']),
+                'counters': _round_values(entry['counters']),
+                'sections': {number: _round_values(values) for number, values in entry['sections'].items()}
+            }
+
+        return {
+            'started_at': _run['started_at'],
+            'wall_seconds': round(time.perf_counter() - _run['started'], 3),
+            'settings': _run['settings'],
+            'totals': {
+                'files': len(files),
+                'stages': _round_values(stage_totals),
+                'counters': _round_values(counter_totals)
+            },
+            'files': files
+        }
+
+
+def write_metrics(extra: Optional[Dict] = None) -> Optional[str]:
+    """
+    Skriver kørslens målinger som JSON til logs/metrics_<tidsstempel>.json.
+
+    Returns:
+        Optional[str]: Stien til filen, eller None hvis der ikke er målt noget
+    """
+    metrics = get_run_metrics()
+    if not metrics:
+        return None
+    metrics.update(extra or {})
+
+    if not os.path.exists(METRICS_DIR):
+        os.makedirs(METRICS_DIR)
+    path = os.path.join(METRICS_DIR, f"metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(metrics, f, ensure_ascii=False, indent=2)
+
+    logging.info(f"Målinger for kørslen gemt i {path}")
+    return path
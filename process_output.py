@@ -1,17 +1,40 @@
 import sqlite3
 import re
-from openai import OpenAI
+import asyncio
+import math
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
+import functools
+import contextvars
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 import os
 import shutil
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import json
+import argparse
 from dotenv import load_dotenv
 import logging
 from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from tqdm import tqdm
-from tenacity import retry, stop_after_attempt, wait_exponential
-from pdf import convert_pdf_to_text
+from tenacity import retry, stop_after_attempt, wait_exponential, RetryCallState
+from pdf import extract_pdf_text, extract_pdf_text_timed, available_backends, PDF_BACKENDS, DEFAULT_BACKEND
+from text_cache import hash_pdf_file, get_cached_text, store_text, get_text_cache_stats
+from parse_events import (parse_event_line, split_event_lines, group_event_lines, time_to_seconds,
+                          TIME_PATTERN)
+from report_diff import diff_report_lines
+from token_estimator import (estimate_tokens, estimate_lines_tokens, VERBOSE_EVENT_OUTPUT_TOKENS,
+                             COMPACT_EVENT_OUTPUT_TOKENS)
+from compact_format import COMPACT_FIELDS, decode_events
+from llm_cache import make_cache_key, get_cached_response, store_response, get_cache_stats
+from pipeline_metrics import (start_run, set_current_file, timed, add_counter, add_section_metric,
+                              add_stage_time, write_metrics)
+from league_db import sync_match_database
+from db_schema import ensure_column, ensure_schema, get_event_flags, get_event_sequences, load_event_sequences, EVENT_KEY_SQL
+from standardize_actions import standardize_parsed_event
+from rate_limiter import (configure_rate_limits, acquire, acquire_async, settle, report_success,
+                          report_rate_limited, parse_retry_after, get_limiter_stats)
 
 # Custom exceptions
 class HandballParserError(Exception):
@@ -26,6 +49,14 @@ class DatabaseError(HandballParserError):
     """Database related errors"""
     pass
 
+class RateLimitedError(APIError):
+    """API svarede 429 - ventetiden styres af den fælles rate limiter"""
+    pass
+
+class IncompleteReportError(HandballParserError):
+    """Nogle sektioner fejlede - de gemte sektioner bevares, og resten behandles ved næste kørsel"""
+    pass
+
 def setup_logging():
     if not os.path.exists('logs'):
         os.makedirs('logs')
@@ -62,16 +93,75 @@ def setup_logging():
 load_dotenv()
 setup_logging()
 
+# Kan peges mod en lokal stand-in server (se mock_deepseek_server.py)
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+MODEL_NAME = "deepseek-chat"
+TEMPERATURE = 0.1  # Lav temperatur for mere konsistente resultater
+
+NOT_PROCESSED_DIR = "Not_Processed"
+PROCESSED_DIR = "Processed"
+ERROR_DIR = "Error_Appeared"
+
+# Maksimalt antal samtidige DeepSeek kald i async tilstand
+MAX_CONCURRENT_REQUESTS = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8"))
+# Maksimalt antal PDF-filer der behandles samtidigt i async tilstand
+MAX_CONCURRENT_FILES = int(os.getenv("ASYNC_MAX_FILES", "4"))
+# Async tilstand skriver til SQLite fra én tråd, så upserts, linje-sammenligningen og
+# synkroniseringen af den samlede database ikke blokerer event loopet og API kaldene
+_db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='db_writer')
+
+# Opdeling af sektioner: "tokens" pakker hele hændelser efter budget, "fixed" bruger faste 24 linjer
+CHUNK_STRATEGY = os.getenv("CHUNK_STRATEGY", "tokens")
+FIXED_CHUNK_LINES = 24
+MAX_INPUT_TOKENS = int(os.getenv("CHUNK_MAX_INPUT_TOKENS", "6000"))
+MAX_OUTPUT_TOKENS = int(os.getenv("CHUNK_MAX_OUTPUT_TOKENS", "3500"))
+
+# PDF backend (PDF_BACKEND i .env) og i pipelined tilstand: processer der udtrækker PDF-tekst, og hvor mange tekster der må vente i køen
+PDF_BACKEND = DEFAULT_BACKEND
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PDF_QUEUE_SIZE = int(os.getenv("PDF_QUEUE_SIZE", str(2 * PDF_WORKERS)))
+
+# Gem DeepSeek svar på disk så genkørsler ikke betaler for de samme sektioner igen
+USE_LLM_CACHE = os.getenv("LLM_CACHE", "1") != "0"
+
+# Gem udtrukket PDF-tekst nøglet på PDF'ens SHA-256, så genbehandling springer udtrækningen over
+USE_TEXT_CACHE = os.getenv("PDF_TEXT_CACHE", "1") != "0"
+
+# Opdater også den samlede liga database (league_db.py) hver gang en kamp er gemt
+USE_LEAGUE_DB = os.getenv("LEAGUE_DB", "0") == "1"
+
+# Svarformat fra DeepSeek: "verbose" med nøgler på hver hændelse, "compact" med header og rækker
+RESPONSE_FORMATS = ("verbose", "compact")
+RESPONSE_FORMAT = os.getenv("DEEPSEEK_RESPONSE_FORMAT", "verbose")
+
 # DeepSeek API setup med retry
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
 def init_api_client():
     logging.info("Initialiserer DeepSeek API klient")
+    # Genforsøg styres af tenacity og rate limiteren, ikke af SDK'ets egne genforsøg
     return OpenAI(
         api_key=os.getenv("DEEPSEEK_API_KEY"),
-        base_url="https://api.deepseek.com"
+        base_url=DEEPSEEK_BASE_URL,
+        max_retries=0
     )
 
 client = init_api_client()
+async_client = None
+
+# league.db har én skriver ad gangen (se sync_league_db)
+_league_db_lock = threading.Lock()
+
+def get_async_client() -> AsyncOpenAI:
+    """Opretter den asynkrone DeepSeek klient første gang den skal bruges"""
+    global async_client
+    if async_client is None:
+        logging.info("Initialiserer asynkron DeepSeek API klient")
+        async_client = AsyncOpenAI(
+            api_key=os.getenv("DEEPSEEK_API_KEY"),
+            base_url=DEEPSEEK_BASE_URL,
+            max_retries=0
+        )
+    return async_client
 
 def extract_game_info(content: str) -> tuple:
     """Udtræk dato og holdnavne fra teksten"""
@@ -114,7 +204,8 @@ def create_database(content: str) -> tuple:
     try:
         # Udtræk kampinformation
         logging.debug("Udtrækker kampinformation")
-        date, home_team, away_team = extract_game_info(content)
+        with timed('extract_game_info'):
+            date, home_team, away_team = extract_game_info(content)
         
         # Opret database navn
         db_name = f"{date}_{home_team}_vs_{away_team}.db"
@@ -156,13 +247,42 @@ def create_database(content: str) -> tuple:
             Player2_Name TEXT,
             Goalkeeper_Number TEXT,
             Goalkeeper_Name TEXT,
-            Section_number INTEGER
+            Section_number INTEGER,
+            Source_line INTEGER,
+            time_seconds INTEGER,
+            is_shot INTEGER,
+            is_goal INTEGER,
+            is_save INTEGER,
+            is_penalty INTEGER,
+            half INTEGER,
+            Event_seq INTEGER,
+            Standardized INTEGER
+        )
+        ''')
+        
+        # Databaser fra før linje-sammenligningen mangler kolonnen
+        ensure_column(cursor, 'game_events', 'Source_line', 'INTEGER')
+        
+        # Rapportens hændelseslinjer, så en ny version kan sammenlignes linje for linje
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_lines (
+            Line_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            Line_index INTEGER NOT NULL,
+            Section_number INTEGER NOT NULL,
+            Line_text TEXT NOT NULL
         )
         ''')
         
         logging.debug("Opretter indekser")
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_time ON game_events(Time)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_team ON game_events(Team_initials)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_section ON game_events(Section_number)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_source_line ON game_events(Source_line)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_line_index ON report_lines(Line_index)')
+        
+        # Kamptiden i sekunder, de afledte kolonner og den naturlige nøgle - tilføjes og
+        # udfyldes i databaser fra før kolonnerne
+        ensure_schema(cursor)
         
         conn.commit()
         logging.info("Database struktur oprettet succesfuldt")
@@ -171,9 +291,8 @@ def create_database(content: str) -> tuple:
         logging.error(f"Fejl ved oprettelse af database: {str(e)}", exc_info=True)
         raise DatabaseError(f"Database fejl: {str(e)}")
 
-def extract_sections(content: str) -> List[str]:
-    """Udtræk sektioner fra Tid til KAMPHÆNDELSER eller Software og opdel i mindre sektioner"""
-    logging.info("Starter udtrækning af sektioner")
+def extract_main_sections(content: str) -> List[List[str]]:
+    """Udtræk hovedsektioner fra Tid til KAMPHÆNDELSER eller Software"""
     main_sections = []
     lines = content.split('\n')
     current_section = []
@@ -199,24 +318,114 @@ def extract_sections(content: str) -> List[str]:
         main_sections.append(current_section)
         logging.info(f"Gemte sidste hovedsektion med {len(current_section)} linjer")
     
+    return main_sections
+
+def chunk_fixed(main_sections: List[List[str]]) -> List[str]:
+    """Opdeler hovedsektionerne i faste delsektioner af FIXED_CHUNK_LINES linjer"""
     final_sections = []
     for section_num, main_section in enumerate(main_sections, 1):
         header = main_section[0]
         content_lines = main_section[1:]
         
-        for i in range(0, len(content_lines), 24):
-            subsection = [header] + content_lines[i:i+24]
+        for i in range(0, len(content_lines), FIXED_CHUNK_LINES):
+            subsection = [header] + content_lines[i:i+FIXED_CHUNK_LINES]
             final_sections.append('\n'.join(subsection))
             logging.info(f"Oprettet delsektion {len(final_sections)} fra hovedsektion {section_num} "
                         f"med {len(subsection)} linjer")
     
     return final_sections
 
+def chunk_by_tokens(main_sections: List[List[str]], max_input_tokens: int,
+                    max_output_tokens: int) -> List[str]:
+    """
+    Pakker hele hændelser i delsektioner indtil input- eller output-budgettet er brugt.
+
+    Input-budgettet dækker system prompten, headeren og linjerne. Output-budgettet
+    anslås pr. hændelse ud fra JSON formatet. En hændelse deles aldrig mellem to
+    delsektioner - en hændelse der alene overskrider budgettet får sin egen.
+    """
+    prompt_tokens = estimate_tokens(get_system_prompt())
+    final_sections = []
+    
+    for section_num, main_section in enumerate(main_sections, 1):
+        header = main_section[0]
+        base_tokens = prompt_tokens + estimate_lines_tokens([header])
+        
+        current_lines = []
+        input_tokens = base_tokens
+        output_tokens = 0
+        
+        for group in group_event_lines(main_section[1:]):
+            group_input = estimate_lines_tokens(group)
+            group_output = get_event_output_tokens() + group_input
+            
+            if current_lines and (input_tokens + group_input > max_input_tokens
+                                  or output_tokens + group_output > max_output_tokens):
+                final_sections.append('\n'.join([header] + current_lines))
+                logging.info(f"Oprettet delsektion {len(final_sections)} fra hovedsektion {section_num} "
+                             f"med {len(current_lines) + 1} linjer (~{input_tokens} input, "
+                             f"~{output_tokens} output tokens)")
+                current_lines = []
+                input_tokens = base_tokens
+                output_tokens = 0
+            
+            current_lines.extend(group)
+            input_tokens += group_input
+            output_tokens += group_output
+        
+        if current_lines:
+            final_sections.append('\n'.join([header] + current_lines))
+            logging.info(f"Oprettet delsektion {len(final_sections)} fra hovedsektion {section_num} "
+                         f"med {len(current_lines) + 1} linjer (~{input_tokens} input, "
+                         f"~{output_tokens} output tokens)")
+    
+    return final_sections
+
+def extract_sections(content: str, strategy: str = CHUNK_STRATEGY,
+                     max_input_tokens: int = MAX_INPUT_TOKENS,
+                     max_output_tokens: int = MAX_OUTPUT_TOKENS) -> List[str]:
+    """
+    Udtræk sektioner fra Tid til KAMPHÆNDELSER eller Software og opdel i mindre sektioner
+
+    Args:
+        content (str): Hele tekstindholdet fra PDF'en
+        strategy (str): "tokens" pakker hændelser efter token-budget, "fixed" bruger faste 24 linjer
+        max_input_tokens (int): Maksimalt anslået antal input tokens pr. delsektion
+        max_output_tokens (int): Maksimalt anslået antal output tokens pr. delsektion
+
+    Returns:
+        List[str]: Delsektioner med header øverst
+    """
+    logging.info("Starter udtrækning af sektioner")
+    main_sections = extract_main_sections(content)
+    
+    if strategy == "fixed":
+        return chunk_fixed(main_sections)
+    
+    final_sections = chunk_by_tokens(main_sections, max_input_tokens, max_output_tokens)
+    
+    # Rapportér hvor mange kald der spares i forhold til faste 24-linjers sektioner
+    fixed_count = sum(
+        math.ceil((len(main_section) - 1) / FIXED_CHUNK_LINES) for main_section in main_sections
+    )
+    logging.info(f"Token-baseret opdeling: {len(final_sections)} delsektioner i stedet for {fixed_count} "
+                 f"med faste {FIXED_CHUNK_LINES} linjer (sparer {fixed_count - len(final_sections)} kald)")
+    
+    return final_sections
+
+def get_event_output_tokens() -> int:
+    """Anslåede output tokens pr. hændelse for det valgte svarformat"""
+    if RESPONSE_FORMAT == "compact":
+        return COMPACT_EVENT_OUTPUT_TOKENS
+    return VERBOSE_EVENT_OUTPUT_TOKENS
+
 def get_system_prompt() -> str:
     """
     Returnerer system prompten der bruges til at instruere AI modellen.
     """
     logging.debug("Henter system prompt")
+    if RESPONSE_FORMAT == "compact":
+        return get_compact_system_prompt()
     return """Du er en assistent der hjælper med at analysere håndboldkampe.
 Din opgave er at konvertere kampbegivenheder til et struktureret JSON format.
 
@@ -248,44 +457,223 @@ Regler:
 5. Konverter alle handlinger til samme format som i inputtet
 """
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+def get_compact_system_prompt() -> str:
+    """
+    System prompt for det kompakte format: header rækken står her én gang, og svaret
+    indeholder kun en array pr. begivenhed.
+    """
+    columns = json.dumps(COMPACT_FIELDS, ensure_ascii=False)
+    return f"""Du er en assistent der hjælper med at analysere håndboldkampe.
+Din opgave er at konvertere kampbegivenheder til et kompakt JSON format.
+
+Kolonner (header række): {columns}
+
+Outputtet skal være i følgende format, uden header rækken:
+{{"rows": [["mm.ss", "score", "initialer", "handling", ...], ...]}}
+
+Kolonnerne betyder: Time (tid), ScoreUpdate (score hvis relevant), TeamInitials (holdets initialer),
+Action1 (primær handling), Position (position hvis relevant), PlayerNumber og PlayerName (spiller),
+Action2 (sekundær handling), Player2Number og Player2Name (anden spiller),
+GoalkeeperNumber og GoalkeeperName (målmand).
+
+Regler:
+1. Én række pr. begivenhed med værdierne i præcis kolonnernes rækkefølge
+2. Tid skal altid være i formatet "mm.ss" og står altid først
+3. Tomme felter skrives som "", og tomme felter i slutningen af en række udelades
+4. Alle værdier skrives som strenge
+5. Bevar de originale navne og numre præcist som de står
+6. Konverter alle handlinger til samme format som i inputtet
+"""
+
+def build_messages(section_text: str) -> List[Dict]:
+    """Bygger beskederne til DeepSeek for en sektion"""
+    return [
+        {"role": "system", "content": get_system_prompt()},
+        {"role": "user", "content": section_text}
+    ]
+
+def parse_api_response(content: str, section_number: int) -> List[Dict]:
+    """Parser og validerer svaret fra DeepSeek for en sektion"""
+    try:
+        parsed_data = json.loads(content)
+        events = decode_events(parsed_data)
+        
+        # Valider events
+        valid_events = []
+        for event in events:
+            if validate_event(event):
+                valid_events.append(event)
+            else:
+                logging.warning(f"Ugyldig begivenhed fundet i sektion {section_number}: {event}")
+        
+        add_section_metric(section_number, 'events_accepted', len(valid_events))
+        add_section_metric(section_number, 'events_from_llm', len(valid_events))
+        add_section_metric(section_number, 'events_rejected', len(events) - len(valid_events))
+        logging.info(f"Behandlet sektion {section_number}: {len(valid_events)} gyldige begivenheder fundet")
+        return valid_events
+        
+    except json.JSONDecodeError as je:
+        logging.error(f"JSON parsing fejl i sektion {section_number}: {str(je)}")
+        raise APIError(f"Kunne ikke parse API svar som JSON: {str(je)}")
+
+def get_section_cache_key(section_text: str) -> Optional[str]:
+    """Returnerer cache nøglen for en sektion, eller None hvis cachen er slået fra"""
+    if not USE_LLM_CACHE:
+        return None
+    return make_cache_key(MODEL_NAME, get_system_prompt(), section_text, TEMPERATURE)
+
+# Rate limit fejl må forsøges flere gange end andre fejl, da de kun betyder "vent"
+MAX_API_ATTEMPTS = 3
+MAX_RATE_LIMITED_ATTEMPTS = 8
+_exponential_wait = wait_exponential(multiplier=1, min=4, max=10)
+
+def stop_api_retries(retry_state: RetryCallState) -> bool:
+    """Stopper efter MAX_API_ATTEMPTS fejl, eller MAX_RATE_LIMITED_ATTEMPTS ved 429"""
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exception, RateLimitedError):
+        return retry_state.attempt_number >= MAX_RATE_LIMITED_ATTEMPTS
+    return retry_state.attempt_number >= MAX_API_ATTEMPTS
+
+def wait_api_retry(retry_state: RetryCallState) -> float:
+    """
+    Ventetid før næste forsøg.
+
+    Ved 429 ventes ikke her - den fælles pause i rate_limiter (Retry-After eller
+    fælles backoff) håndhæves når kaldet henter en plads igen.
+    """
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    if isinstance(exception, RateLimitedError):
+        return 0
+    return _exponential_wait(retry_state)
+
+def get_retry_after(error: RateLimitError) -> Optional[float]:
+    """Henter Retry-After fra et 429 svar hvis udbyderen har sendt den"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    return parse_retry_after(response.headers.get('retry-after'))
+
+def estimate_request_tokens(section_text: str) -> int:
+    """Anslår det samlede token forbrug (input + output) for en sektion"""
+    lines = section_text.split('\n')
+    input_tokens = estimate_tokens(get_system_prompt()) + estimate_lines_tokens(lines)
+    output_tokens = sum(
+        get_event_output_tokens() + estimate_lines_tokens(group)
+        for group in group_event_lines(lines[1:])
+    )
+    return input_tokens + output_tokens
+
+def get_usage_tokens(response) -> Optional[int]:
+    """Returnerer det faktiske token forbrug fra response.usage"""
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None) if usage else None
+
+def record_usage(response, section_number: int):
+    """Gemmer prompt og completion tokens fra response.usage i målingerne"""
+    usage = getattr(response, 'usage', None)
+    if not usage:
+        return
+    add_section_metric(section_number, 'prompt_tokens', getattr(usage, 'prompt_tokens', 0) or 0)
+    add_section_metric(section_number, 'completion_tokens', getattr(usage, 'completion_tokens', 0) or 0)
+
+def count_api_retry(retry_state: RetryCallState):
+    """Tæller et nyt forsøg for sektionen (section_number er andet argument)"""
+    if len(retry_state.args) > 1:
+        add_section_metric(retry_state.args[1], 'api_retries')
+
+@retry(stop=stop_api_retries, wait=wait_api_retry, before_sleep=count_api_retry, reraise=True)
 def process_section_with_deepseek(section_text: str, section_number: int) -> List[Dict]:
     """Process section with retry capability"""
     logging.debug(f"Starter behandling af sektion {section_number} med DeepSeek API")
     try:
+        cache_key = get_section_cache_key(section_text)
+        cached_content = get_cached_response(cache_key) if cache_key else None
+        if cached_content is not None:
+            logging.debug(f"Bruger gemt DeepSeek svar for sektion {section_number}")
+            add_section_metric(section_number, 'cache_hits')
+            return parse_api_response(cached_content, section_number)
+        
+        estimated_tokens = estimate_request_tokens(section_text)
+        acquire(estimated_tokens)
+        
         logging.debug("Sender anmodning til DeepSeek API")
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": get_system_prompt()},
-                {"role": "user", "content": section_text}
-            ],
-            response_format={"type": "json_object"},
-            temperature=0.1  # Lav temperatur for mere konsistente resultater
-        )
+        add_section_metric(section_number, 'api_calls')
+        with timed('api', section_number=section_number):
+            response = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=build_messages(section_text),
+                response_format={"type": "json_object"},
+                temperature=TEMPERATURE
+            )
+        record_usage(response, section_number)
+        settle(estimated_tokens, get_usage_tokens(response))
+        report_success()
         
         content = response.choices[0].message.content
         logging.debug("Modtog svar fra DeepSeek API")
+        events = parse_api_response(content, section_number)
         
-        try:
-            parsed_data = json.loads(content)
-            events = parsed_data.get("events", [])
-            
-            # Valider events
-            valid_events = []
-            for event in events:
-                if validate_event(event):
-                    valid_events.append(event)
-                else:
-                    logging.warning(f"Ugyldig begivenhed fundet i sektion {section_number}: {event}")
+        # Gem kun svar der kunne parses, så cachen aldrig leverer et defekt svar
+        if cache_key:
+            store_response(cache_key, content)
+        return events
             
-            logging.info(f"Behandlet sektion {section_number}: {len(valid_events)} gyldige begivenheder fundet")
-            return valid_events
+    except RateLimitError as e:
+        logging.warning(f"Rate limit i sektion {section_number}: {str(e)}")
+        add_section_metric(section_number, 'rate_limited')
+        report_rate_limited(get_retry_after(e))
+        raise RateLimitedError(f"Rate limit: {str(e)}")
+    except Exception as e:
+        logging.error(f"API fejl i sektion {section_number}: {str(e)}", exc_info=True)
+        raise APIError(f"API fejl: {str(e)}")
+
+@retry(stop=stop_api_retries, wait=wait_api_retry, before_sleep=count_api_retry, reraise=True)
+async def process_section_with_deepseek_async(section_text: str, section_number: int,
+                                             semaphore: asyncio.Semaphore) -> List[Dict]:
+    """
+    Asynkron udgave af process_section_with_deepseek med samme retry og validering
+
+    Semaphoren holdes kun under selve kaldet, så den er fri mens tenacity venter
+    mellem forsøgene, og andre sektioner kan bruge pladsen imens.
+    """
+    logging.debug(f"Starter asynkron behandling af sektion {section_number} med DeepSeek API")
+    try:
+        cache_key = get_section_cache_key(section_text)
+        cached_content = get_cached_response(cache_key) if cache_key else None
+        if cached_content is not None:
+            logging.debug(f"Bruger gemt DeepSeek svar for sektion {section_number}")
+            add_section_metric(section_number, 'cache_hits')
+            return parse_api_response(cached_content, section_number)
+        
+        estimated_tokens = estimate_request_tokens(section_text)
+        async with semaphore:
+            await acquire_async(estimated_tokens)
             
-        except json.JSONDecodeError as je:
-            logging.error(f"JSON parsing fejl i sektion {section_number}: {str(je)}")
-            raise APIError(f"Kunne ikke parse API svar som JSON: {str(je)}")
+            add_section_metric(section_number, 'api_calls')
+            with timed('api', section_number=section_number):
+                response = await get_async_client().chat.completions.create(
+                    model=MODEL_NAME,
+                    messages=build_messages(section_text),
+                    response_format={"type": "json_object"},
+                    temperature=TEMPERATURE
+                )
+        record_usage(response, section_number)
+        settle(estimated_tokens, get_usage_tokens(response))
+        report_success()
+        
+        content = response.choices[0].message.content
+        logging.debug(f"Modtog asynkront svar fra DeepSeek API for sektion {section_number}")
+        events = parse_api_response(content, section_number)
+        
+        if cache_key:
+            store_response(cache_key, content)
+        return events
             
+    except RateLimitError as e:
+        logging.warning(f"Rate limit i sektion {section_number}: {str(e)}")
+        add_section_metric(section_number, 'rate_limited')
+        report_rate_limited(get_retry_after(e))
+        raise RateLimitedError(f"Rate limit: {str(e)}")
     except Exception as e:
         logging.error(f"API fejl i sektion {section_number}: {str(e)}", exc_info=True)
         raise APIError(f"API fejl: {str(e)}")
@@ -323,14 +711,46 @@ def validate_event(event: Dict) -> bool:
     logging.debug("Begivenhed valideret succesfuldt")
     return True
 
-def save_events_batch(cursor: sqlite3.Cursor, events: List[Dict], section_number: int):
-    """Gem events i batches for bedre performance"""
+def save_events_batch(cursor: sqlite3.Cursor, events: List[Dict], section_number: int,
+                      source_lines: Optional[List[int]] = None):
+    """
+    Gem events i batches for bedre performance
+
+    Hændelser der allerede er gemt (samme naturlige nøgle, se db_schema.EVENT_KEY_SQL),
+    opdateres i stedet for at blive indsat igen, så et genforsøg eller en genkørsel
+    ikke giver dubletter.
+
+    Args:
+        source_lines (Optional[List[int]]): Line_id i report_lines for hver hændelse
+    """
     if not events:
         return
     
+    if source_lines is None:
+        source_lines = [None] * len(events)
+    
     try:
-        cursor.executemany('''
-            INSERT INTO game_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        keys = [
+            (time_to_seconds(event['Time']), event.get('TeamInitials') or '', event.get('Action1') or '',
+             event.get('PlayerNumber') or '')
+            for event in events
+        ]
+        sequences = get_event_sequences(keys, source_lines, load_event_sequences(cursor, keys))
+        
+        cursor.executemany(f'''
+            INSERT INTO game_events (
+                Time, Score_update, Team_initials, Action_1, Position, Player_number, Player_Name,
+                Action_2, Player2_Number, Player2_Name, Goalkeeper_Number, Goalkeeper_Name,
+                Section_number, Source_line, time_seconds, is_shot, is_goal, is_save, is_penalty, half,
+                Event_seq, Standardized
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT({EVENT_KEY_SQL}) DO UPDATE SET
+                Time = excluded.Time, Score_update = excluded.Score_update, Position = excluded.Position,
+                Player_Name = excluded.Player_Name, Action_2 = excluded.Action_2,
+                Player2_Number = excluded.Player2_Number, Player2_Name = excluded.Player2_Name,
+                Goalkeeper_Number = excluded.Goalkeeper_Number, Goalkeeper_Name = excluded.Goalkeeper_Name,
+                Section_number = excluded.Section_number, Source_line = excluded.Source_line,
+                Standardized = excluded.Standardized
         ''', [(
             event.get('Time'),
             event.get('ScoreUpdate'),
@@ -344,79 +764,704 @@ def save_events_batch(cursor: sqlite3.Cursor, events: List[Dict], section_number
             event.get('Player2Name'),
             event.get('GoalkeeperNumber'),
             event.get('GoalkeeperName'),
-            section_number
-        ) for event in events])
+            section_number,
+            source_line,
+            time_to_seconds(event['Time']),
+            *get_event_flags(event.get('Action1'), time_to_seconds(event['Time'])),
+            sequence
+        ) for event, source_line, sequence in zip(events, source_lines, sequences)])
     except Exception as e:
         logging.error(f"Database fejl ved batch insert: {str(e)}", exc_info=True)
         raise DatabaseError(f"Database fejl: {str(e)}")
 
-def process_handball_file(filename: str):
-    logging.info(f"Starter behandling af fil: {filename}")
+def load_report_lines(cursor: sqlite3.Cursor) -> List[Tuple[int, str]]:
+    """Returnerer (Line_id, tekst) for de gemte hændelseslinjer i rapportens rækkefølge"""
+    cursor.execute('SELECT Line_id, Line_text FROM report_lines ORDER BY Line_index, Line_id')
+    return cursor.fetchall()
+
+def plan_report_update(cursor: sqlite3.Cursor,
+                       sections: List[str]) -> List[Tuple[int, str, List[Tuple[int, str]]]]:
+    """
+    Sammenligner rapporten med den gemte version linje for linje.
+
+    Fjernede og ændrede linjer slettes sammen med deres hændelser, uændrede linjer
+    får deres nye position og sektion. Kun nye og ændrede linjer skal parses.
+    Da linjer og hændelser gemmes i samme transaktion, er en afbrudt kørsel
+    blot en version hvor de manglende linjer stadig er "nye".
+
+    Returns:
+        List[Tuple[int, str, List[Tuple[int, str]]]]: For hver sektion med nye
+        linjer: (Section_number, header, [(position, linje)])
+    """
+    headers = {}
+    new_lines = []
+    line_sections = []
+    for section_num, section in enumerate(sections, 1):
+        header, lines = split_event_lines(section)
+        headers[section_num] = header
+        new_lines.extend(lines)
+        line_sections.extend([section_num] * len(lines))
+    
+    old_lines = load_report_lines(cursor)
+    if not old_lines:
+        cursor.execute('SELECT COUNT(*) FROM game_events')
+        legacy_count = cursor.fetchone()[0]
+        if legacy_count:
+            # Hændelser fra før linjerne blev gemt kan ikke knyttes til en linje
+            logging.warning(f"Sletter {legacy_count} hændelser uden kildelinje og indlæser rapporten forfra")
+            cursor.execute('DELETE FROM game_events')
+    
+    diff = diff_report_lines(old_lines, new_lines)
+    
+    cursor.executemany('DELETE FROM game_events WHERE Source_line = ?', [(line_id,) for line_id in diff['removed']])
+    cursor.executemany('DELETE FROM report_lines WHERE Line_id = ?', [(line_id,) for line_id in diff['removed']])
+    cursor.executemany('UPDATE report_lines SET Line_index = ?, Section_number = ? WHERE Line_id = ?', [
+        (position, line_sections[position], line_id) for line_id, position in diff['unchanged']
+    ])
+    cursor.executemany('UPDATE game_events SET Section_number = ? WHERE Source_line = ?', [
+        (line_sections[position], line_id) for line_id, position in diff['unchanged']
+    ])
+    
+    added_by_section: Dict[int, List[Tuple[int, str]]] = {}
+    for position in diff['added']:
+        added_by_section.setdefault(line_sections[position], []).append((position, new_lines[position]))
+    
+    add_counter('lines_unchanged', len(diff['unchanged']))
+    add_counter('lines_removed', len(diff['removed']))
+    add_counter('lines_added', len(diff['added']))
+    add_counter('sections_skipped', len(sections) - len(added_by_section))
+    if old_lines:
+        logging.info(f"Rapport sammenlignet med gemt version: {len(diff['unchanged'])} uændrede, "
+                     f"{len(diff['removed'])} fjernede og {len(diff['added'])} nye linjer "
+                     f"i {len(added_by_section)} af {len(sections)} sektioner")
+    
+    return [
+        (section_num, headers[section_num], added_by_section[section_num])
+        for section_num in sorted(added_by_section)
+    ]
+
+def get_database_path(conn: sqlite3.Connection) -> str:
+    """Stien til databasefilen bag forbindelsen"""
+    return conn.execute('PRAGMA database_list').fetchone()[2]
+
+def get_database_size(conn: sqlite3.Connection) -> int:
+    """Størrelsen i bytes af databasefilen bag forbindelsen"""
+    db_path = get_database_path(conn)
+    return os.path.getsize(db_path) if db_path and os.path.exists(db_path) else 0
+
+def sync_league_db(conn: sqlite3.Connection):
+    """
+    Kopierer kampen til den samlede database når LEAGUE_DB=1
+
+    Synkroniseringen sker under en lås, da flere tråde (fx pipeline.py's
+    store workers) ellers skriver til league.db samtidig.
+    """
+    if not USE_LEAGUE_DB:
+        return
+    with timed('league_db_sync'):
+        with _league_db_lock:
+            sync_match_database(get_database_path(conn))
+
+def save_section_lines(cursor: sqlite3.Cursor, section_number: int,
+                       new_lines: List[Tuple[int, str]], line_events: List[Tuple[int, Dict]]):
+    """
+    Gemmer sektionens nye linjer og deres hændelser.
+
+    Hændelserne standardiseres som i standardize_actions.py før de gemmes, så de
+    skrives én gang i deres endelige form. Kalderen committer, så linjer og hændelser gemmes i samme transaktion.
+
+    Args:
+        new_lines (List[Tuple[int, str]]): (position i rapporten, linje) for de nye linjer
+        line_events (List[Tuple[int, Dict]]): (indeks i new_lines, hændelse)
+    """
+    try:
+        line_ids = []
+        for position, line in new_lines:
+            cursor.execute(
+                'INSERT INTO report_lines (Line_index, Section_number, Line_text) VALUES (?, ?, ?)',
+                (position, section_number, line)
+            )
+            line_ids.append(cursor.lastrowid)
+    except Exception as e:
+        logging.error(f"Database fejl ved gemning af linjer i sektion {section_number}: {str(e)}", exc_info=True)
+        raise DatabaseError(f"Database fejl: {str(e)}")
     
+    with timed('standardize', section_number=section_number):
+        events = [standardize_parsed_event(event) for _, event in line_events]
+    add_section_metric(section_number, 'events_standardized', sum(
+        1 for (_, event), standardized in zip(line_events, events) if standardized is not event
+    ))
+    save_events_batch(cursor, events, section_number, [line_ids[index] for index, _ in line_events])
+    add_section_metric(section_number, 'bytes_written', sum(
+        len(value.encode('utf-8')) for event in events for value in event.values() if isinstance(value, str)
+    ))
+
+def parse_section_locally(lines: List[str], section_number: int) -> Tuple[List[Tuple[int, Dict]], List[int]]:
+    """
+    Parser sektionens linjer regelbaseret.
+
+    Returns:
+        Tuple[List[Tuple[int, Dict]], List[int]]: (linjeindeks, valideret begivenhed) og
+        indeks for de linjer der skal sendes til DeepSeek
+    """
+    line_events = []
+    unparsed = []
+    rejected = 0
+    with timed('local_parse', section_number=section_number):
+        for index, line in enumerate(lines):
+            event = parse_event_line(line)
+            if event is None:
+                unparsed.append(index)
+            elif validate_event(event):
+                line_events.append((index, event))
+            else:
+                rejected += 1
+    
+    add_section_metric(section_number, 'events_accepted', len(line_events))
+    add_section_metric(section_number, 'events_parsed_locally', len(line_events))
+    add_section_metric(section_number, 'events_rejected', rejected)
+    add_section_metric(section_number, 'lines_to_llm', len(unparsed))
+    logging.info(f"Sektion {section_number}: {len(line_events)} begivenheder parset regelbaseret, "
+                 f"{len(unparsed)} linjer til DeepSeek")
+    return line_events, unparsed
+
+def attribute_events(events: List[Dict], lines: List[str], indices: List[int]) -> List[Tuple[int, Dict]]:
+    """
+    Knytter hændelser fra DeepSeek til de linjer de kom fra ud fra kamptiden.
+
+    Har flere linjer samme tid, fordeles hændelserne på dem i rækkefølge. En
+    hændelse uden linje med samme tid logges og knyttes til linjen med den nærmeste tid.
+    """
+    by_time: Dict[int, List[int]] = {}
+    for index in indices:
+        match = TIME_PATTERN.match(lines[index])
+        if match:
+            by_time.setdefault(int(match.group(1)) * 60 + int(match.group(2)), []).append(index)
+    
+    used: Dict[int, int] = {}
+    line_events = []
+    for event in events:
+        seconds = time_to_seconds(event['Time'])
+        candidates = by_time.get(seconds)
+        if candidates:
+            count = used.get(seconds, 0)
+            used[seconds] = count + 1
+            line_events.append((candidates[min(count, len(candidates) - 1)], event))
+        elif by_time:
+            nearest = min(by_time, key=lambda line_seconds: abs(line_seconds - seconds))
+            logging.warning(f"Hændelse kl. {event['Time']} fra DeepSeek matcher ingen sendt linje - "
+                            f"knyttes til linjen {lines[by_time[nearest][0]]!r}")
+            line_events.append((by_time[nearest][0], event))
+        else:
+            logging.warning(f"Hændelse kl. {event['Time']} fra DeepSeek matcher ingen sendt linje - "
+                            f"knyttes til den første sendte linje")
+            line_events.append((indices[0], event))
+    return line_events
+
+def merge_events(events: List[Tuple[int, Dict]], fallback_events: List[Tuple[int, Dict]]) -> List[Tuple[int, Dict]]:
+    """Fletter DeepSeek begivenhederne ind på deres plads i tidslinjen"""
+    merged = events + fallback_events
+    merged.sort(key=lambda line_event: time_to_seconds(line_event[1]['Time']))
+    return merged
+
+def get_fallback_text(header: str, lines: List[str], indices: List[int]) -> str:
+    """Teksten der sendes til DeepSeek: sektionens header og de valgte linjer"""
+    return '\n'.join([header] + [lines[index] for index in indices])
+
+def process_section_lines(header: str, lines: List[str], section_number: int,
+                          use_parser: bool = True) -> List[Tuple[int, Dict]]:
+    """
+    Behandler linjer regelbaseret og sender kun linjer der ikke kan parses til DeepSeek.
+
+    Args:
+        header (str): Sektionens header
+        lines (List[str]): Hændelseslinjerne der skal behandles
+        section_number (int): Sektionens nummer
+        use_parser (bool): Hvis False sendes alle linjer til DeepSeek som hidtil
+
+    Returns:
+        List[Tuple[int, Dict]]: (linjeindeks, valideret begivenhed) sorteret efter kamptid
+    """
+    if use_parser:
+        line_events, unparsed = parse_section_locally(lines, section_number)
+    else:
+        line_events, unparsed = [], list(range(len(lines)))
+    
+    if not unparsed:
+        return line_events
+    
+    fallback_events = process_section_with_deepseek(get_fallback_text(header, lines, unparsed), section_number)
+    return merge_events(line_events, attribute_events(fallback_events, lines, unparsed))
+
+async def process_section_lines_async(header: str, lines: List[str], section_number: int, use_parser: bool,
+                                      semaphore: asyncio.Semaphore) -> List[Tuple[int, Dict]]:
+    """Asynkron udgave af process_section_lines hvor semaphoren begrænser samtidige DeepSeek kald"""
+    if use_parser:
+        line_events, unparsed = parse_section_locally(lines, section_number)
+    else:
+        line_events, unparsed = [], list(range(len(lines)))
+    
+    if not unparsed:
+        return line_events
+    
+    fallback_events = await process_section_with_deepseek_async(
+        get_fallback_text(header, lines, unparsed), section_number, semaphore
+    )
+    
+    return merge_events(line_events, attribute_events(fallback_events, lines, unparsed))
+
+def read_handball_file(filename: str) -> str:
+    """Læser tekstfilen"""
     if not os.path.exists(filename):
         logging.error(f"Filen findes ikke: {filename}")
         raise FileNotFoundError(f"Filen findes ikke: {filename}")
     
+    logging.debug(f"Åbner fil: {filename}")
+    with timed('read_text'):
+        with open(filename, 'r', encoding='utf-8') as file:
+            content = file.read()
+    logging.info(f"Læste {len(content)} tegn fra filen")
+    return content
+
+def prepare_handball_content(content: str) -> Tuple[sqlite3.Connection, sqlite3.Cursor, List[str]]:
+    """Opretter databasen og udtrækker sektionerne fra rapportens tekst"""
     if not os.getenv("DEEPSEEK_API_KEY"):
         logging.error("DEEPSEEK_API_KEY mangler i .env filen")
         raise ValueError("DEEPSEEK_API_KEY er ikke sat i .env filen")
     
-    try:
-        logging.debug(f"Åbner fil: {filename}")
-        with open(filename, 'r', encoding='utf-8') as file:
-            content = file.read()
-            logging.info(f"Læste {len(content)} tegn fra filen")
-        
-        logging.debug("Opretter database")
-        conn, cursor = create_database(content)
-        
-        logging.debug("Udtrækker sektioner")
+    add_counter('text_chars', len(content))
+    
+    logging.debug("Opretter database")
+    conn, cursor = create_database(content)
+    
+    logging.debug("Udtrækker sektioner")
+    with timed('extract_sections'):
         sections = extract_sections(content)
-        logging.info(f"Fandt {len(sections)} sektioner at behandle")
+    logging.info(f"Fandt {len(sections)} sektioner at behandle")
+    add_counter('sections', len(sections))
+    
+    return conn, cursor, sections
+
+def check_failed_sections(failed_sections: List[int]):
+    """
+    Kaster IncompleteReportError hvis nogle sektioner fejlede.
+
+    De andre sektioner er committet med deres linjer, så filen skal blot
+    blive i Not_Processed - næste kørsel behandler kun de linjer der mangler.
+    """
+    if failed_sections:
+        raise IncompleteReportError(
+            f"{len(failed_sections)} sektioner fejlede: {', '.join(map(str, failed_sections))}"
+        )
+
+def keep_incomplete_pdf(pdf_file: str, error: IncompleteReportError):
+    """Logger at en PDF bliver i Not_Processed fordi nogle sektioner fejlede"""
+    logging.warning(f"{pdf_file} bliver i {NOT_PROCESSED_DIR} og genoptages ved næste kørsel: {str(error)}")
+    add_counter('incomplete_files')
+
+def process_handball_file(filename: str, use_parser: bool = True):
+    logging.info(f"Starter behandling af fil: {filename}")
+    process_handball_content(read_handball_file(filename), use_parser)
+
+def process_handball_content(content: str, use_parser: bool = True):
+    """Behandler en rapports tekst og gemmer hændelserne i kampens database"""
+    try:
+        conn, cursor, sections = prepare_handball_content(content)
+        db_size_before = get_database_size(conn)
+        pending = plan_report_update(cursor, sections)
+        conn.commit()
         
         total_events = 0
+        failed_sections = []
         
-        with tqdm(total=len(sections), desc="Behandler sektioner") as pbar:
-            for section_num, section in enumerate(sections, 1):
-                logging.debug(f"Behandler sektion {section_num}/{len(sections)}")
+        with tqdm(total=len(sections), initial=len(sections) - len(pending),
+                  desc="Behandler sektioner") as pbar:
+            for section_num, header, new_lines in pending:
+                logging.debug(f"Behandler {len(new_lines)} nye linjer i sektion {section_num}/{len(sections)}")
                 try:
-                    events = process_section_with_deepseek(section, section_num)
-                    if events:
-                        logging.debug(f"Gemmer {len(events)} begivenheder fra sektion {section_num}")
-                        save_events_batch(cursor, events, section_num)
-                        total_events += len(events)
-                        
-                    conn.commit()
+                    events = process_section_lines(header, [line for _, line in new_lines], section_num,
+                                                   use_parser)
+                    logging.debug(f"Gemmer {len(events)} begivenheder fra sektion {section_num}")
+                    with timed('db_write', section_number=section_num):
+                        save_section_lines(cursor, section_num, new_lines, events)
+                        conn.commit()
+                    add_section_metric(section_num, 'events_saved', len(events))
+                    total_events += len(events)
+                    
                     logging.debug(f"Sektion {section_num} behandlet succesfuldt")
                     pbar.update(1)
                     pbar.set_description(f"Sektion {section_num}/{len(sections)}")
                 except (APIError, DatabaseError) as e:
+                    conn.rollback()
                     logging.error(f"Fejl i sektion {section_num}: {str(e)}", exc_info=True)
+                    failed_sections.append(section_num)
                     continue
         
+        add_counter('db_file_growth_bytes', get_database_size(conn) - db_size_before)
+        sync_league_db(conn)
         conn.close()
         logging.info(f"Database forbindelse lukket")
         logging.info(f"Behandling afsluttet. I alt {total_events} begivenheder gemt i databasen!")
     except Exception as e:
         logging.error(f"Kritisk fejl under behandling af fil: {str(e)}", exc_info=True)
         raise
+    
+    check_failed_sections(failed_sections)
 
-def process_pdf_files():
-    """Håndterer PDF-filer fra Not_Processed mappen"""
-    logging.info("Starter behandling af PDF-filer")
+async def process_handball_file_async(filename: str, use_parser: bool = True,
+                                      semaphore: Optional[asyncio.Semaphore] = None):
+    """
+    Behandler en tekstfil med samtidige DeepSeek kald.
+
+    Alle sektioner med nye linjer sendes afsted med det samme (begrænset af
+    semaphoren), men resultaterne gemmes og committes i Section_number
+    rækkefølge, så databasen bliver identisk med en seriel kørsel.
+    """
+    logging.info(f"Starter asynkron behandling af fil: {filename}")
+    await process_handball_content_async(read_handball_file(filename), use_parser, semaphore)
+
+async def run_db_write(func, *args):
+    """Kører func i skrivetråden med kalderens contextvars (filen i metrikkerne)"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_db_writer, functools.partial(context.run, func, *args))
+
+async def process_handball_content_async(content: str, use_parser: bool = True,
+                                         semaphore: Optional[asyncio.Semaphore] = None):
+    """
+    Asynkron udgave af process_handball_content.
+
+    Forbindelsen oprettes og bruges kun i skrivetråden (run_db_write), så event
+    loopet kun venter på DeepSeek og aldrig på SQLite.
+    """
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    
+    def open_report():
+        conn, cursor, sections = prepare_handball_content(content)
+        db_size_before = get_database_size(conn)
+        pending = plan_report_update(cursor, sections)
+        conn.commit()
+        return conn, cursor, sections, db_size_before, pending
+    
+    def save_section(section_num: int, new_lines: List[Tuple[int, str]], events: List[Tuple[int, Dict]]):
+        with timed('db_write', section_number=section_num):
+            save_section_lines(cursor, section_num, new_lines, events)
+            conn.commit()
+    
+    def close_report():
+        add_counter('db_file_growth_bytes', get_database_size(conn) - db_size_before)
+        sync_league_db(conn)
+        conn.close()
+    
+    try:
+        conn, cursor, sections, db_size_before, pending = await run_db_write(open_report)
+        
+        tasks = [
+            (section_num, new_lines,
+             asyncio.create_task(process_section_lines_async(
+                 header, [line for _, line in new_lines], section_num, use_parser, semaphore
+             )))
+            for section_num, header, new_lines in pending
+        ]
+        
+        total_events = 0
+        failed_sections = []
+        
+        try:
+            with tqdm(total=len(sections), initial=len(sections) - len(pending),
+                      desc="Behandler sektioner") as pbar:
+                for section_num, new_lines, task in tasks:
+                    try:
+                        events = await task
+                        logging.debug(f"Gemmer {len(events)} begivenheder fra sektion {section_num}")
+                        await run_db_write(save_section, section_num, new_lines, events)
+                        add_section_metric(section_num, 'events_saved', len(events))
+                        total_events += len(events)
+                        
+                        logging.debug(f"Sektion {section_num} behandlet succesfuldt")
+                        pbar.update(1)
+                        pbar.set_description(f"Sektion {section_num}/{len(sections)}")
+                    except (APIError, DatabaseError) as e:
+                        await run_db_write(conn.rollback)
+                        logging.error(f"Fejl i sektion {section_num}: {str(e)}", exc_info=True)
+                        failed_sections.append(section_num)
+                        continue
+        finally:
+            # Stop resterende kald hvis behandlingen af filen afbrydes
+            for _, _, task in tasks:
+                if not task.done():
+                    task.cancel()
+            await run_db_write(close_report)
+            logging.info(f"Database forbindelse lukket")
+        
+        logging.info(f"Behandling afsluttet. I alt {total_events} begivenheder gemt i databasen!")
+    except Exception as e:
+        logging.error(f"Kritisk fejl under behandling af fil: {str(e)}", exc_info=True)
+        raise
     
-    not_processed_dir = "Not_Processed"
-    processed_dir = "Processed"
-    error_dir = "Error_Appeared"
+    check_failed_sections(failed_sections)
+
+def move_pdf_file(pdf_path: str, target_dir: str):
+    """Flytter en PDF-fil til target_dir"""
+    pdf_file = os.path.basename(pdf_path)
+    logging.debug(f"Flytter {pdf_file} til {target_dir}")
+    shutil.move(pdf_path, os.path.join(target_dir, pdf_file))
+    logging.info(f"Flyttet {pdf_file} til {target_dir}")
+
+def get_cached_pdf_text(pdf_path: str, filename: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Slår PDF'ens tekst op i tekst cachen.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: PDF'ens SHA-256 (None når cachen er slået fra)
+        og den gemte tekst (None ved cache miss)
+    """
+    if not USE_TEXT_CACHE:
+        return None, None
     
+    pdf_hash = hash_pdf_file(pdf_path)
+    text = get_cached_text(pdf_hash, PDF_BACKEND)
+    if text is not None:
+        logging.info(f"Bruger gemt tekst for {os.path.basename(pdf_path)} fra tekst cachen")
+        add_counter('text_cache_hits', filename=filename)
+    return pdf_hash, text
+
+def store_pdf_text(pdf_hash: Optional[str], text: str):
+    """Gemmer den udtrukne tekst i tekst cachen"""
+    if pdf_hash:
+        store_text(pdf_hash, text, PDF_BACKEND)
+
+def prepare_directories() -> List[str]:
+    """Opretter manglende mapper og returnerer PDF-filerne i Not_Processed"""
     # Tjek om alle nødvendige mapper eksisterer
-    for dir_name in [not_processed_dir, processed_dir, error_dir]:
+    for dir_name in [NOT_PROCESSED_DIR, PROCESSED_DIR, ERROR_DIR]:
         if not os.path.exists(dir_name):
             logging.info(f"Opretter manglende mappe: {dir_name}")
             os.makedirs(dir_name)
     
+    return [f for f in os.listdir(NOT_PROCESSED_DIR) if f.lower().endswith('.pdf')]
+
+async def process_pdf_file_async(pdf_file: str, use_parser: bool, semaphore: asyncio.Semaphore):
+    """Udtrækker og behandler en enkelt PDF-fil i async tilstand"""
+    pdf_path = os.path.join(NOT_PROCESSED_DIR, pdf_file)
+    
+    logging.info(f"Starter asynkron behandling af PDF-fil: {pdf_file}")
+    set_current_file(pdf_file)
+    loop = asyncio.get_running_loop()
+    
+    try:
+        pdf_hash, text = get_cached_pdf_text(pdf_path)
+        if text is None:
+            # PDF udtrækningen er CPU-bundet og køres udenfor event loopet
+            with timed('pdf_extraction'):
+                text = await loop.run_in_executor(None, extract_pdf_text, pdf_path, PDF_BACKEND)
+            store_pdf_text(pdf_hash, text)
+        
+        await process_handball_content_async(text, use_parser, semaphore)
+        move_pdf_file(pdf_path, PROCESSED_DIR)
+        
+    except IncompleteReportError as e:
+        keep_incomplete_pdf(pdf_file, e)
+    except Exception as e:
+        logging.error(f"Fejl under behandling af {pdf_file}: {str(e)}", exc_info=True)
+        add_counter('failed_files')
+        try:
+            move_pdf_file(pdf_path, ERROR_DIR)
+        except Exception as move_error:
+            logging.error(f"Kunne ikke flytte fejlet fil til {ERROR_DIR}: {str(move_error)}", exc_info=True)
+
+async def process_pdf_files_async(pdf_files: List[str], use_parser: bool, concurrency: int):
+    """
+    Behandler PDF-filerne samtidigt med én fælles grænse for DeepSeek kald
+
+    Højst MAX_CONCURRENT_FILES filer er i gang ad gangen, så tekst og
+    sektioner ikke ligger i hukommelsen for alle filer på én gang.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    file_slots = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+    
+    async def process_with_slot(pdf_file: str):
+        async with file_slots:
+            await process_pdf_file_async(pdf_file, use_parser, semaphore)
+    
+    await asyncio.gather(*(process_with_slot(pdf_file) for pdf_file in pdf_files))
+
+def submit_pdf_extractions(pdf_files: List[str], pool: ProcessPoolExecutor, text_queue: queue.Queue):
+    """
+    Sender PDF-filerne til process pool'en og lægger (fil, hash, future) i køen.
+
+    put blokerer når køen er fuld, så udtrækningen højst kommer PDF_QUEUE_SIZE
+    filer foran behandlingen, og hukommelsesforbruget forbliver fladt. Filer der
+    findes i tekst cachen sendes ikke til pool'en, men lægges i køen med en
+    færdig future og uden hash, så teksten ikke gemmes igen.
+    """
+    try:
+        for pdf_file in pdf_files:
+            pdf_path = os.path.join(NOT_PROCESSED_DIR, pdf_file)
+            pdf_hash, text = get_cached_pdf_text(pdf_path, pdf_file)
+            if text is not None:
+                future = Future()
+                future.set_result((text, 0.0))
+                text_queue.put((pdf_file, None, future))
+                continue
+            future = pool.submit(extract_pdf_text_timed, pdf_path, PDF_BACKEND)
+            text_queue.put((pdf_file, pdf_hash, future))
+    finally:
+        text_queue.put(None)
+
+def process_extracted_pdf(pdf_file: str, pdf_hash: Optional[str], future: Future, use_parser: bool):
+    """Behandler teksten fra en udtrukket PDF direkte fra hukommelsen"""
+    pdf_path = os.path.join(NOT_PROCESSED_DIR, pdf_file)
+    logging.info(f"Starter behandling af PDF-fil: {pdf_file}")
+    set_current_file(pdf_file)
+    
+    try:
+        with timed('pdf_wait'):
+            text, seconds = future.result()
+        add_stage_time('pdf_extraction', seconds)
+        store_pdf_text(pdf_hash, text)
+        
+        process_handball_content(text, use_parser)
+        move_pdf_file(pdf_path, PROCESSED_DIR)
+        
+    except IncompleteReportError as e:
+        keep_incomplete_pdf(pdf_file, e)
+    except Exception as e:
+        logging.error(f"Fejl under behandling af {pdf_file}: {str(e)}", exc_info=True)
+        add_counter('failed_files')
+        try:
+            move_pdf_file(pdf_path, ERROR_DIR)
+        except Exception as move_error:
+            logging.error(f"Kunne ikke flytte fejlet fil til {ERROR_DIR}: {str(move_error)}", exc_info=True)
+
+async def process_extracted_pdf_async(pdf_file: str, pdf_hash: Optional[str], future: Future,
+                                      use_parser: bool, semaphore: asyncio.Semaphore):
+    """Asynkron udgave af process_extracted_pdf"""
+    pdf_path = os.path.join(NOT_PROCESSED_DIR, pdf_file)
+    logging.info(f"Starter asynkron behandling af PDF-fil: {pdf_file}")
+    set_current_file(pdf_file)
+    
+    try:
+        with timed('pdf_wait'):
+            text, seconds = await asyncio.wrap_future(future)
+        add_stage_time('pdf_extraction', seconds)
+        store_pdf_text(pdf_hash, text)
+        
+        await process_handball_content_async(text, use_parser, semaphore)
+        move_pdf_file(pdf_path, PROCESSED_DIR)
+        
+    except IncompleteReportError as e:
+        keep_incomplete_pdf(pdf_file, e)
+    except Exception as e:
+        logging.error(f"Fejl under behandling af {pdf_file}: {str(e)}", exc_info=True)
+        add_counter('failed_files')
+        try:
+            move_pdf_file(pdf_path, ERROR_DIR)
+        except Exception as move_error:
+            logging.error(f"Kunne ikke flytte fejlet fil til {ERROR_DIR}: {str(move_error)}", exc_info=True)
+
+async def consume_extracted_pdfs_async(text_queue: queue.Queue, use_parser: bool, concurrency: int):
+    """
+    Tager udtrukne PDF'er fra køen og behandler dem med samtidige DeepSeek kald
+
+    Hver PDF behandles som sin egen task, højst MAX_CONCURRENT_FILES ad gangen.
+    Den næste tages først fra køen når der er en ledig plads, så køen stadig
+    holder udtrækningen tilbage.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    file_slots = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+    loop = asyncio.get_running_loop()
+    tasks = set()
+    
+    def release_slot(task: asyncio.Task):
+        tasks.discard(task)
+        file_slots.release()
+    
+    while True:
+        await file_slots.acquire()
+        item = await loop.run_in_executor(None, text_queue.get)
+        if item is None:
+            file_slots.release()
+            break
+        task = asyncio.create_task(
+            process_extracted_pdf_async(item[0], item[1], item[2], use_parser, semaphore)
+        )
+        tasks.add(task)
+        task.add_done_callback(release_slot)
+    
+    await asyncio.gather(*tasks)
+
+def process_pdf_files_pipelined(pdf_files: List[str], use_parser: bool, async_mode: bool,
+                                concurrency: int, workers: int):
+    """
+    Udtrækker PDF-tekst i en process pool mens de færdige tekster behandles.
+
+    Teksten overleveres i hukommelsen gennem en begrænset kø i stedet for via
+    midlertidige .txt filer. Filerne behandles i samme rækkefølge som serielt,
+    i async tilstand flere ad gangen (MAX_CONCURRENT_FILES).
+    """
+    text_queue = queue.Queue(maxsize=PDF_QUEUE_SIZE)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        producer = threading.Thread(target=submit_pdf_extractions, args=(pdf_files, pool, text_queue),
+                                    daemon=True)
+        producer.start()
+        
+        if async_mode:
+            asyncio.run(consume_extracted_pdfs_async(text_queue, use_parser, concurrency))
+        else:
+            while True:
+                item = text_queue.get()
+                if item is None:
+                    break
+                process_extracted_pdf(item[0], item[1], item[2], use_parser)
+        
+        producer.join()
+
+def set_pdf_backend(backend: str):
+    """Vælger PDF backend for resten af kørslen"""
+    global PDF_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Ukendt PDF backend: {backend}")
+    if backend not in available_backends():
+        raise ValueError(f"PDF backend {backend} er ikke installeret")
+    PDF_BACKEND = backend
+    logging.info(f"Bruger {backend} til PDF udtrækning")
+
+def set_response_format(response_format: str):
+    """Vælger svarformatet for resten af kørslen"""
+    global RESPONSE_FORMAT
+    if response_format not in RESPONSE_FORMATS:
+        raise ValueError(f"Ukendt svarformat: {response_format}")
+    RESPONSE_FORMAT = response_format
+    logging.info(f"Bruger {response_format} svarformat fra DeepSeek")
+
+def process_pdf_files(use_parser: bool = True, async_mode: bool = False,
+                      concurrency: int = MAX_CONCURRENT_REQUESTS,
+                      response_format: Optional[str] = None,
+                      pipelined: bool = False, pdf_workers: int = PDF_WORKERS,
+                      pdf_backend: Optional[str] = None):
+    """
+    Håndterer PDF-filer fra Not_Processed mappen
+
+    Args:
+        use_parser (bool): Brug regelbaseret parsing før DeepSeek
+        async_mode (bool): Send sektioner til DeepSeek samtidigt på tværs af alle filer
+        concurrency (int): Maksimalt antal samtidige DeepSeek kald i async tilstand
+        response_format (Optional[str]): "verbose" eller "compact" - None beholder DEEPSEEK_RESPONSE_FORMAT
+        pipelined (bool): Udtræk PDF-tekst parallelt i en process pool og overlever teksten i hukommelsen
+        pdf_workers (int): Antal processer til PDF udtrækning i pipelined tilstand
+        pdf_backend (Optional[str]): PDF backend fra pdf.PDF_BACKENDS - None beholder PDF_BACKEND
+    """
+    logging.info("Starter behandling af PDF-filer")
+    
+    if response_format:
+        set_response_format(response_format)
+    if pdf_backend:
+        set_pdf_backend(pdf_backend)
+    
     # Tjek om der er PDF-filer at behandle
-    pdf_files = [f for f in os.listdir(not_processed_dir) if f.lower().endswith('.pdf')]
+    pdf_files = prepare_directories()
     
     if not pdf_files:
         logging.info("Ingen PDF-filer at behandle i Not_Processed mappen")
@@ -424,55 +1469,107 @@ def process_pdf_files():
     
     logging.info(f"Fandt {len(pdf_files)} PDF-filer at behandle")
     
+    # Én fælles scheduler for alle DeepSeek kald i denne kørsel
+    configure_rate_limits()
+    start_run({
+        'use_parser': use_parser,
+        'async_mode': async_mode,
+        'concurrency': concurrency,
+        'response_format': RESPONSE_FORMAT,
+        'chunk_strategy': CHUNK_STRATEGY,
+        'llm_cache': USE_LLM_CACHE,
+        'text_cache': USE_TEXT_CACHE,
+        'league_db': USE_LEAGUE_DB,
+        'pipelined': pipelined,
+        'pdf_backend': PDF_BACKEND,
+        'pdf_workers': pdf_workers if pipelined else None
+    })
+    
+    try:
+        if pipelined:
+            logging.info(f"Kører pipelined med {pdf_workers} PDF processer og en kø på {PDF_QUEUE_SIZE}")
+            process_pdf_files_pipelined(pdf_files, use_parser, async_mode, concurrency, pdf_workers)
+        elif async_mode:
+            logging.info(f"Kører i async tilstand med op til {concurrency} samtidige DeepSeek kald")
+            asyncio.run(process_pdf_files_async(pdf_files, use_parser, concurrency))
+        else:
+            process_pdf_files_serial(pdf_files, use_parser)
+    finally:
+        stats = get_cache_stats()
+        logging.info(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses, "
+                     f"{stats['stores']} gemt, {stats['evictions']} fjernet")
+        text_stats = get_text_cache_stats()
+        logging.info(f"Tekst cache: {text_stats['hits']} hits, {text_stats['misses']} misses, "
+                     f"{text_stats['stores']} gemt")
+        limiter_stats = get_limiter_stats()
+        logging.info(f"Rate limiter: {limiter_stats['rate_limited_count']} rate limit svar, "
+                     f"ventet {limiter_stats['waited_seconds']} sekunder i alt")
+        write_metrics({'llm_cache': stats, 'text_cache': text_stats, 'rate_limiter': limiter_stats})
+
+def process_pdf_files_serial(pdf_files: List[str], use_parser: bool):
+    """Udtrækker og behandler PDF-filerne én ad gangen"""
     for pdf_file in pdf_files:
-        pdf_path = os.path.join(not_processed_dir, pdf_file)
-        txt_path = os.path.join(not_processed_dir, f"{os.path.splitext(pdf_file)[0]}.txt")
+        pdf_path = os.path.join(NOT_PROCESSED_DIR, pdf_file)
         
         logging.info(f"Starter behandling af PDF-fil: {pdf_file}")
+        set_current_file(pdf_file)
         logging.debug(f"PDF sti: {pdf_path}")
-        logging.debug(f"Midlertidig TXT sti: {txt_path}")
         
         try:
-            # Konverter PDF til tekst
-            logging.debug("Starter PDF til tekst konvertering")
-            if not convert_pdf_to_text(pdf_path, txt_path):
-                logging.error(f"PDF konvertering fejlede for {pdf_file}")
-                raise Exception("Kunne ikke konvertere PDF til tekst")
-            logging.info("PDF konverteret succesfuldt til tekst")
+            # Hent teksten fra tekst cachen eller udtræk den fra PDF'en
+            pdf_hash, text = get_cached_pdf_text(pdf_path)
+            if text is None:
+                logging.debug("Starter PDF til tekst konvertering")
+                with timed('pdf_extraction'):
+                    text = extract_pdf_text(pdf_path, PDF_BACKEND)
+                store_pdf_text(pdf_hash, text)
+                logging.info("PDF konverteret succesfuldt til tekst")
             
-            # Behandl tekstfilen
-            logging.debug("Starter behandling af tekstfil")
-            process_handball_file(txt_path)
+            # Behandl teksten
+            logging.debug("Starter behandling af tekst")
+            process_handball_content(text, use_parser)
             
             # Flyt PDF-fil til Processed mappen ved succes
-            logging.debug(f"Flytter {pdf_file} til {processed_dir}")
-            shutil.move(pdf_path, os.path.join(processed_dir, pdf_file))
-            logging.info(f"Succesfuldt behandlet og flyttet {pdf_file} til {processed_dir}")
+            move_pdf_file(pdf_path, PROCESSED_DIR)
             
+        except IncompleteReportError as e:
+            keep_incomplete_pdf(pdf_file, e)
         except Exception as e:
             logging.error(f"Fejl under behandling af {pdf_file}: {str(e)}", exc_info=True)
+            add_counter('failed_files')
             # Flyt PDF-fil til Error mappen ved fejl
             try:
-                logging.debug(f"Flytter {pdf_file} til {error_dir} pga. fejl")
-                shutil.move(pdf_path, os.path.join(error_dir, pdf_file))
-                logging.info(f"Flyttet {pdf_file} til {error_dir} pga. fejl")
+                move_pdf_file(pdf_path, ERROR_DIR)
             except Exception as move_error:
-                logging.error(f"Kunne ikke flytte fejlet fil til {error_dir}: {str(move_error)}", exc_info=True)
-        
-        finally:
-            # Slet den midlertidige tekstfil hvis den eksisterer
-            if os.path.exists(txt_path):
-                logging.debug(f"Sletter midlertidig tekstfil: {txt_path}")
-                try:
-                    os.remove(txt_path)
-                    logging.debug("Midlertidig tekstfil slettet")
-                except Exception as e:
-                    logging.error(f"Kunne ikke slette midlertidig tekstfil: {str(e)}", exc_info=True)
+                logging.error(f"Kunne ikke flytte fejlet fil til {ERROR_DIR}: {str(move_error)}", exc_info=True)
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Behandler håndbold PDF-filer fra Not_Processed")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="Send sektioner til DeepSeek samtidigt")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENT_REQUESTS,
+                        help="Maksimalt antal samtidige DeepSeek kald i async tilstand")
+    parser.add_argument('--no-parser', dest='use_parser', action='store_false',
+                        help="Send alle sektioner til DeepSeek uden regelbaseret parsing")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="Udtræk PDF-tekst parallelt i en process pool uden midlertidige .txt filer")
+    parser.add_argument('--pdf-workers', type=int, default=PDF_WORKERS,
+                        help="Antal processer til PDF udtrækning i pipelined tilstand")
+    parser.add_argument('--pdf-backend', choices=list(PDF_BACKENDS), default=None,
+                        help="PDF backend (standard: PDF_BACKEND eller pypdf2)")
+    parser.add_argument('--response-format', choices=RESPONSE_FORMATS, default=None,
+                        help="Svarformat fra DeepSeek (standard: DEEPSEEK_RESPONSE_FORMAT eller verbose)")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_arguments()
     logging.info("Program starter")
     try:
-        process_pdf_files()
+        process_pdf_files(use_parser=args.use_parser, async_mode=args.async_mode,
+                          concurrency=args.concurrency, response_format=args.response_format,
+                          pipelined=args.pipelined, pdf_workers=args.pdf_workers,
+                          pdf_backend=args.pdf_backend)
         logging.info("Program afsluttet succesfuldt")
     except Exception as e:
-        logging.error("Program afsluttet med fejl", exc_info=True) 
\ No newline at end of file
+        logging.error("Program afsluttet med fejl", exc_info=True)
@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+# Udbyderens grænser pr. minut - 0 slår den pågældende grænse fra
+REQUESTS_PER_MINUTE = int(os.getenv("DEEPSEEK_RPM", "120"))
+TOKENS_PER_MINUTE = int(os.getenv("DEEPSEEK_TPM", "240000"))
+
+# Andel af grænsen vi sigter efter, så vi ligger lige under i stedet for at ramme 429
+RATE_LIMIT_HEADROOM = float(os.getenv("DEEPSEEK_RATE_HEADROOM", "0.9"))
+
+# Hvor mange sekunders forbrug spanden må rumme, dvs. hvor stor en burst der tillades
+BURST_SECONDS = 10
+
+# Fælles backoff når udbyderen svarer 429 uden Retry-After
+MIN_BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+
+_lock = threading.Lock()
+_state: Dict = {}
+
+
+def configure_rate_limits(requests_per_minute: int = REQUESTS_PER_MINUTE,
+                          tokens_per_minute: int = TOKENS_PER_MINUTE,
+                          headroom: float = RATE_LIMIT_HEADROOM):
+    """
+    Nulstiller den fælles scheduler.
+
+    Kaldes én gang i starten af en kørsel, så alle filer og sektioner deler de
+    samme token buckets og den samme backoff tilstand.
+    """
+    with _lock:
+        request_rate = requests_per_minute * headroom / 60.0
+        token_rate = tokens_per_minute * headroom / 60.0
+        _state.clear()
+        _state.update({
+            'request_rate': request_rate,
+            'token_rate': token_rate,
+            'request_capacity': max(1.0, request_rate * BURST_SECONDS),
+            'token_capacity': max(1.0, token_rate * BURST_SECONDS),
+            'request_tokens': max(1.0, request_rate * BURST_SECONDS),
+            'token_tokens': max(1.0, token_rate * BURST_SECONDS),
+            'last_refill': time.monotonic(),
+            'paused_until': 0.0,
+            'backoff_seconds': 0.0,
+            'rate_limited_count': 0,
+            'waited_seconds': 0.0
+        })
+    logging.info(f"Rate limiter konfigureret: {requests_per_minute} kald/min, {tokens_per_minute} tokens/min "
+                 f"({int(headroom * 100)}% udnyttelse)")
+
+
+def _refill(now: float):
+    """Fylder begge spande op efter den tid der er gået siden sidst"""
+    elapsed = now - _state['last_refill']
+    _state['last_refill'] = now
+    _state['request_tokens'] = min(_state['request_capacity'],
+                                   _state['request_tokens'] + elapsed * _state['request_rate'])
+    _state['token_tokens'] = min(_state['token_capacity'],
+                                 _state['token_tokens'] + elapsed * _state['token_rate'])
+
+
+def _reserve(tokens: int) -> float:
+    """
+    Forsøger at reservere ét kald og tokens fra spandene.
+
+    Returns:
+        float: 0 hvis reservationen lykkedes, ellers antal sekunder der skal ventes
+    """
+    with _lock:
+        if not _state:
+            return 0.0
+
+        now = time.monotonic()
+        if now < _state['paused_until']:
+            return _state['paused_until'] - now
+
+        _refill(now)
+        waits = []
+        if _state['request_rate'] > 0 and _state['request_tokens'] < 1:
+            waits.append((1 - _state['request_tokens']) / _state['request_rate'])
+        if _state['token_rate'] > 0:
+            # Et kald større end spanden må vente til den er fuld og tømmer den så
+            needed = min(tokens, _state['token_capacity'])
+            if _state['token_tokens'] < needed:
+                waits.append((needed - _state['token_tokens']) / _state['token_rate'])
+
+        if waits:
+            return max(waits)
+
+        if _state['request_rate'] > 0:
+            _state['request_tokens'] -= 1
+        if _state['token_rate'] > 0:
+            _state['token_tokens'] -= tokens
+        return 0.0
+
+
+def acquire(tokens: int):
+    """Blokerer indtil der er plads til et kald med det anslåede antal tokens"""
+    while True:
+        wait = _reserve(tokens)
+        if wait <= 0:
+            return
+        with _lock:
+            _state['waited_seconds'] = _state.get('waited_seconds', 0.0) + wait
+        logging.debug(f"Rate limiter venter {wait:.2f} sekunder")
+        time.sleep(wait)
+
+
+async def acquire_async(tokens: int):
+    """Asynkron udgave af acquire der ikke blokerer event loopet"""
+    while True:
+        wait = _reserve(tokens)
+        if wait <= 0:
+            return
+        with _lock:
+            _state['waited_seconds'] = _state.get('waited_seconds', 0.0) + wait
+        logging.debug(f"Rate limiter venter {wait:.2f} sekunder")
+        await asyncio.sleep(wait)
+
+
+def settle(estimated_tokens: int, actual_tokens: Optional[int]):
+    """Korrigerer token spanden når det faktiske forbrug fra response.usage kendes"""
+    if actual_tokens is None:
+        return
+    with _lock:
+        if _state and _state['token_rate'] > 0:
+            _state['token_tokens'] += estimated_tokens - actual_tokens
+
+
+def report_success():
+    """Halverer den fælles backoff efter et vellykket kald"""
+    with _lock:
+        if _state and _state['backoff_seconds'] > 0:
+            _state['backoff_seconds'] /= 2
+            if _state['backoff_seconds'] < MIN_BACKOFF_SECONDS:
+                _state['backoff_seconds'] = 0.0
+
+
+def report_rate_limited(retry_after: Optional[float] = None):
+    """
+    Registrerer et 429 svar og sætter en fælles pause for alle kald.
+
+    Retry-After fra udbyderen bruges hvis den findes, ellers fordobles den
+    fælles backoff. Spandene tømmes så kaldene ikke starter i en burst bagefter.
+    """
+    with _lock:
+        if not _state:
+            return
+        if retry_after is not None:
+            pause = retry_after
+        else:
+            pause = min(MAX_BACKOFF_SECONDS, max(MIN_BACKOFF_SECONDS, _state['backoff_seconds'] * 2))
+            _state['backoff_seconds'] = pause
+
+        now = time.monotonic()
+        _state['paused_until'] = max(_state['paused_until'], now + pause)
+        _state['request_tokens'] = 0.0
+        _state['token_tokens'] = min(_state['token_tokens'], 0.0)
+        _state['last_refill'] = _state['paused_until']
+        _state['rate_limited_count'] += 1
+
+    logging.warning(f"Rate limit ramt - alle DeepSeek kald pauser i {pause:.1f} sekunder")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Læser en Retry-After header der enten er sekunder eller en HTTP dato"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        logging.warning(f"Ugyldig Retry-After header: {value}")
+        return None
+
+
+def get_limiter_stats() -> Dict:
+    """Returnerer antal 429 svar og samlet ventetid for kørslen"""
+    with _lock:
+        return {
+            'rate_limited_count': _state.get('rate_limited_count', 0),
+            'waited_seconds': round(_state.get('waited_seconds', 0.0), 2)
+        }
@@ -0,0 +1,34 @@
+import difflib
+from typing import Dict, List, Tuple
+
+
+def diff_report_lines(old_lines: List[Tuple[int, str]], new_lines: List[str]) -> Dict:
+    """
+    Sammenligner hændelseslinjerne fra den gemte version med en ny version af rapporten.
+
+    Args:
+        old_lines (List[Tuple[int, str]]): (Line_id, tekst) for de gemte linjer i rækkefølge
+        new_lines (List[str]): Hændelseslinjerne i den nye version
+
+    Returns:
+        Dict: 'unchanged' med (Line_id, ny position) for linjer der er ens,
+        'removed' med Line_id for linjer der er fjernet eller ændret, og
+        'added' med de nye positioner der skal parses
+    """
+    matcher = difflib.SequenceMatcher(None, [text for _, text in old_lines], new_lines, autojunk=False)
+
+    unchanged = []
+    removed = []
+    added = []
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            unchanged.extend(
+                (old_lines[old_start + offset][0], new_start + offset)
+                for offset in range(old_end - old_start)
+            )
+            continue
+        # 'replace' behandles som en sletning af de gamle linjer og en indsættelse af de nye
+        removed.extend(line_id for line_id, _ in old_lines[old_start:old_end])
+        added.extend(range(new_start, new_end))
+
+    return {'unchanged': unchanged, 'removed': removed, 'added': added}
@@ -1,10 +1,39 @@
 import requests
-from bs4 import BeautifulSoup
 import os
+import codecs
 import logging
-from urllib.parse import urljoin
+import argparse
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
 import time
 from datetime import datetime
+import hashlib
+from async_downloader import download_files, PER_HOST_LIMIT
+from download_manifest import (load_manifest, save_manifest, get_conditional_headers, get_previous_sha256,
+                               record_response, write_changed_files)
+from crawl_frontier import (open_frontier, start_crawl, finish_crawl, add_urls, get_pending, mark_done,
+                            mark_failed, get_frontier_stats)
+
+# Kan peges mod en lokal stand-in server (se mock_handball_site.py)
+BASE_URL = os.getenv("TOPHAANDBOLD_BASE_URL", "https://tophaandbold.dk")
+
+# Turneringer (stien efter /kampprogram/) og sæsoner der crawles. En tom sæson er den aktuelle
+TOURNAMENTS = os.getenv("SCRAPER_TOURNAMENTS", "herreligaen").split(',')
+SEASONS = [season for season in os.getenv("SCRAPER_SEASONS", "").split(',') if season]
+# Query parameteren kampprogrammet bruger til at vælge sæson
+SEASON_PARAM = os.getenv("SCRAPER_SEASON_PARAM", "season")
+
+PROGRAM_PATH_PREFIX = '/kampprogram/'
+PROGRAM_PAGE_DELAY = 0.5
+# Længste pause efter gentagne fejl ved hentning af kampprogrammet
+PROGRAM_PAGE_MAX_DELAY = 30
+PDF_PATH_PREFIX = '/intranet/pdfs/game/'
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'da,en-US;q=0.9,en;q=0.8'
+}
 
 # Opsætning af logging
 def setup_logging():
@@ -32,95 +61,314 @@ def create_download_folder():
 def get_session():
     """Opret en session med standard headers"""
     session = requests.Session()
-    session.headers.update({
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-        'Accept-Language': 'da,en-US;q=0.9,en;q=0.8'
-    })
+    session.headers.update(DEFAULT_HEADERS)
     return session
 
-def scrape_match_links(session):
-    """Hent alle relevante PDF-links fra kampprogrammet"""
-    base_url = "https://tophaandbold.dk"
-    program_url = f"{base_url}/kampprogram/herreligaen"
-    
-    logging.info(f"Henter kampprogram fra {program_url}")
-    
-    try:
-        response = session.get(program_url)
+class ProgramPageParser(HTMLParser):
+    """
+    Finder kun de links crawleren skal bruge, mens siden streames ind.
+
+    Der bygges intet dokumenttræ: kun teksten i det <a> tag vi står i gemmes, så
+    hukommelsesforbruget er uafhængigt af sidens størrelse.
+    - "Alle hændelser" dropdown-items der peger på en PDF
+    - links til næste side i kampprogrammet (rel="next" eller class="page-link")
+    """
+
+    def __init__(self, page_url):
+        super().__init__(convert_charrefs=True)
+        self.page_url = page_url
+        self.pdf_links = []
+        self.next_pages = []
+        self._seen = set()
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+        self._anchor = {
+            'href': attributes.get('href'),
+            'dropdown': 'dropdown-item' in classes,
+            'pagination': 'page-link' in classes or 'next' in (attributes.get('rel') or '').split(),
+            'text': []
+        }
+
+    def handle_data(self, data):
+        if self._anchor is not None and self._anchor['dropdown']:
+            self._anchor['text'].append(data)
+
+    def handle_endtag(self, tag):
+        if tag != 'a' or self._anchor is None:
+            return
+        anchor, self._anchor = self._anchor, None
+        href = anchor['href']
+        if not href:
+            return
+        full_url = urljoin(self.page_url, href)
+        if full_url in self._seen:
+            return
+        
+        if anchor['dropdown'] and href.startswith(PDF_PATH_PREFIX) and "Alle hændelser" in ''.join(anchor['text']):
+            self._seen.add(full_url)
+            self.pdf_links.append(full_url)
+            logging.debug(f"Fundet PDF link: {full_url}")
+        elif anchor['pagination'] and urlsplit(full_url).path.startswith(PROGRAM_PATH_PREFIX) \
+                and full_url != self.page_url:
+            self._seen.add(full_url)
+            self.next_pages.append(full_url)
+
+def get_program_url(tournament, season=None):
+    """URL til kampprogrammet for en turnering og eventuelt en tidligere sæson"""
+    program_url = f"{BASE_URL}{PROGRAM_PATH_PREFIX}{tournament}"
+    if season:
+        program_url += f"?{SEASON_PARAM}={season}"
+    return program_url
+
+def fetch_program_page(session, program_url, manifest):
+    """
+    Henter én side af kampprogrammet betinget og parser den mens den streames.
+
+    Returns:
+        tuple: (PDF-links, links til næste sider, om siden er ændret siden sidst)
+    """
+    entry = manifest.get(program_url, {})
+    with session.get(program_url, stream=True, headers=get_conditional_headers(manifest, program_url)) as response:
+        if response.status_code == 304 and 'links' in entry:
+            logging.info(f"Uændret: {program_url} - genbruger {len(entry['links'])} PDF-links")
+            return entry['links'], entry.get('next_pages', []), False
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        parser = ProgramPageParser(program_url)
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        digest = hashlib.sha256()
+        size = 0
+        for chunk in response.iter_content(chunk_size=16384):
+            digest.update(chunk)
+            size += len(chunk)
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
         
-        # Find alle dropdown-items (links)
-        pdf_links = []
-        for link in soup.find_all('a', class_='dropdown-item'):
-            if "Alle hændelser" in link.text.strip():
-                href = link.get('href')
-                if href and href.startswith('/intranet/pdfs/game/'):
-                    full_url = urljoin(base_url, href)
-                    pdf_links.append(full_url)
-                    logging.debug(f"Fundet PDF link: {full_url}")
+        record_response(manifest, program_url, response.headers, size=size, sha256=digest.hexdigest(),
+                        links=parser.pdf_links, next_pages=parser.next_pages)
+    logging.info(f"Fundet {len(parser.pdf_links)} PDF-links og {len(parser.next_pages)} nye sider på {program_url}")
+    return parser.pdf_links, parser.next_pages, True
+
+def scrape_match_links(session, manifest=None, program_url=None):
+    """
+    Hent alle relevante PDF-links fra kampprogrammet, inklusive efterfølgende sider
+
+    Med et manifest hentes siderne betinget. Svarer serveren 304, bruges de links
+    der blev fundet sidste gang siden ændrede sig.
+    """
+    manifest = manifest if manifest is not None else {}
+    pages = [program_url or get_program_url('herreligaen')]
+    visited = set()
+    pdf_links = []
+    
+    logging.info(f"Henter kampprogram fra {pages[0]}")
+    
+    try:
+        while pages:
+            page_url = pages.pop(0)
+            if page_url in visited:
+                continue
+            visited.add(page_url)
+            links, next_pages, _ = fetch_program_page(session, page_url, manifest)
+            pdf_links.extend(link for link in links if link not in pdf_links)
+            pages.extend(next_pages)
         
         logging.info(f"Fundet {len(pdf_links)} unikke PDF-links")
         return pdf_links
     
     except requests.RequestException as e:
         logging.error(f"Fejl ved hentning af kampprogram: {str(e)}")
-        return []
+        return pdf_links
 
-def download_pdf(session, url, download_folder):
-    """Download en enkelt PDF-fil"""
+def crawl_program_pages(session, manifest, frontier, tournaments, seasons):
+    """
+    Gennemgår kampprogrammerne for alle turneringer og sæsoner via frontieren.
+
+    Siderne hentes én ad gangen med en kort pause - der er få af dem i forhold til
+    PDF'erne. Efter en fejl fordobles pausen for hver fejl i træk (højst
+    PROGRAM_PAGE_MAX_DELAY), så en side der fejler, ikke hentes igen med det samme.
+    PDF-links fra en side der er ændret, sættes til 'pending' igen, så rettede
+    rapporter tjekkes. Afbrydes crawlen, fortsætter næste kørsel med de sider der mangler.
+    """
+    seeds = [(get_program_url(tournament, season), tournament, season)
+             for tournament in tournaments for season in (seasons or [None])]
+    for program_url, tournament, season in seeds:
+        add_urls(frontier, [program_url], 'program', tournament, season)
+    
+    failures = 0
+    while True:
+        pending = get_pending(frontier, 'program')
+        if not pending:
+            break
+        for page_url, tournament, season in pending:
+            try:
+                links, next_pages, changed = fetch_program_page(session, page_url, manifest)
+            except requests.RequestException as e:
+                failures += 1
+                delay = min(PROGRAM_PAGE_DELAY * 2 ** failures, PROGRAM_PAGE_MAX_DELAY)
+                logging.error(f"Fejl ved hentning af {page_url}: {str(e)} - venter {delay:.1f} sekunder")
+                mark_failed(frontier, [page_url])
+                time.sleep(delay)
+                continue
+            failures = 0
+            new_links = add_urls(frontier, links, 'pdf', tournament, season, page_url, reset=changed)
+            new_pages = add_urls(frontier, next_pages, 'program', tournament, season, page_url)
+            if new_links or new_pages:
+                logging.info(f"{new_links} nye PDF-links og {new_pages} nye sider fra {page_url}")
+            mark_done(frontier, [page_url])
+            time.sleep(PROGRAM_PAGE_DELAY)
+
+def get_pdf_filename(url):
+    """Generer filnavn fra URL"""
+    return url.split('/')[-2] + '_' + url.split('/')[-1].split('?')[0] + '.pdf'
+
+def download_pdf(session, url, download_folder, manifest=None):
+    """
+    Download en enkelt PDF-fil med betinget GET
+
+    Returns:
+        str: 'downloaded' (ny eller ændret), 'unchanged' eller 'failed'
+    """
+    manifest = manifest if manifest is not None else {}
     try:
-        # Generer filnavn fra URL
-        filename = url.split('/')[-2] + '_' + url.split('/')[-1].split('?')[0] + '.pdf'
+        filename = get_pdf_filename(url)
         filepath = os.path.join(download_folder, filename)
         
-        # Skip hvis filen allerede eksisterer
-        if os.path.exists(filepath):
-            logging.info(f"Fil eksisterer allerede: {filename}")
-            return True
-        
         logging.info(f"Downloader: {filename}")
-        response = session.get(url, stream=True)
-        response.raise_for_status()
-        
-        # Gem filen
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
+        with session.get(url, stream=True, headers=get_conditional_headers(manifest, url, filepath)) as response:
+            # Skip hvis filen ikke er ændret siden sidst
+            if response.status_code == 304:
+                logging.info(f"Fil er uændret: {filename}")
+                return 'unchanged'
+            response.raise_for_status()
+            
+            # Gem filen i en midlertidig fil og erstat den gamle når den er komplet
+            previous_sha256 = get_previous_sha256(manifest, url, filepath)
+            digest = hashlib.sha256()
+            size = 0
+            temp_path = filepath + '.part'
+            try:
+                with open(temp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                os.replace(temp_path, filepath)
+            except BaseException:
+                # Som i async_downloader.stream_to_file efterlades ingen halv fil
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            record_response(manifest, url, response.headers, filepath, size, digest.hexdigest())
         
+        if digest.hexdigest() == previous_sha256:
+            logging.info(f"Fil hentet igen men uændret: {filename}")
+            return 'unchanged'
         logging.info(f"Gemt fil: {filename}")
-        return True
+        return 'downloaded'
     
     except requests.RequestException as e:
         logging.error(f"Fejl ved download af {url}: {str(e)}")
-        return False
+        return 'failed'
+
+def download_pending_pdfs(session, manifest, frontier, download_folder, serial, per_host):
+    """
+    Downloader de ventende PDF'er i frontieren og opdaterer deres status.
+
+    Returns:
+        dict: Udfaldet for hver filsti ('downloaded', 'unchanged', 'failed')
+    """
+    pdf_links = [url for url, _, _ in get_pending(frontier, 'pdf')]
+    logging.info(f"{len(pdf_links)} PDF-filer skal hentes eller tjekkes")
+    urls = {os.path.join(download_folder, get_pdf_filename(url)): url for url in pdf_links}
+    
+    if not serial:
+        jobs = [(url, filepath) for filepath, url in urls.items()]
+        results = download_files(jobs, manifest, DEFAULT_HEADERS, per_host)
+        mark_done(frontier, [urls[filepath] for filepath, result in results.items() if result != 'failed'])
+        mark_failed(frontier, [urls[filepath] for filepath, result in results.items() if result == 'failed'])
+        return results
+    
+    # Download hver PDF
+    results = {}
+    for i, (filepath, url) in enumerate(urls.items(), 1):
+        logging.info(f"Behandler fil {i}/{len(urls)}")
+        results[filepath] = download_pdf(session, url, download_folder, manifest)
+        if results[filepath] == 'failed':
+            mark_failed(frontier, [url])
+        else:
+            mark_done(frontier, [url])
+        time.sleep(1)  # Ventetid mellem downloads
+    return results
+
+def main(serial=False, per_host=PER_HOST_LIMIT, tournaments=None, seasons=None, recheck=False):
+    """
+    Crawler kampprogrammerne og downloader PDF-filerne.
+
+    Som standard downloades filerne samtidigt med async_downloader. Med serial=True
+    bruges den gamle løkke med én fil ad gangen og et sekunds pause. Begge veje
+    bruger download manifestet til betinget GET.
+
+    Args:
+        tournaments (list): Turneringer der crawles (standard: SCRAPER_TOURNAMENTS)
+        seasons (list): Sæsoner der crawles, fx tidligere sæsoner (standard: SCRAPER_SEASONS, ellers den aktuelle)
+        recheck (bool): Tjek også PDF'er der allerede er hentet
 
-def main():
+    Returns:
+        list: Filnavnene på de PDF'er der er nye eller ændrede i denne kørsel
+    """
     setup_logging()
     logging.info("Starter scraping af kampprogrammer")
     
     download_folder = create_download_folder()
     session = get_session()
+    manifest = load_manifest(download_folder)
+    frontier = open_frontier(download_folder)
     
-    # Hent alle PDF links
-    pdf_links = scrape_match_links(session)
+    started = time.perf_counter()
+    try:
+        start_crawl(frontier, recheck)
+        crawl_program_pages(session, manifest, frontier, tournaments or TOURNAMENTS,
+                            SEASONS if seasons is None else seasons)
+        results = download_pending_pdfs(session, manifest, frontier, download_folder, serial, per_host)
+        finish_crawl(frontier)
+        logging.info(f"Frontier: {get_frontier_stats(frontier)}")
+    finally:
+        save_manifest(manifest, download_folder)
+        frontier.close()
     
-    if not pdf_links:
-        logging.error("Ingen PDF-links fundet")
-        return
+    # Kun filer der faktisk er nye eller ændrede sendes videre
+    changed = [os.path.basename(filepath) for filepath, result in results.items() if result == 'downloaded']
+    write_changed_files(changed, download_folder)
     
-    # Download hver PDF
-    successful_downloads = 0
-    for i, url in enumerate(pdf_links, 1):
-        logging.info(f"Behandler fil {i}/{len(pdf_links)}")
-        if download_pdf(session, url, download_folder):
-            successful_downloads += 1
-        time.sleep(1)  # Ventetid mellem downloads
-    
-    logging.info(f"Færdig! Downloadet {successful_downloads} af {len(pdf_links)} filer")
+    failed = sum(1 for result in results.values() if result == 'failed')
+    logging.info(f"Færdig på {time.perf_counter() - started:.1f} sekunder! {len(changed)} nye eller ændrede, "
+                 f"{len(results) - len(changed) - failed} uændrede, {failed} fejlede af {len(results)} filer")
+    return changed
+
+def parse_arguments():
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Downloader \"Alle hændelser\" PDF-filer fra kampprogrammet")
+    parser.add_argument('--serial', action='store_true',
+                        help="Download én fil ad gangen med et sekunds pause")
+    parser.add_argument('--per-host', type=int, default=PER_HOST_LIMIT,
+                        help="Maksimalt antal samtidige forbindelser pr. host (standard: SCRAPER_PER_HOST eller 4)")
+    parser.add_argument('--tournaments', nargs='+', default=None,
+                        help="Turneringer der crawles, fx herreligaen kvindeligaen (standard: SCRAPER_TOURNAMENTS)")
+    parser.add_argument('--seasons', nargs='+', default=None,
+                        help="Sæsoner der crawles, fx 2022-2023 2023-2024 (standard: SCRAPER_SEASONS eller den aktuelle)")
+    parser.add_argument('--recheck', action='store_true',
+                        help="Tjek også allerede hentede PDF'er for rettelser")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    args = parse_arguments()
+    main(serial=args.serial, per_host=args.per_host, tournaments=args.tournaments,
+         seasons=args.seasons, recheck=args.recheck) 
\ No newline at end of file
@@ -4,7 +4,9 @@ import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 import re
-from typing import Tuple, Optional, Dict
+import argparse
+from typing import Tuple, Optional, Dict, List
+from db_schema import get_event_flags, ensure_schema, find_match_databases, EVENT_FLAG_COLUMNS, DATABASES_DIR
 
 def setup_logging():
     """Konfigurerer logging med rotation"""
@@ -58,6 +60,21 @@ VALID_ACTION2 = {
     'Forårs. str.', 'Retur'
 }
 
+# Alle positioner i ét mønster - de længste først, så ingen position skygger for en anden
+POSITION_PATTERN = re.compile(
+    r' (' + '|'.join(re.escape(pos) for pos in sorted(VALID_POSITIONS, key=len, reverse=True)) + r')$'
+)
+NUMBER_PATTERN = re.compile(r'^(\d+)$')
+
+# Kolonnerne standardize_event læser og ændrer
+STANDARDIZED_COLUMNS = ['Action_1', 'Position', 'Player_number', 'Player_Name', 'Action_2', 'Player2_Number']
+
+# Nøglerne i de parsede begivenheder i process_output -> kolonnerne i STANDARDIZED_COLUMNS
+EVENT_FIELD_COLUMNS = {
+    'Action1': 'Action_1', 'Position': 'Position', 'PlayerNumber': 'Player_number',
+    'PlayerName': 'Player_Name', 'Action2': 'Action_2', 'Player2Number': 'Player2_Number'
+}
+
 def extract_position_from_action(action: str) -> Tuple[str, Optional[str]]:
     """Udtrækker position fra en handling hvis den findes."""
     if not action:
@@ -68,12 +85,12 @@ def extract_position_from_action(action: str) -> Tuple[str, Optional[str]]:
         return action, None
 
     # Find position i slutningen af strengen
-    for pos in VALID_POSITIONS:
-        pattern = f" {pos}$"
-        if re.search(pattern, action):
-            base_action = action[:-(len(pos)+1)].strip()
-            logging.debug(f"Fandt position '{pos}' i '{action}', base_action: '{base_action}'")
-            return base_action, pos
+    match = POSITION_PATTERN.search(action)
+    if match:
+        pos = match.group(1)
+        base_action = action[:match.start()].strip()
+        logging.debug(f"Fandt position '{pos}' i '{action}', base_action: '{base_action}'")
+        return base_action, pos
 
     return action, None
 
@@ -83,7 +100,7 @@ def extract_number_from_action2(action2: str) -> Tuple[str, Optional[str]]:
         return "", None
 
     # Find numeriske værdier
-    match = re.match(r'^(\d+)$', action2.strip())
+    match = NUMBER_PATTERN.match(action2.strip())
     if match:
         return "", match.group(1)
 
@@ -142,76 +159,160 @@ def standardize_event(event: Dict) -> Dict:
 
     return updated_event
 
-def update_database(db_path: str) -> bool:
-    """Opdaterer en enkelt database med standardiserede handlinger"""
+def standardize_parsed_event(event: Dict) -> Dict:
+    """
+    Standardiserer en parset begivenhed (nøgler som i DeepSeek svaret) før den gemmes.
+
+    Samme regler som standardize_event, så process_output gemmer rækkerne i deres
+    endelige form og update_database ikke har noget at rette bagefter.
+    """
+    row = {column: event.get(field) for field, column in EVENT_FIELD_COLUMNS.items()}
+    updated_row = standardize_event(row)
+    if updated_row == row:
+        return event
+    updated_event = event.copy()
+    for field, column in EVENT_FIELD_COLUMNS.items():
+        if updated_row[column] != row[column]:
+            updated_event[field] = updated_row[column]
+    return updated_event
+
+def collect_changes(cursor: sqlite3.Cursor, full: bool = False) -> Tuple[List[Tuple], int]:
+    """
+    Standardiserer rækkerne der ikke er standardiseret endnu (alle med full) i Python.
+
+    Returns:
+        Tuple[List[Tuple], int]: (rowid, de standardiserede kolonner, de afledte kolonner) for
+        de ændrede rækker og antal gennemsete rækker
+    """
+    cursor.execute(f"""
+        SELECT rowid, {', '.join(STANDARDIZED_COLUMNS)}, time_seconds
+        FROM game_events {'' if full else 'WHERE Standardized IS NULL'}
+    """)
+    rows = cursor.fetchall()
+    changes = []
+    for row in rows:
+        event = dict(zip(STANDARDIZED_COLUMNS, row[1:-1]))
+        updated_event = standardize_event(event)
+        if updated_event == event:
+            continue
+        logging.debug(f"Række {row[0]} ændringer: " + ', '.join(
+            f"{col}: '{event[col]}' -> '{updated_event[col]}'"
+            for col in STANDARDIZED_COLUMNS if updated_event[col] != event[col]
+        ))
+        # De afledte kolonner følger Action_1
+        changes.append((row[0], *(updated_event[col] for col in STANDARDIZED_COLUMNS),
+                        *get_event_flags(updated_event['Action_1'], row[-1])))
+    return changes, len(rows)
+
+def assign_event_sequences(cursor: sqlite3.Cursor, changes: List[Tuple]) -> List[int]:
+    """
+    Løbenummeret (Event_seq) for hver ændret række efter standardiseringen.
+
+    Action_1 og Player_number indgår i den naturlige nøgle. Bliver en række ens
+    med en anden hændelses nøgle, beholdes begge som forskellige hændelser, og
+    den ændrede række får næste ledige løbenummer.
+    """
+    cursor.execute("""
+        SELECT rowid, time_seconds, IFNULL(Team_initials, ''), IFNULL(Action_1, ''),
+            IFNULL(Player_number, ''), Event_seq
+        FROM game_events
+    """)
+    rows = {row[0]: row[1:] for row in cursor.fetchall()}
+    changed = {change[0] for change in changes}
+    occupied: Dict[Tuple, set] = {}
+    for rowid, (time_seconds, team, action, number, sequence) in rows.items():
+        if rowid not in changed:
+            occupied.setdefault((time_seconds, team, action, number), set()).add(sequence)
+    
+    action_index = 1 + STANDARDIZED_COLUMNS.index('Action_1')
+    number_index = 1 + STANDARDIZED_COLUMNS.index('Player_number')
+    sequences = []
+    for change in changes:
+        time_seconds, team, _, _, sequence = rows[change[0]]
+        key = (time_seconds, team, change[action_index] or '', change[number_index] or '')
+        taken = occupied.setdefault(key, set())
+        if sequence in taken:
+            new_sequence = max(taken) + 1
+            logging.warning(f"Række {change[0]} får samme nøgle som en anden hændelse {key} - "
+                            f"begge beholdes, og rækken får løbenummer {new_sequence}")
+            sequence = new_sequence
+        taken.add(sequence)
+        sequences.append(sequence)
+    return sequences
+
+def apply_changes(cursor: sqlite3.Cursor, changes: List[Tuple]):
+    """
+    Skriver de ændrede rækker med UPDATE fra en midlertidig tabel.
+
+    Løbenumrene fra assign_event_sequences sikrer at ingen række får en anden
+    hændelses nøgle. De ændrede rækker får først et midlertidigt negativt
+    løbenummer, så rækker der bytter nøgle, ikke kolliderer undervejs.
+    """
+    columns = STANDARDIZED_COLUMNS + list(EVENT_FLAG_COLUMNS) + ['Event_seq']
+    sequences = assign_event_sequences(cursor, changes)
+    cursor.execute('DROP TABLE IF EXISTS temp.standardize_changes')
+    cursor.execute(f"CREATE TEMP TABLE standardize_changes (Row_id INTEGER PRIMARY KEY, {', '.join(columns)})")
+    cursor.executemany(
+        f"INSERT INTO standardize_changes VALUES ({', '.join('?' for _ in range(len(columns) + 1))})",
+        [(*change, sequence) for change, sequence in zip(changes, sequences)]
+    )
+    cursor.execute("""
+        UPDATE game_events SET Event_seq = -1 - rowid
+        WHERE rowid IN (SELECT Row_id FROM standardize_changes)
+    """)
+    cursor.execute(f"""
+        UPDATE game_events
+        SET {', '.join(f'{col} = c.{col}' for col in columns)}
+        FROM standardize_changes c
+        WHERE c.Row_id = game_events.rowid
+    """)
+    cursor.execute('DROP TABLE temp.standardize_changes')
+
+def update_database(db_path: str, full: bool = False) -> bool:
+    """
+    Opdaterer en enkelt database med standardiserede handlinger.
+
+    Kun rækker der ikke er markeret som standardiseret (Standardized) gennemgås,
+    medmindre full er sat. Markeringen følger rækken, så den gælder også når
+    rowid genbruges efter slettede hændelser eller ændres af VACUUM.
+    """
     try:
         with sqlite3.connect(db_path) as conn:
             cursor = conn.cursor()
             
-            # Hent alle rækker med deres kolonnenavne
-            cursor.execute("PRAGMA table_info(game_events)")
-            columns = [col[1] for col in cursor.fetchall()]
-            
-            cursor.execute("SELECT rowid, * FROM game_events")
-            rows = cursor.fetchall()
-            
-            # Tilføj rowid til kolonner
-            all_columns = ['rowid'] + columns
+            # Databaser fra før de afledte kolonner, den naturlige nøgle og Standardized opgraderes først
+            ensure_schema(cursor)
+            conn.commit()
             
-            updates = 0
-            for row in rows:
-                # Konverter række til dictionary
-                event = dict(zip(all_columns, row))
-                
-                # Standardiser event
-                updated_event = standardize_event(event)
-                
-                # Tjek om der er ændringer
-                if event != updated_event:
-                    # Byg UPDATE query dynamisk
-                    set_clauses = []
-                    values = []
-                    for col in columns:
-                        if col in updated_event and updated_event[col] != event[col]:
-                            set_clauses.append(f"{col} = ?")
-                            values.append(updated_event[col])
-                    
-                    if set_clauses and values:
-                        # Log detaljeret information om ændringer
-                        changes_description = []
-                        for col, val in zip(set_clauses, values):
-                            col_name = col.split('=')[0].strip()
-                            old_val = event.get(col_name, 'None')
-                            changes_description.append(f"{col_name}: '{old_val}' -> '{val}'")
-                        
-                        logging.debug(f"Række {event['rowid']} ændringer: {', '.join(changes_description)}")
-                        
-                        query = f"""
-                            UPDATE game_events 
-                            SET {', '.join(set_clauses)}
-                            WHERE rowid = ?
-                        """
-                        values.append(event['rowid'])
-                        
-                        cursor.execute(query, values)
-                        updates += 1
-                        
-                        logging.debug(f"Opdateret række {event['rowid']}: {', '.join(set_clauses)}")
+            # Skrivelåsen tages før læsningen, så rækker gemt undervejs ikke markeres uden at være set
+            cursor.execute('BEGIN IMMEDIATE')
+            changes, examined = collect_changes(cursor, full)
+            if changes:
+                apply_changes(cursor, changes)
+            cursor.execute(f"UPDATE game_events SET Standardized = 1 {'' if full else 'WHERE Standardized IS NULL'}")
             
             conn.commit()
-            logging.info(f"Opdateret {updates} rækker i {os.path.basename(db_path)}")
+            logging.info(f"Opdateret {len(changes)} rækker i {os.path.basename(db_path)} "
+                         f"({examined} rækker gennemgået)")
             return True
             
     except Exception as e:
         logging.error(f"Fejl ved opdatering af {db_path}: {str(e)}", exc_info=True)
         return False
 
-def main():
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Standardiserer handlinger og positioner i kampdatabaserne")
+    parser.add_argument('--full', action='store_true',
+                        help="Gennemgå alle rækker igen, ikke kun dem der ikke er standardiseret")
+    return parser.parse_args()
+
+def main(full: bool = False):
     """Hovedfunktion der opdaterer alle databaser"""
     setup_logging()
     logging.info("Starter standardisering af handlinger og positioner")
     
-    databases_dir = 'Databases'
+    databases_dir = DATABASES_DIR
     if not os.path.exists(databases_dir):
         logging.error(f"Databases mappe ikke fundet: {databases_dir}")
         return
@@ -219,17 +320,15 @@ def main():
     successful_updates = 0
     failed_updates = 0
     
-    for db_file in os.listdir(databases_dir):
-        if db_file.endswith('.db'):
-            db_path = os.path.join(databases_dir, db_file)
-            logging.info(f"Behandler database: {db_file}")
-            
-            if update_database(db_path):
-                successful_updates += 1
-            else:
-                failed_updates += 1
+    for db_path in find_match_databases(databases_dir):
+        logging.info(f"Behandler database: {os.path.basename(db_path)}")
+        
+        if update_database(db_path, full):
+            successful_updates += 1
+        else:
+            failed_updates += 1
     
     logging.info(f"Opdatering afsluttet. Succes: {successful_updates}, Fejl: {failed_updates}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_arguments().full)
\ No newline at end of file
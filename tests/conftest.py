@@ -0,0 +1,52 @@
+import os
+import sys
+import sqlite3
+import tempfile
+
+import pytest
+
+# Modulerne ligger i projektmappen og importeres som i scripts
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# process_output opretter API klienten ved import - testene kalder aldrig DeepSeek
+os.environ.setdefault('DEEPSEEK_API_KEY', 'test')
+
+
+def pytest_configure(config):
+    """Kører testene i en tom mappe, da modulerne skriver logs/, Cache/ og Databases/ relativt til arbejdsmappen"""
+    os.chdir(tempfile.mkdtemp(prefix='handball_tests_'))
+
+
+# game_events som den så ud før time_seconds, de afledte kolonner og den naturlige nøgle
+LEGACY_COLUMNS = (
+    'Time', 'Score_update', 'Team_initials', 'Action_1', 'Position', 'Player_number', 'Player_Name',
+    'Action_2', 'Player2_Number', 'Player2_Name', 'Goalkeeper_Number', 'Goalkeeper_Name',
+    'Section_number', 'Source_line'
+)
+
+
+def insert_legacy_event(conn: sqlite3.Connection, **values):
+    """Indsætter en hændelse med de gamle kolonner - manglende værdier er NULL"""
+    columns = [column for column in LEGACY_COLUMNS if column in values]
+    conn.execute(
+        f"INSERT INTO game_events ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+        [values[column] for column in columns]
+    )
+
+
+def create_legacy_db(db_path: str) -> sqlite3.Connection:
+    """Opretter en kampdatabase med det gamle skema"""
+    conn = sqlite3.connect(db_path)
+    conn.execute(f"CREATE TABLE game_events ({', '.join(f'{column} TEXT' for column in LEGACY_COLUMNS[:-2])}, "
+                 f"Section_number INTEGER, Source_line INTEGER)")
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """En kampdatabase med det gamle skema"""
+    db_path = str(tmp_path / '01-01-2024_A_vs_B.db')
+    conn = create_legacy_db(db_path)
+    yield db_path, conn
+    conn.close()
@@ -0,0 +1,72 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import async_downloader
+
+PDF = b'%PDF-1.4 kamprapport'
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    """Lokal stand-in for sitet: svarer 304 på If-None-Match med samme ETag"""
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PdfHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_hosts(monkeypatch):
+    monkeypatch.setattr(async_downloader, '_hosts', {})
+    monkeypatch.setattr(async_downloader, 'HOST_INTERVALS', {'127.0.0.1': 0.0})
+
+
+def test_parse_host_intervals_skips_invalid_pairs():
+    assert async_downloader.parse_host_intervals('Tophaandbold.dk=1, 127.0.0.1=0,fejl') == {
+        'tophaandbold.dk': 1.0, '127.0.0.1': 0.0}
+
+
+def test_host_interval_applies_with_or_without_port():
+    assert async_downloader.get_min_interval('127.0.0.1:8766') == 0.0
+    assert async_downloader.get_min_interval('tophaandbold.dk') == async_downloader.MIN_INTERVAL
+
+
+def test_throttling_backs_off_and_success_recovers():
+    async_downloader.report_host_throttled('127.0.0.1:8766')
+    state = async_downloader._host_state('127.0.0.1:8766')
+    assert state['interval'] > 0
+    for _ in range(100):
+        async_downloader.report_host_success('127.0.0.1:8766')
+    assert state['interval'] < 0.001
+
+
+def test_download_files_writes_atomically_and_uses_the_manifest(site, tmp_path):
+    jobs = [(f"{site}/{name}.pdf", str(tmp_path / f"{name}.pdf")) for name in ('a', 'b')]
+    manifest = {}
+
+    assert set(async_downloader.download_files(jobs, manifest).values()) == {'downloaded'}
+    assert (tmp_path / 'a.pdf').read_bytes() == PDF
+    assert not list(tmp_path.glob('*.part'))
+
+    assert set(async_downloader.download_files(jobs, manifest).values()) == {'unchanged'}
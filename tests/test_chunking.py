@@ -0,0 +1,46 @@
+from process_output import FIXED_CHUNK_LINES, chunk_by_tokens, chunk_fixed, extract_main_sections, get_system_prompt
+from token_estimator import estimate_lines_tokens, estimate_tokens
+
+HEADER = 'Tid Hold Hændelse'
+# Hver anden hændelse er ombrudt over to linjer
+LINES = []
+for minute in range(40):
+    LINES.append(f'{minute:02d}.00 AAH Mål 7 Mads HANSEN')
+    if minute % 2:
+        LINES.append('Assist 9 Ole JENSEN')
+
+
+def body(section: str):
+    lines = section.split('\n')
+    assert lines[0] == HEADER
+    return lines[1:]
+
+
+def test_extract_main_sections_stops_at_the_next_heading():
+    content = '\n'.join(['Forside', HEADER] + LINES[:3] + ['KAMPHÆNDELSER AAH - REH', 'Software'])
+    assert extract_main_sections(content) == [[HEADER] + LINES[:3]]
+
+
+def test_chunk_fixed_uses_fixed_line_counts():
+    sections = chunk_fixed([[HEADER] + LINES])
+    assert [len(body(section)) for section in sections[:-1]] == [FIXED_CHUNK_LINES] * (len(sections) - 1)
+
+
+def test_chunk_by_tokens_keeps_every_line_once_and_never_splits_an_event():
+    budget = estimate_tokens(get_system_prompt()) + estimate_lines_tokens([HEADER]) + 60
+    sections = chunk_by_tokens([[HEADER] + LINES], budget, 10 ** 6)
+
+    assert len(sections) > 1
+    assert [line for section in sections for line in body(section)] == LINES
+    assert all(not body(section)[0].startswith('Assist') for section in sections)
+
+
+def test_an_event_larger_than_the_budget_gets_its_own_section():
+    sections = chunk_by_tokens([[HEADER] + LINES[:3]], 1, 1)
+    assert [body(section) for section in sections] == [LINES[:1], LINES[1:3]]
+
+
+def test_output_budget_also_splits_sections():
+    sections = chunk_by_tokens([[HEADER] + LINES], 10 ** 6, 10 ** 6)
+    assert len(sections) == 1
+    assert len(chunk_by_tokens([[HEADER] + LINES], 10 ** 6, 500)) > 1
@@ -0,0 +1,35 @@
+from compact_format import COMPACT_FIELDS, decode_events, encode_events
+
+EVENTS = [
+    {'Time': '12.34', 'ScoreUpdate': '5-4', 'TeamInitials': 'AAH', 'Action1': 'Mål', 'Position': 'ST',
+     'PlayerNumber': '7', 'PlayerName': 'Mads HANSEN', 'Action2': 'Assist', 'Player2Number': '9',
+     'Player2Name': 'Ole JENSEN'},
+    {'Time': '13.00', 'TeamInitials': 'REH', 'Action1': 'Skud reddet', 'PlayerNumber': '4',
+     'PlayerName': 'Kim LARSEN', 'GoalkeeperNumber': '1', 'GoalkeeperName': 'Jens BERG'},
+    {'Time': '30.00', 'Action1': 'Halvleg'}
+]
+
+
+def test_round_trip():
+    assert decode_events(encode_events(EVENTS)) == EVENTS
+
+
+def test_trailing_empty_fields_are_dropped():
+    rows = encode_events(EVENTS)['rows']
+    assert rows[2] == ['30.00', '', '', 'Halvleg']
+    assert len(rows[1]) == len(COMPACT_FIELDS)
+
+
+def test_verbose_responses_pass_through():
+    assert decode_events({'events': EVENTS}) == EVENTS
+
+
+def test_columns_header_from_the_model_is_used():
+    decoded = decode_events({'columns': ['Action1', 'Time'], 'rows': [['Mål', '01.00']]})
+    assert decoded == [{'Action1': 'Mål', 'Time': '01.00'}]
+
+
+def test_numbers_are_decoded_as_strings_and_bad_rows_kept():
+    decoded = decode_events({'rows': [['01.00', None, 'AAH', 'Mål', None, 7], 'ugyldig']})
+    assert decoded[0]['PlayerNumber'] == '7'
+    assert decoded[1] == 'ugyldig'
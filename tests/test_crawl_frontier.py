@@ -0,0 +1,72 @@
+from crawl_frontier import (MAX_ATTEMPTS, add_urls, finish_crawl, get_frontier_stats, get_pending, get_retried,
+                            mark_done, mark_failed, open_frontier, start_crawl)
+
+PROGRAM = 'https://tophaandbold.dk/kampprogram/herreligaen'
+PDFS = [f'https://tophaandbold.dk/intranet/pdfmatchreport/1/2/{number}' for number in range(3)]
+
+
+def open_with_urls(tmp_path):
+    conn = open_frontier(str(tmp_path))
+    start_crawl(conn)
+    add_urls(conn, [PROGRAM], 'program')
+    add_urls(conn, PDFS, 'pdf', parent_url=PROGRAM)
+    return conn
+
+
+def pending_pdfs(conn):
+    return [url for url, _, _ in get_pending(conn, 'pdf')]
+
+
+def test_known_urls_are_not_added_twice(tmp_path):
+    conn = open_with_urls(tmp_path)
+    assert add_urls(conn, PDFS + ['https://tophaandbold.dk/ny'], 'pdf') == 1
+    assert pending_pdfs(conn) == PDFS + ['https://tophaandbold.dk/ny']
+
+
+def test_done_pdfs_stay_done_in_the_next_crawl_unless_rechecked(tmp_path):
+    conn = open_with_urls(tmp_path)
+    mark_done(conn, [PROGRAM] + PDFS)
+    finish_crawl(conn)
+
+    assert not start_crawl(conn)
+    assert [url for url, _, _ in get_pending(conn, 'program')] == [PROGRAM]
+    assert pending_pdfs(conn) == []
+
+    finish_crawl(conn)
+    start_crawl(conn, recheck=True)
+    assert pending_pdfs(conn) == PDFS
+
+
+def test_failed_urls_are_retried_until_max_attempts(tmp_path):
+    conn = open_with_urls(tmp_path)
+    for _ in range(MAX_ATTEMPTS - 1):
+        mark_failed(conn, [PDFS[0]])
+    assert PDFS[0] in pending_pdfs(conn)
+    assert get_retried(conn, 'pdf') == {PDFS[0]}
+
+    mark_failed(conn, [PDFS[0]])
+    assert PDFS[0] not in pending_pdfs(conn)
+    assert get_frontier_stats(conn)['pdf_failed'] == 1
+
+    # En ny crawl giver de opgivne PDF'er nye forsøg
+    finish_crawl(conn)
+    start_crawl(conn)
+    assert PDFS[0] in pending_pdfs(conn)
+    assert get_retried(conn, 'pdf') == set()
+
+
+def test_an_interrupted_crawl_is_resumed(tmp_path):
+    conn = open_with_urls(tmp_path)
+    mark_done(conn, PDFS[:1])
+    conn.close()
+
+    conn = open_frontier(str(tmp_path))
+    assert start_crawl(conn)
+    assert pending_pdfs(conn) == PDFS[1:]
+
+
+def test_a_changed_page_resets_its_pdfs(tmp_path):
+    conn = open_with_urls(tmp_path)
+    mark_done(conn, PDFS)
+    add_urls(conn, PDFS[:1], 'pdf', reset=True)
+    assert pending_pdfs(conn) == PDFS[:1]
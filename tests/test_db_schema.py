@@ -0,0 +1,120 @@
+import logging
+import sqlite3
+
+import pytest
+
+from conftest import insert_legacy_event
+from db_schema import (create_legacy_view, drop_obsolete_tables, ensure_event_key, ensure_schema, get_columns,
+                       get_event_sequences, load_event_sequences, upgrade_database)
+
+GOAL = {'Time': '10.00', 'Team_initials': 'AAH', 'Action_1': 'Mål', 'Player_number': '7',
+        'Player_Name': 'Mads HANSEN'}
+
+
+def test_get_event_sequences_counts_equal_keys_in_order():
+    keys = [(600, 'AAH', 'Mål', '7'), (600, 'AAH', 'Mål', '7'), (601, 'AAH', 'Mål', '7')]
+    assert get_event_sequences(keys) == [0, 1, 0]
+
+
+def test_get_event_sequences_continues_after_other_lines():
+    key = (600, 'AAH', 'Mål', '7')
+    existing = {key: [(0, 1), (1, 2)]}
+    # Linje 3 er ny og må ikke overskrive linje 1 eller 2
+    assert get_event_sequences([key], [3], existing) == [2]
+
+
+def test_get_event_sequences_reuses_numbers_from_the_same_line():
+    key = (600, 'AAH', 'Mål', '7')
+    existing = {key: [(0, 1), (1, 2)]}
+    assert get_event_sequences([key, key], [2, 4], existing) == [1, 2]
+
+
+def test_ensure_schema_numbers_legacy_repeats_without_deleting(legacy_db):
+    db_path, conn = legacy_db
+    # To ens mål i samme sekund kan være sket to gange - begge beholdes
+    insert_legacy_event(conn, **GOAL)
+    insert_legacy_event(conn, **GOAL)
+    insert_legacy_event(conn, **dict(GOAL, Player_Name='Anden SPILLER'))
+    conn.commit()
+
+    cursor = conn.cursor()
+    result = ensure_schema(cursor)
+    conn.commit()
+
+    assert result['event_seq'] == 3
+    assert result['time_seconds'] == 3
+    assert cursor.execute('SELECT Event_seq FROM game_events ORDER BY rowid').fetchall() == [(0,), (1,), (2,)]
+    assert {'time_seconds', 'is_goal', 'Event_seq', 'Standardized'} <= get_columns(cursor, 'game_events')
+
+
+def test_upgrade_database_removes_duplicates_only_on_request(legacy_db, caplog):
+    caplog.set_level(logging.INFO)
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, **GOAL)
+    insert_legacy_event(conn, **GOAL)
+    conn.commit()
+
+    assert upgrade_database(db_path)['duplicates'] == 0
+    assert conn.execute('SELECT COUNT(*) FROM game_events').fetchone() == (2,)
+
+    assert upgrade_database(db_path, remove_duplicates=True)['duplicates'] == 1
+    assert conn.execute('SELECT COUNT(*) FROM game_events').fetchone() == (1,)
+    assert 'Sletter dublet (række 2)' in caplog.text
+
+
+def test_ensure_event_key_blocks_new_duplicates(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, **GOAL)
+    cursor = conn.cursor()
+    ensure_schema(cursor)
+    conn.commit()
+
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("INSERT INTO game_events (Time, Team_initials, Action_1, Player_number, time_seconds, "
+                       "Event_seq) VALUES ('10.00', 'AAH', 'Mål', '7', 600, 0)")
+    # Samme hændelse med løbenummer 1 er en ny hændelse
+    cursor.execute("INSERT INTO game_events (Time, Team_initials, Action_1, Player_number, time_seconds, "
+                   "Event_seq) VALUES ('10.00', 'AAH', 'Mål', '7', 600, 1)")
+
+
+def test_ensure_event_key_is_idempotent(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, **GOAL)
+    cursor = conn.cursor()
+    ensure_schema(cursor)
+    assert ensure_event_key(cursor) == 0
+    assert ensure_schema(cursor)['event_seq'] == 0
+
+
+def test_load_event_sequences(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, **dict(GOAL, Source_line=5))
+    cursor = conn.cursor()
+    ensure_schema(cursor)
+    key = (600, 'AAH', 'Mål', '7')
+    assert load_event_sequences(cursor, [key, key]) == {key: [(0, 5)]}
+
+
+def test_create_legacy_view_reads_without_writing(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, **GOAL)
+    conn.commit()
+
+    reader = sqlite3.connect(db_path)
+    assert create_legacy_view(reader.cursor())
+    assert reader.execute('SELECT time_seconds, is_goal, is_shot, half FROM game_events').fetchall() == [(600, 1, 1, 1)]
+    reader.close()
+    assert 'time_seconds' not in get_columns(conn.cursor(), 'game_events')
+
+    ensure_schema(conn.cursor())
+    assert not create_legacy_view(conn.cursor())
+
+
+def test_ensure_schema_drops_the_old_checkpoint_table_once(legacy_db, caplog):
+    caplog.set_level(logging.INFO)
+    db_path, conn = legacy_db
+    conn.execute('CREATE TABLE ingest_checkpoints (Section_number INTEGER PRIMARY KEY, Section_hash TEXT)')
+    cursor = conn.cursor()
+    ensure_schema(cursor)
+    assert 'Sletter den forældede tabel ingest_checkpoints' in caplog.text
+    assert drop_obsolete_tables(cursor) == []
@@ -0,0 +1,52 @@
+import os
+from email.utils import parsedate_to_datetime
+
+from download_manifest import (get_conditional_headers, get_previous_sha256, hash_file, load_manifest,
+                               record_response, save_manifest, write_changed_files)
+
+URL = 'https://tophaandbold.dk/intranet/pdfmatchreport/1/2/3'
+
+
+def test_no_conditional_headers_for_unknown_urls():
+    assert get_conditional_headers({}, URL) == {}
+
+
+def test_etag_and_last_modified_from_the_manifest(tmp_path):
+    filepath = tmp_path / 'rapport.pdf'
+    filepath.write_bytes(b'%PDF')
+    manifest = {}
+    record_response(manifest, URL, {'ETag': '"v1"', 'Last-Modified': 'Sat, 12 Oct 2024 10:00:00 GMT'},
+                    str(filepath), 4, 'abc')
+    assert get_conditional_headers(manifest, URL, str(filepath)) == {
+        'If-None-Match': '"v1"', 'If-Modified-Since': 'Sat, 12 Oct 2024 10:00:00 GMT'}
+    assert manifest[URL]['filename'] == 'rapport.pdf'
+
+
+def test_files_from_before_the_manifest_use_their_mtime(tmp_path):
+    filepath = tmp_path / 'rapport.pdf'
+    filepath.write_bytes(b'%PDF')
+    os.utime(filepath, (1728727200, 1728727200))
+    headers = get_conditional_headers({}, URL, str(filepath))
+    assert parsedate_to_datetime(headers['If-Modified-Since']).timestamp() == 1728727200
+    assert get_previous_sha256({}, URL, str(filepath)) == hash_file(str(filepath))
+
+
+def test_deleted_files_are_fetched_unconditionally(tmp_path):
+    manifest = {URL: {'etag': '"v1"'}}
+    assert get_conditional_headers(manifest, URL, str(tmp_path / 'slettet.pdf')) == {}
+
+
+def test_manifest_round_trip_and_changed_files(tmp_path):
+    manifest = {URL: {'etag': '"v1"', 'sha256': 'abc'}}
+    save_manifest(manifest, str(tmp_path))
+    assert load_manifest(str(tmp_path)) == manifest
+    assert not list(tmp_path.glob('*.part'))
+
+    path = write_changed_files(['a.pdf', 'b.pdf'], str(tmp_path))
+    with open(path, encoding='utf-8') as f:
+        assert f.read().split() == ['a.pdf', 'b.pdf']
+
+
+def test_a_broken_manifest_means_fetching_everything(tmp_path):
+    (tmp_path / 'download_manifest.json').write_text('{ikke json', encoding='utf-8')
+    assert load_manifest(str(tmp_path)) == {}
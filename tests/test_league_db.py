@@ -0,0 +1,109 @@
+from conftest import create_legacy_db, insert_legacy_event
+from league_db import (migrate_databases, normalize_player_name, normalize_shirt_number, open_league_db,
+                       sync_match_database)
+
+
+def count_rows(league_path: str):
+    conn = open_league_db(league_path)
+    try:
+        return tuple(conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                     for table in ('matches', 'events', 'players'))
+    finally:
+        conn.close()
+
+
+def add_match_events(conn):
+    insert_legacy_event(conn, Time='01.00', Team_initials='A', Action_1='Mål', Player_number='7',
+                        Player_Name='Mads HANSEN')
+    insert_legacy_event(conn, Time='02.00', Team_initials='B', Action_1='Skud reddet', Player_number='4',
+                        Player_Name='Kim LARSEN', Goalkeeper_Number='1', Goalkeeper_Name='Jens BERG')
+    conn.commit()
+
+
+def test_sync_match_database_is_idempotent(legacy_db, tmp_path):
+    db_path, conn = legacy_db
+    add_match_events(conn)
+    league_path = str(tmp_path / 'league.db')
+
+    assert sync_match_database(db_path, league_path)
+    first = count_rows(league_path)
+    assert first[:2] == (1, 2)
+
+    assert sync_match_database(db_path, league_path)
+    assert count_rows(league_path) == first
+
+
+def test_sync_match_database_replaces_a_changed_match(legacy_db, tmp_path):
+    db_path, conn = legacy_db
+    add_match_events(conn)
+    league_path = str(tmp_path / 'league.db')
+    assert sync_match_database(db_path, league_path)
+
+    conn.execute("DELETE FROM game_events WHERE Action_1 = 'Skud reddet'")
+    conn.commit()
+    assert sync_match_database(db_path, league_path)
+    assert count_rows(league_path)[:2] == (1, 1)
+
+
+def test_migrate_databases_skips_unchanged_matches(legacy_db, tmp_path):
+    db_path, conn = legacy_db
+    add_match_events(conn)
+    league_path = str(tmp_path / 'league' / 'league.db')
+
+    assert migrate_databases(str(tmp_path), league_path)['imported'] == 1
+    assert migrate_databases(str(tmp_path), league_path)['unchanged'] == 1
+    assert count_rows(league_path)[:2] == (1, 2)
+
+
+def test_game_events_view_shows_the_coded_columns_as_text(legacy_db, tmp_path):
+    db_path, conn = legacy_db
+    add_match_events(conn)
+    insert_legacy_event(conn, Time='03.00', Team_initials='A', Action_1='Ny aktion', Position='ST')
+    conn.commit()
+    league_path = str(tmp_path / 'league.db')
+    assert sync_match_database(db_path, league_path)
+
+    league = open_league_db(league_path)
+    rows = league.execute('SELECT Team_initials, Action_1, Position FROM game_events ORDER BY time_seconds').fetchall()
+    assert rows == [('A', 'Mål', None), ('B', 'Skud reddet', None), ('A', 'Ny aktion', 'ST')]
+    # Aktioner fra standardize_actions.py har faste koder, ukendte tilføjes ved import
+    goal_id = league.execute("SELECT action_id FROM actions WHERE name = 'Mål'").fetchone()
+    league.close()
+    other = open_league_db(str(tmp_path / 'anden.db'))
+    assert other.execute("SELECT action_id FROM actions WHERE name = 'Mål'").fetchone() == goal_id
+    other.close()
+
+
+def test_players_keep_their_id_across_matches_and_reimports(legacy_db, tmp_path):
+    db_path, conn = legacy_db
+    add_match_events(conn)
+    second_path = str(tmp_path / '08-01-2024_A_vs_C.db')
+    second = create_legacy_db(second_path)
+    # Samme spiller med andre mellemrum, store bogstaver og foranstillet nul
+    insert_legacy_event(second, Time='05.00', Team_initials='A', Action_1='Mål', Player_number='07',
+                        Player_Name='mads  Hansen')
+    second.commit()
+    second.close()
+    league_path = str(tmp_path / 'league' / 'league.db')
+
+    assert migrate_databases(str(tmp_path), league_path)['imported'] == 2
+    league = open_league_db(league_path)
+    player_ids = league.execute(
+        "SELECT DISTINCT player_id FROM events WHERE Player_Name IN ('Mads HANSEN', 'mads  Hansen')").fetchall()
+    assert len(player_ids) == 1
+    league.close()
+
+    assert migrate_databases(str(tmp_path), league_path, force=True)['imported'] == 2
+    league = open_league_db(league_path)
+    assert league.execute("SELECT DISTINCT player_id FROM events WHERE Player_Name = 'Mads HANSEN'").fetchall() \
+        == player_ids
+    # Målmanden får også et id
+    assert league.execute("SELECT goalkeeper_id FROM events WHERE Goalkeeper_Name = 'Jens BERG'").fetchone()[0]
+    league.close()
+
+
+def test_player_names_and_numbers_are_normalized():
+    assert normalize_player_name('  ØRSTED   Jensen ') == normalize_player_name('ørsted jensen')
+    assert normalize_player_name('  ') is None
+    assert normalize_shirt_number('07') == '7'
+    assert normalize_shirt_number(None) == ''
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+import llm_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """En tom LLM cache i en midlertidig mappe"""
+    monkeypatch.setattr(llm_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(llm_cache, 'CACHE_DB', str(tmp_path / 'llm_responses.db'))
+    monkeypatch.setattr(llm_cache, 'cache_stats', {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0})
+    return llm_cache
+
+
+def test_cache_key_depends_on_everything_that_changes_the_answer():
+    key = llm_cache.make_cache_key('model', 'prompt', 'tekst', 0.0)
+    assert key == llm_cache.make_cache_key('model', 'prompt', 'tekst', 0.0)
+    assert key != llm_cache.make_cache_key('model', 'prompt', 'tekst', 0.2)
+    assert key != llm_cache.make_cache_key('model', 'anden prompt', 'tekst', 0.0)
+
+
+def test_store_and_lookup(cache):
+    assert cache.get_cached_response('a') is None
+    cache.store_response('a', 'svar')
+    assert cache.get_cached_response('a') == 'svar'
+    assert cache.get_cache_stats() == {'hits': 1, 'misses': 1, 'stores': 1, 'evictions': 0}
+
+
+def test_replacing_a_response_keeps_the_running_size(cache):
+    cache.store_response('a', 'x' * 10)
+    cache.store_response('a', 'x' * 4)
+    assert cache._cache_size[cache.CACHE_DB] == 4
+
+
+def test_least_recently_used_responses_are_evicted(cache, monkeypatch):
+    monkeypatch.setattr(cache, 'MAX_CACHE_BYTES', 25)
+    cache.store_response('a', 'x' * 10)
+    cache.store_response('b', 'x' * 10)
+    cache.get_cached_response('a')
+    cache.store_response('c', 'x' * 10)
+
+    assert cache.get_cached_response('b') is None
+    assert cache.get_cached_response('a') is not None
+    assert cache.get_cache_stats()['evictions'] == 1
+    assert cache._cache_size[cache.CACHE_DB] == 20
+
+
+def test_counters_are_exact_across_threads(cache):
+    cache.store_response('a', 'svar')
+
+    def lookup():
+        for _ in range(50):
+            cache.get_cached_response('a')
+
+    threads = [threading.Thread(target=lookup) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get_cache_stats()['hits'] == 200
@@ -0,0 +1,59 @@
+from parse_events import _take_player, parse_event_line, split_event_lines, time_to_seconds
+
+
+def test_time_to_seconds_accepts_dot_and_colon():
+    assert time_to_seconds('12.34') == 754
+    assert time_to_seconds('1:05') == 65
+
+
+def test_take_player_reads_number_and_uppercase_surname():
+    number, name, rest = _take_player(['7', 'Mads', 'HANSEN', 'Assist', '9', 'Ole', 'JENSEN'])
+    assert number == '7'
+    assert name == 'Mads HANSEN'
+    assert rest == ['Assist', '9', 'Ole', 'JENSEN']
+
+
+def test_take_player_stops_at_next_number():
+    number, name, rest = _take_player(['7', 'Mads', 'HANSEN', '1', 'Ole', 'JENSEN'])
+    assert (number, name, rest) == ('7', 'Mads HANSEN', ['1', 'Ole', 'JENSEN'])
+
+
+def test_take_player_rejects_missing_number_or_lowercase_surname():
+    assert _take_player(['Mads', 'HANSEN']) == (None, None, ['Mads', 'HANSEN'])
+    assert _take_player(['7', 'Mads', 'Hansen']) == (None, None, ['7', 'Mads', 'Hansen'])
+
+
+def test_parse_goal_with_assist():
+    event = parse_event_line('12.34 5-4 AAH Mål ST 7 Mads HANSEN Assist 9 Ole JENSEN')
+    assert event == {
+        'Time': '12.34', 'ScoreUpdate': '5-4', 'TeamInitials': 'AAH', 'Action1': 'Mål',
+        'Position': 'ST', 'PlayerNumber': '7', 'PlayerName': 'Mads HANSEN',
+        'Action2': 'Assist', 'Player2Number': '9', 'Player2Name': 'Ole JENSEN'
+    }
+
+
+def test_parse_prefers_longest_action():
+    event = parse_event_line('20:00 10-9 REH Mål på straffe 4 Kim LARSEN')
+    assert event['Time'] == '20.00'
+    assert event['Action1'] == 'Mål på straffe'
+    assert event['PlayerName'] == 'Kim LARSEN'
+
+
+def test_parse_save_with_goalkeeper():
+    event = parse_event_line('05.10 AAH Skud reddet VF 11 Per NIELSEN 1 Jens BERG')
+    assert event['GoalkeeperNumber'] == '1'
+    assert event['GoalkeeperName'] == 'Jens BERG'
+    assert 'Player2Number' not in event
+
+
+def test_parse_returns_none_for_unknown_or_ambiguous_lines():
+    assert parse_event_line('Dommere: Hansen og Jensen') is None
+    assert parse_event_line('12.00 AAH Ukendt handling') is None
+    # Retur med én spiller kan både være returspiller og målmand
+    assert parse_event_line('12.00 AAH Skud reddet 7 Mads HANSEN Retur 1 Jens BERG') is None
+
+
+def test_split_event_lines_joins_continuation_lines():
+    header, lines = split_event_lines('Header\nStøj\n01.00 AAH Mål 7 Mads\nHANSEN\n02.00 REH Time out')
+    assert header == 'Header'
+    assert lines == ['01.00 AAH Mål 7 Mads HANSEN', '02.00 REH Time out']
@@ -0,0 +1,38 @@
+import queue
+
+import pipeline
+
+
+def run_download_stage(monkeypatch, responses, retried):
+    """Kører download_stage med faste svar i stedet for async downloaderen"""
+    async def fake_download(jobs, manifest, headers, per_host, on_result):
+        for url, filepath in jobs:
+            await on_result(url, filepath, responses[filepath])
+        return {filepath: responses[filepath] for _, filepath in jobs}
+
+    monkeypatch.setattr(pipeline, 'download_files_async', fake_download)
+    pdf_queue, results, queued = queue.Queue(), {}, set()
+    jobs = [(f"https://example.com/{filepath}", filepath) for filepath in responses]
+    pipeline.download_stage(jobs, {}, pdf_queue, results, 2, retried, queued)
+    items = []
+    while True:
+        item = pdf_queue.get_nowait()
+        if item is None:
+            break
+        items.append(item)
+    return items, results, queued
+
+
+def test_download_stage_queues_new_files_and_retries(monkeypatch):
+    responses = {'a.pdf': 'downloaded', 'b.pdf': 'unchanged', 'c.pdf': 'unchanged', 'd.pdf': 'failed'}
+    items, results, queued = run_download_stage(monkeypatch, responses, retried={'c.pdf', 'd.pdf'})
+    # c.pdf kunne ikke gemmes sidst og gemmes igen selvom den er uændret
+    assert items == ['a.pdf', 'c.pdf']
+    assert queued == {'a.pdf', 'c.pdf'}
+    assert results == responses
+
+
+def test_only_stored_or_unchanged_files_are_finished():
+    results = {'/d/a.pdf': 'downloaded', '/d/b.pdf': 'downloaded', '/d/c.pdf': 'unchanged', '/d/e.pdf': 'failed'}
+    finished = pipeline.get_finished_files(results, queued={'/d/a.pdf', '/d/b.pdf'}, stored=['a.pdf'])
+    assert finished == {'/d/a.pdf', '/d/c.pdf'}
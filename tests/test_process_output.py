@@ -0,0 +1,107 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import process_output
+from process_output import attribute_events, plan_report_update, process_section_lines, save_section_lines
+
+REPORT = ('Header\n'
+          '01.00 AAH Mål ST 7 Mads HANSEN\n'
+          '02.00 REH Skud forbi 4 Kim LARSEN\n'
+          '03.00 AAH Time out')
+
+
+@pytest.fixture
+def match_db(tmp_path, monkeypatch):
+    """En tom kampdatabase oprettet som ved indlæsning af en rapport"""
+    monkeypatch.chdir(tmp_path)
+    conn, cursor = process_output.create_database('12-10-2024\nKAMPHÆNDELSER AAH - REH\n')
+    yield conn, cursor
+    conn.close()
+
+
+def store_report(conn, cursor, sections):
+    """Gemmer de nye linjer som process_handball_content - alle linjer kan parses lokalt"""
+    pending = plan_report_update(cursor, sections)
+    for section_num, header, new_lines in pending:
+        events = process_section_lines(header, [line for _, line in new_lines], section_num)
+        save_section_lines(cursor, section_num, new_lines, events)
+    conn.commit()
+    return pending
+
+
+def get_actions(cursor):
+    cursor.execute('SELECT Time, Action_1, Source_line FROM game_events ORDER BY time_seconds')
+    return cursor.fetchall()
+
+
+def test_first_ingest_stores_every_line(match_db):
+    conn, cursor = match_db
+    pending = store_report(conn, cursor, [REPORT])
+    assert [len(new_lines) for _, _, new_lines in pending] == [3]
+    assert [action for _, action, _ in get_actions(cursor)] == ['Mål', 'Skud forbi', 'Time out']
+
+
+def test_unchanged_report_is_skipped(match_db):
+    conn, cursor = match_db
+    store_report(conn, cursor, [REPORT])
+    before = get_actions(cursor)
+    assert store_report(conn, cursor, [REPORT]) == []
+    assert get_actions(cursor) == before
+
+
+def test_revised_line_replaces_only_its_events(match_db):
+    conn, cursor = match_db
+    store_report(conn, cursor, [REPORT])
+    kept = [row for row in get_actions(cursor) if row[1] != 'Skud forbi']
+
+    pending = store_report(conn, cursor, [REPORT.replace('Skud forbi', 'Skud reddet')])
+    assert [line for _, _, new_lines in pending for _, line in new_lines] == ['02.00 REH Skud reddet 4 Kim LARSEN']
+    actions = get_actions(cursor)
+    assert [action for _, action, _ in actions] == ['Mål', 'Skud reddet', 'Time out']
+    assert [row for row in actions if row[1] != 'Skud reddet'] == kept
+
+
+def test_legacy_events_without_report_lines_are_reloaded(match_db):
+    conn, cursor = match_db
+    cursor.execute("INSERT INTO game_events (Time, Action_1, time_seconds, Event_seq) VALUES ('01.00', 'Mål', 60, 0)")
+    conn.commit()
+
+    store_report(conn, cursor, [REPORT])
+    assert len(get_actions(cursor)) == 3
+    assert all(source_line is not None for _, _, source_line in get_actions(cursor))
+
+
+LINES = ['10.05 AAH Foo', '12.30 AAH Bar', '12.30 REH Baz', '20.00 AAH Qux']
+
+
+def test_attribute_events_spreads_equal_times_over_the_lines():
+    events = [{'Time': '12.30'}, {'Time': '12.30'}, {'Time': '10.05'}]
+    assert [index for index, _ in attribute_events(events, LINES, [0, 1, 2, 3])] == [1, 2, 0]
+
+
+def test_attribute_events_uses_the_nearest_line_for_unknown_times(caplog):
+    events = [{'Time': '19.00'}, {'Time': '11.00'}]
+    assert [index for index, _ in attribute_events(events, LINES, [0, 1, 3])] == [3, 0]
+    assert 'matcher ingen sendt linje' in caplog.text
+
+
+def test_async_processing_writes_from_the_writer_thread(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    threads = set()
+    original = process_output.save_section_lines
+
+    def record_thread(*args):
+        threads.add(threading.current_thread().name)
+        return original(*args)
+
+    monkeypatch.setattr(process_output, 'save_section_lines', record_thread)
+    content = '12-10-2024\nKAMPHÆNDELSER AAH - REH\n' + REPORT.replace('Header', 'Tid Hold Hændelse') + '\nSoftware'
+    asyncio.run(process_output.process_handball_content_async(content, use_parser=True))
+
+    assert threads and all(name.startswith('db_writer') for name in threads)
+    conn = sqlite3.connect(next((tmp_path / 'Databases').glob('*.db')))
+    assert conn.execute('SELECT COUNT(*) FROM game_events').fetchone() == (3,)
+    conn.close()
@@ -0,0 +1,76 @@
+import pytest
+
+import rate_limiter
+
+
+class Clock:
+    """Styrbar time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    yield clock
+    rate_limiter._state.clear()
+
+
+def test_unconfigured_limiter_never_waits():
+    rate_limiter._state.clear()
+    assert rate_limiter._reserve(10 ** 6) == 0.0
+
+
+def test_request_bucket_allows_a_burst_then_refills(clock):
+    # 6 kald/min = 0.1 kald/sek, spanden rummer 10 sekunders forbrug = 1 kald
+    rate_limiter.configure_rate_limits(requests_per_minute=6, tokens_per_minute=0, headroom=1.0)
+    assert rate_limiter._reserve(100) == 0.0
+    assert rate_limiter._reserve(100) == pytest.approx(10.0)
+
+    clock.now += 10
+    assert rate_limiter._reserve(100) == 0.0
+
+
+def test_token_bucket_waits_for_the_tokens_and_settle_corrects_it(clock):
+    # 600 tokens/min = 10 tokens/sek, spanden rummer 100 tokens
+    rate_limiter.configure_rate_limits(requests_per_minute=0, tokens_per_minute=600, headroom=1.0)
+    assert rate_limiter._reserve(80) == 0.0
+    assert rate_limiter._reserve(40) == pytest.approx(2.0)
+
+    # Kaldet brugte kun 30 tokens - de 50 overskydende gives tilbage
+    rate_limiter.settle(80, 30)
+    assert rate_limiter._reserve(40) == 0.0
+
+
+def test_a_call_larger_than_the_bucket_waits_for_a_full_bucket(clock):
+    rate_limiter.configure_rate_limits(requests_per_minute=0, tokens_per_minute=600, headroom=1.0)
+    assert rate_limiter._reserve(500) == 0.0
+    assert rate_limiter._reserve(500) == pytest.approx(50.0)
+
+
+def test_rate_limited_pauses_everyone_and_backs_off(clock):
+    rate_limiter.configure_rate_limits(requests_per_minute=600, tokens_per_minute=0, headroom=1.0)
+    rate_limiter.report_rate_limited()
+    assert rate_limiter._reserve(1) == pytest.approx(rate_limiter.MIN_BACKOFF_SECONDS)
+    rate_limiter.report_rate_limited()
+    assert rate_limiter._state['backoff_seconds'] == 2 * rate_limiter.MIN_BACKOFF_SECONDS
+
+    rate_limiter.report_rate_limited(retry_after=30)
+    assert rate_limiter._reserve(1) == pytest.approx(30.0)
+    assert rate_limiter.get_limiter_stats()['rate_limited_count'] == 3
+
+    rate_limiter.report_success()
+    rate_limiter.report_success()
+    assert rate_limiter._state['backoff_seconds'] == 0.0
+
+
+def test_parse_retry_after():
+    assert rate_limiter.parse_retry_after('3') == 3.0
+    assert rate_limiter.parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert rate_limiter.parse_retry_after('snart') is None
+    assert rate_limiter.parse_retry_after(None) is None
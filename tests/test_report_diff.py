@@ -0,0 +1,33 @@
+from report_diff import diff_report_lines
+
+
+def test_identical_reports_are_unchanged():
+    old = [(10, 'a'), (11, 'b'), (12, 'c')]
+    assert diff_report_lines(old, ['a', 'b', 'c']) == {
+        'unchanged': [(10, 0), (11, 1), (12, 2)], 'removed': [], 'added': []
+    }
+
+
+def test_empty_stored_version_adds_every_line():
+    assert diff_report_lines([], ['a', 'b']) == {'unchanged': [], 'removed': [], 'added': [0, 1]}
+
+
+def test_inserted_line_shifts_positions():
+    result = diff_report_lines([(1, 'a'), (2, 'c')], ['a', 'b', 'c'])
+    assert result == {'unchanged': [(1, 0), (2, 2)], 'removed': [], 'added': [1]}
+
+
+def test_changed_line_is_removed_and_added():
+    result = diff_report_lines([(1, 'a'), (2, 'b'), (3, 'c')], ['a', 'B', 'c'])
+    assert result == {'unchanged': [(1, 0), (3, 2)], 'removed': [2], 'added': [1]}
+
+
+def test_removed_line():
+    result = diff_report_lines([(1, 'a'), (2, 'b'), (3, 'c')], ['a', 'c'])
+    assert result == {'unchanged': [(1, 0), (3, 1)], 'removed': [2], 'added': []}
+
+
+def test_repeated_lines_keep_their_ids():
+    result = diff_report_lines([(1, 'x'), (2, 'x')], ['x', 'x', 'x'])
+    assert result['unchanged'] == [(1, 0), (2, 1)]
+    assert result['added'] == [2]
@@ -0,0 +1,33 @@
+import requests
+
+import scrape_matches
+
+
+class BrokenResponse:
+    """Et svar hvor forbindelsen ryger midt i indholdet"""
+    status_code = 200
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        yield b'%PDF-1.4 halv'
+        raise requests.exceptions.ChunkedEncodingError('forbindelsen blev afbrudt')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+class BrokenSession:
+    def get(self, url, **kwargs):
+        return BrokenResponse()
+
+
+def test_download_pdf_removes_the_part_file_on_a_broken_stream(tmp_path):
+    url = 'https://tophaandbold.dk/intranet/pdfmatchreport/1/2/3'
+    assert scrape_matches.download_pdf(BrokenSession(), url, str(tmp_path)) == 'failed'
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,77 @@
+import sqlite3
+
+from conftest import insert_legacy_event
+from standardize_actions import standardize_event, standardize_parsed_event, update_database
+
+
+def get_events(db_path: str):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            'SELECT Action_1, Position, is_goal, Standardized FROM game_events ORDER BY rowid'
+        ).fetchall()
+
+
+def test_standardize_event_splits_position_from_action():
+    event = {'Action_1': 'Mål ST', 'Position': None, 'Player_number': '7', 'Player_Name': 'Mads HANSEN',
+             'Action_2': None, 'Player2_Number': None}
+    standardized = standardize_event(event)
+    assert (standardized['Action_1'], standardized['Position']) == ('Mål', 'ST')
+
+
+def test_standardize_parsed_event_keeps_clean_events():
+    event = {'Time': '10.00', 'Action1': 'Mål', 'Position': 'ST'}
+    assert standardize_parsed_event(event) is event
+
+
+def test_update_database_standardizes_and_marks_rows(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, Time='10.00', Team_initials='AAH', Action_1='Mål ST')
+    conn.commit()
+
+    assert update_database(db_path)
+    assert get_events(db_path) == [('Mål', 'ST', 1, 1)]
+
+
+def test_update_database_sees_rows_that_reuse_a_deleted_rowid(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, Time='10.00', Team_initials='AAH', Action_1='Mål')
+    insert_legacy_event(conn, Time='11.00', Team_initials='AAH', Action_1='Mål')
+    conn.commit()
+    assert update_database(db_path)
+
+    # Den nye række får samme rowid som den slettede
+    conn.execute('DELETE FROM game_events WHERE rowid = 2')
+    insert_legacy_event(conn, Time='12.00', Team_initials='AAH', Action_1='Mål VB')
+    conn.commit()
+    assert conn.execute("SELECT rowid FROM game_events WHERE Time = '12.00'").fetchone() == (2,)
+
+    assert update_database(db_path)
+    assert get_events(db_path) == [('Mål', None, 1, 1), ('Mål', 'VB', 1, 1)]
+
+
+def test_update_database_skips_marked_rows_unless_full(legacy_db):
+    db_path, conn = legacy_db
+    insert_legacy_event(conn, Time='10.00', Team_initials='AAH', Action_1='Mål')
+    conn.commit()
+    assert update_database(db_path)
+
+    conn.execute("UPDATE game_events SET Action_1 = 'Mål HB'")
+    conn.commit()
+    assert update_database(db_path)
+    assert get_events(db_path)[0][:2] == ('Mål HB', None)
+
+    assert update_database(db_path, full=True)
+    assert get_events(db_path)[0][:2] == ('Mål', 'HB')
+
+
+def test_update_database_keeps_rows_that_get_the_same_key(legacy_db, caplog):
+    db_path, conn = legacy_db
+    # Efter standardiseringen er begge rækker mål af nr. 7 i samme sekund
+    insert_legacy_event(conn, Time='10.00', Team_initials='AAH', Action_1='Mål', Player_number='7')
+    insert_legacy_event(conn, Time='10.00', Team_initials='AAH', Action_1='Mål ST', Player_number='7')
+    conn.commit()
+
+    assert update_database(db_path)
+    assert get_events(db_path) == [('Mål', None, 1, 1), ('Mål', 'ST', 1, 1)]
+    assert conn.execute('SELECT Event_seq FROM game_events ORDER BY rowid').fetchall() == [(0,), (1,)]
+    assert 'begge beholdes' in caplog.text
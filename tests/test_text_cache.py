@@ -0,0 +1,33 @@
+import pytest
+
+import text_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """En tom tekst cache i en midlertidig mappe"""
+    monkeypatch.setattr(text_cache, 'CACHE_DIR', str(tmp_path))
+    monkeypatch.setattr(text_cache, 'TEXT_CACHE_DB', str(tmp_path / 'pdf_text.db'))
+    monkeypatch.setattr(text_cache, 'cache_stats', {'hits': 0, 'misses': 0, 'stores': 0, 'stale': 0})
+    return text_cache
+
+
+def test_hash_depends_only_on_the_bytes(tmp_path):
+    first, second = tmp_path / 'a.pdf', tmp_path / 'b.pdf'
+    first.write_bytes(b'%PDF samme indhold')
+    second.write_bytes(b'%PDF samme indhold')
+    assert text_cache.hash_pdf_file(str(first)) == text_cache.hash_pdf_file(str(second))
+
+
+def test_store_and_lookup_per_backend(cache):
+    cache.store_text('abc', 'tekst', 'pypdf2')
+    assert cache.get_cached_text('abc', 'pypdf2') == 'tekst'
+    assert cache.get_cached_text('abc', 'pdfplumber') is None
+    assert cache.get_text_cache_stats() == {'hits': 1, 'misses': 1, 'stores': 1, 'stale': 0}
+
+
+def test_text_from_another_extractor_version_is_stale(cache, monkeypatch):
+    cache.store_text('abc', 'tekst', 'pypdf2')
+    monkeypatch.setattr(cache, 'get_extractor_version', lambda backend: 'ny version')
+    assert cache.get_cached_text('abc', 'pypdf2') is None
+    assert cache.get_text_cache_stats()['stale'] == 1
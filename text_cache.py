@@ -0,0 +1,220 @@
+import sqlite3
+import os
+import sys
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from pdf import extract_pdf_text_timed, get_extractor_version, DEFAULT_BACKEND, PDF_BACKENDS
+
+CACHE_DIR = 'Cache'
+TEXT_CACHE_DB = os.path.join(CACHE_DIR, 'pdf_text.db')
+
+# Bytes der læses ad gangen når PDF-filen hashes
+HASH_CHUNK_BYTES = 1024 * 1024
+
+# Tællere for den aktuelle kørsel - opdateres fra flere tråde under _lock
+cache_stats = {'hits': 0, 'misses': 0, 'stores': 0, 'stale': 0}
+_lock = threading.Lock()
+
+# Hver tråd genbruger sin forbindelse, og tabellen oprettes én gang pr. proces
+_local = threading.local()
+_initialized = set()
+
+
+def hash_pdf_file(pdf_path: str) -> str:
+    """SHA-256 af PDF-filens bytes - samme rapport giver samme nøgle uanset filnavn og mappe"""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as pdf_file:
+        for chunk in iter(lambda: pdf_file.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _create_schema(conn: sqlite3.Connection):
+    """Opretter tabellen hvis den mangler"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS pdf_texts (
+        pdf_sha256 TEXT NOT NULL,
+        backend TEXT NOT NULL,
+        extractor_version TEXT NOT NULL,
+        content TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (pdf_sha256, backend)
+    )
+    ''')
+    conn.commit()
+
+
+def _connect() -> sqlite3.Connection:
+    """Trådens forbindelse til tekst cachen - åbnes og oprettes første gang den bruges"""
+    conn = getattr(_local, 'connections', {}).get(TEXT_CACHE_DB)
+    if conn is not None:
+        return conn
+
+    with _lock:
+        if TEXT_CACHE_DB not in _initialized:
+            if not os.path.exists(CACHE_DIR):
+                logging.info(f"Opretter {CACHE_DIR} mappe")
+                os.makedirs(CACHE_DIR)
+            conn = sqlite3.connect(TEXT_CACHE_DB, timeout=30)
+            _create_schema(conn)
+            _initialized.add(TEXT_CACHE_DB)
+    if conn is None:
+        conn = sqlite3.connect(TEXT_CACHE_DB, timeout=30)
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+    _local.connections[TEXT_CACHE_DB] = conn
+    return conn
+
+
+def _discard_connection():
+    """Lukker trådens forbindelse efter en fejl, så næste opslag åbner en ny"""
+    conn = getattr(_local, 'connections', {}).pop(TEXT_CACHE_DB, None)
+    if conn is not None:
+        conn.close()
+
+
+def _count(counter: str):
+    """Tæller en af cache_stats op"""
+    with _lock:
+        cache_stats[counter] += 1
+
+
+def get_cached_text(pdf_hash: str, backend: str = None) -> Optional[str]:
+    """
+    Henter den gemte tekst for en PDF udtrukket med backend.
+
+    Tekst fra en anden udtrækker version (ny pakke version eller EXTRACTOR_VERSION)
+    tæller som et miss og overskrives når teksten gemmes igen.
+
+    Returns:
+        Optional[str]: Den udtrukne tekst, eller None ved cache miss
+    """
+    backend = backend or DEFAULT_BACKEND
+    try:
+        conn = _connect()
+        row = conn.execute(
+            'SELECT content, extractor_version FROM pdf_texts WHERE pdf_sha256 = ? AND backend = ?',
+            (pdf_hash, backend)
+        ).fetchone()
+        if row is None or row[1] != get_extractor_version(backend):
+            if row is not None:
+                _count('stale')
+            _count('misses')
+            return None
+
+        conn.execute(
+            'UPDATE pdf_texts SET last_access = ? WHERE pdf_sha256 = ? AND backend = ?',
+            (time.time(), pdf_hash, backend)
+        )
+        conn.commit()
+        _count('hits')
+        logging.debug(f"Tekst cache hit for {pdf_hash[:12]}")
+        return row[0]
+    except sqlite3.Error as e:
+        # En defekt cache må aldrig stoppe behandlingen
+        logging.error(f"Fejl ved læsning fra tekst cache: {str(e)}")
+        _discard_connection()
+        _count('misses')
+        return None
+
+
+def store_text(pdf_hash: str, text: str, backend: str = None):
+    """Gemmer den udtrukne tekst sammen med udtrækkerens version"""
+    backend = backend or DEFAULT_BACKEND
+    try:
+        conn = _connect()
+        now = time.time()
+        conn.execute('''
+            INSERT OR REPLACE INTO pdf_texts
+                (pdf_sha256, backend, extractor_version, content, size, created_at, last_access)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (pdf_hash, backend, get_extractor_version(backend), text,
+              len(text.encode('utf-8')), now, now))
+        conn.commit()
+        _count('stores')
+    except sqlite3.Error as e:
+        logging.error(f"Fejl ved skrivning til tekst cache: {str(e)}")
+        _discard_connection()
+
+
+def get_text_cache_stats() -> Dict[str, int]:
+    """Returnerer en kopi af hit/miss tællerne"""
+    with _lock:
+        return dict(cache_stats)
+
+
+def find_pdf_files(directories: List[str]) -> List[str]:
+    """Stierne til alle PDF-filer i mapperne"""
+    pdf_paths = []
+    for directory in directories:
+        if not os.path.isdir(directory):
+            logging.warning(f"Mappen findes ikke: {directory}")
+            continue
+        pdf_paths.extend(
+            os.path.join(directory, f) for f in sorted(os.listdir(directory)) if f.lower().endswith('.pdf')
+        )
+    return pdf_paths
+
+
+def backfill_text_cache(directories: List[str], backend: str = None, workers: int = 1) -> Dict[str, int]:
+    """
+    Udtrækker og gemmer teksten for alle PDF'er i mapperne som ikke allerede er i cachen.
+
+    Bruges til at fylde cachen for hele sæsonarkivet (Processed og Error_Appeared),
+    så en senere genbehandling ikke skal udtrække nogen PDF'er.
+    """
+    backend = backend or DEFAULT_BACKEND
+    missing = []
+    for pdf_path in find_pdf_files(directories):
+        pdf_hash = hash_pdf_file(pdf_path)
+        if get_cached_text(pdf_hash, backend) is None:
+            missing.append((pdf_path, pdf_hash))
+
+    logging.info(f"{len(missing)} PDF-filer mangler i tekst cachen ({get_extractor_version(backend)})")
+    result = {'cached': get_text_cache_stats()['hits'], 'extracted': 0, 'failed': 0}
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [(pdf_path, pdf_hash, pool.submit(extract_pdf_text_timed, pdf_path, backend))
+                   for pdf_path, pdf_hash in missing]
+        for pdf_path, pdf_hash, future in futures:
+            try:
+                text, seconds = future.result()
+            except Exception as e:
+                logging.error(f"Kunne ikke udtrække {pdf_path}: {str(e)}")
+                result['failed'] += 1
+                continue
+            store_text(pdf_hash, text, backend)
+            result['extracted'] += 1
+            logging.debug(f"Udtrak {pdf_path} på {seconds:.2f} sekunder")
+
+    return result
+
+
+def parse_arguments() -> argparse.Namespace:
+    """Læser kommandolinje argumenter"""
+    parser = argparse.ArgumentParser(description="Fylder tekst cachen med udtrukket tekst fra PDF-filer")
+    parser.add_argument('directories', nargs='*', default=['Processed', 'Error_Appeared'],
+                        help="Mapper med PDF-filer (standard: Processed og Error_Appeared)")
+    parser.add_argument('--pdf-backend', choices=list(PDF_BACKENDS), default=None,
+                        help="PDF backend (standard: PDF_BACKEND eller pypdf2)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Antal processer til PDF udtrækning")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    args = parse_arguments()
+    try:
+        result = backfill_text_cache(args.directories, args.pdf_backend, args.workers)
+    except Exception:
+        logging.error("Kunne ikke fylde tekst cachen", exc_info=True)
+        sys.exit(1)
+    logging.info(f"Tekst cache: {result['cached']} fandtes allerede, {result['extracted']} udtrukket, "
+                 f"{result['failed']} fejlede")
@@ -0,0 +1,39 @@
+import re
+from typing import List
+
+# Ord og tegnsætning tælles hver for sig ligesom i en BPE tokenizer
+TOKEN_PIECE_PATTERN = re.compile(r'\w+|[^\w\s]', re.UNICODE)
+
+# Gennemsnitligt antal tegn pr. token for ord - sat lavt så estimatet er forsigtigt
+CHARS_PER_TOKEN = 3.5
+
+# Anslåede output tokens pr. hændelse for JSON formatet i get_system_prompt
+VERBOSE_EVENT_OUTPUT_TOKENS = 75
+
+# Anslåede output tokens pr. hændelse for det kompakte format, hvor nøglerne kun står i headeren
+COMPACT_EVENT_OUTPUT_TOKENS = 30
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Anslår antallet af tokens i en tekst uden at kalde API'et.
+
+    Hvert ord koster mindst én token og lange ord flere. Tegn udenfor ASCII
+    (æ, ø, å, ö ...) deles typisk op af tokenizeren og tæller derfor ekstra.
+    """
+    if not text:
+        return 0
+
+    tokens = 0
+    for piece in TOKEN_PIECE_PATTERN.findall(text):
+        if piece[0].isalnum() or piece[0] == '_':
+            tokens += max(1, round(len(piece) / CHARS_PER_TOKEN))
+            tokens += sum(1 for char in piece if ord(char) > 127)
+        else:
+            tokens += 1
+    return tokens
+
+
+def estimate_lines_tokens(lines: List[str]) -> int:
+    """Anslår tokens for en liste af linjer inklusiv linjeskift"""
+    return sum(estimate_tokens(line) + 1 for line in lines)
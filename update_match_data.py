@@ -4,6 +4,10 @@ import logging
 from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from typing import Dict, List, Tuple, Set
+from db_schema import ensure_schema
+
+# Action_2 hvor Player2 er fra modstanderholdet (defensive aktioner)
+OPPONENT_ACTION2 = ('Blok af (ret)', 'Blokeret af', 'Bold erobret', 'Forårs. str.')
 
 def setup_logging():
     """Konfigurerer logging med rotation"""
@@ -44,7 +48,7 @@ def get_final_score(cursor: sqlite3.Cursor) -> Tuple[int, int]:
             SELECT Score_update 
             FROM game_events 
             WHERE Score_update IS NOT NULL 
-            ORDER BY CAST(REPLACE(REPLACE(Time, ':', ''), '.', '') AS INTEGER) DESC 
+            ORDER BY time_seconds DESC 
             LIMIT 1
         """)
         
@@ -62,11 +66,13 @@ def get_final_score(cursor: sqlite3.Cursor) -> Tuple[int, int]:
 def get_team_initials(cursor: sqlite3.Cursor) -> Tuple[str, str]:
     """Finder home og away team initials"""
     try:
+        # Holdene i den rækkefølge de første gang optræder i kampen
         cursor.execute("""
-            SELECT DISTINCT Team_initials 
+            SELECT Team_initials 
             FROM game_events 
             WHERE Team_initials IS NOT NULL 
-            ORDER BY Time 
+            GROUP BY Team_initials 
+            ORDER BY MIN(time_seconds) 
             LIMIT 2
         """)
         
@@ -103,19 +109,14 @@ def get_team_players(cursor: sqlite3.Cursor, team_initial: str) -> Tuple[Set[str
         field_players.update(row[0] for row in cursor.fetchall())
         
         # 3. Spillere fra modstanderholdet ved defensive aktioner
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT DISTINCT Player2_Name
             FROM game_events 
             WHERE Team_initials != ? 
-            AND Action_2 IN (
-                'Blok af (ret)',
-                'Blokeret af',
-                'Bold erobret',
-                'Forårs. str.'
-            )
+            AND Action_2 IN ({', '.join('?' for _ in OPPONENT_ACTION2)})
             AND Player2_Name IS NOT NULL 
             AND Player2_Name != ''
-        """, (team_initial,))
+        """, (team_initial, *OPPONENT_ACTION2))
         field_players.update(row[0] for row in cursor.fetchall())
         
         # 4. Find målmænd (fra Goalkeeper_Name hvor Team_initials IKKE er holdets)
@@ -188,6 +189,9 @@ def update_database(db_path: str):
         with sqlite3.connect(db_path) as conn:
             cursor = conn.cursor()
             
+            # Databaser fra før time_seconds og de afledte kolonner opgraderes først
+            ensure_schema(cursor)
+            
             # Opret tabeller
             create_match_data_table(cursor)
             create_players_table(cursor)
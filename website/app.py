@@ -1,10 +1,15 @@
 from flask import Flask, render_template
 import sqlite3
 import os
+import sys
 from datetime import datetime
 import re
 import logging
-from typing import Optional, Tuple, Dict
+from typing import Optional, Tuple, Dict, Set
+
+# db_schema.py ligger i projektmappen over website
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db_schema import create_legacy_view
 
 # Konfigurer logging
 logging.basicConfig(
@@ -19,6 +24,32 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
+# Kampdatabaser der har det aktuelle skema - de kontrolleres ikke igen i denne proces
+_current_databases: Set[str] = set()
+
+# Forsiden bruger kun den samlede database fra league_db.py når den er slået til
+USE_LEAGUE_DB = os.getenv("LEAGUE_DB", "0") == "1"
+
+def connect_match_db(db_path: str) -> sqlite3.Connection:
+    """
+    Åbner en kampdatabase til læsning.
+
+    Forespørgslerne bruger time_seconds, is_goal og is_shot, som databaser fra
+    før kolonnerne ikke har. Siden skriver ikke til databasen - i stedet beregnes
+    kolonnerne af et midlertidigt view, indtil databasen er opgraderet med db_schema.py.
+    """
+    conn = sqlite3.connect(db_path)
+    if db_path in _current_databases:
+        return conn
+    try:
+        if create_legacy_view(conn.cursor()):
+            logger.warning(f"{db_path} mangler de nye kolonner - kør db_schema.py for at opgradere den")
+        else:
+            _current_databases.add(db_path)
+    except sqlite3.Error as e:
+        logger.error(f"Kunne ikke læse skemaet for {db_path}: {str(e)}")
+    return conn
+
 def get_team_mapping() -> Dict[str, str]:
     """Henter team mapping fra databasen"""
     try:
@@ -88,21 +119,26 @@ def get_match_statistics(match: Dict) -> Dict:
             logger.warning("Manglende match data for statistik beregning")
             return {'duration': 0, 'player_count': 0, 'total_goals': 0}
 
+        # Kampe fra den samlede database har statistikken med fra index forespørgslen
+        if match.get('stats'):
+            return match['stats']
+
         db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Databases', match['database'])
         if not os.path.exists(db_path):
             logger.warning(f"Database ikke fundet: {db_path}")
             return {'duration': 0, 'player_count': 0, 'total_goals': 0}
 
-        conn = sqlite3.connect(db_path)
+        conn = connect_match_db(db_path)
         cursor = conn.cursor()
         
         try:
             # Find hjemmeholdet
             cursor.execute("""
-                SELECT DISTINCT Team_initials 
+                SELECT Team_initials 
                 FROM game_events 
                 WHERE Team_initials IS NOT NULL 
-                ORDER BY Time 
+                GROUP BY Team_initials 
+                ORDER BY MIN(time_seconds) 
                 LIMIT 1
             """)
             home_team_row = cursor.fetchone()
@@ -112,8 +148,8 @@ def get_match_statistics(match: Dict) -> Dict:
                 logger.error(f"Kunne ikke identificere hjemmeholdet i {db_path}")
                 return {'duration': 0, 'player_count': 0, 'total_goals': 0}
             
-            # Beregn varighed
-            cursor.execute("SELECT MAX(CAST(Time AS INTEGER)) FROM game_events")
+            # Beregn varighed i minutter
+            cursor.execute("SELECT MAX(time_seconds) / 60 FROM game_events")
             duration = cursor.fetchone()[0] or 0
             
             # Tæl unikke spillere
@@ -124,15 +160,11 @@ def get_match_statistics(match: Dict) -> Dict:
             """)
             player_count = cursor.fetchone()[0] or 0
             
-            # Tæl mål med samme logik som get_final_score
+            # Tæl mål med samme logik som get_final_score (partielt indeks på is_goal)
             cursor.execute("""
-                SELECT 
-                    SUM(CASE 
-                        WHEN (Action_1 = 'Mål' OR Action_1 = 'Mål på straffe') 
-                        THEN 1 ELSE 0 
-                    END) as total_goals
+                SELECT COUNT(*) as total_goals
                 FROM game_events
-                WHERE Action_1 IS NOT NULL
+                WHERE is_goal = 1
             """)
             total_goals = cursor.fetchone()[0] or 0
             
@@ -203,6 +235,96 @@ def get_all_matches():
     matches.sort(key=lambda x: datetime.strptime(x['date'], '%d. %B %Y'), reverse=True)
     return matches
 
+def get_league_db_path() -> str:
+    """Stien til den samlede database fra league_db.py"""
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), 'Databases', 'league', 'league.db')
+
+def use_league_db(league_db_path: str, databases_dir: str) -> bool:
+    """
+    Om forsiden kan hentes fra den samlede database.
+
+    Kræver LEAGUE_DB=1, og at den samlede database er nyere end alle kampdatabaserne.
+    Er en kamp gemt eller ændret uden at den samlede database er opdateret
+    (league_db.py), bruges de enkelte kampdatabaser, så ingen kampe mangler.
+    """
+    if not USE_LEAGUE_DB or not os.path.exists(league_db_path):
+        return False
+    league_mtime = os.path.getmtime(league_db_path)
+    for db_file in os.listdir(databases_dir):
+        if not db_file.endswith('.db') or db_file == 'team_mapping.db':
+            continue
+        if os.path.getmtime(os.path.join(databases_dir, db_file)) > league_mtime:
+            logger.info(f"{db_file} er nyere end den samlede database - bruger kampdatabaserne")
+            return False
+    return True
+
+def get_matches_from_league_db(db_path: str) -> list:
+    """
+    Henter alle kampe med score og statistik fra den samlede database i én forespørgsel.
+
+    Hjemmeholdet og målene beregnes som i get_final_score og get_match_data_from_db,
+    men grupperet pr. match_id i stedet for én databasefil pr. kamp, på holdets
+    heltalskode og på is_goal i stedet for aktionens tekst. Spillerne tælles på
+    navnet som i de enkelte kampdatabaser, så begge veje giver samme antal.
+    Kampe uden hændelser eller med et ukendt hjemmehold vises med 0-0 som i
+    listen fra de enkelte kampdatabaser.
+    """
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT 
+                m.database,
+                m.match_date,
+                m.home_team_initial,
+                m.away_team_initial,
+                COALESCE(SUM(CASE WHEN e.team_id = home.team_id AND e.is_goal = 1 THEN 1 ELSE 0 END), 0)
+                    as home_goals,
+                COALESCE(SUM(CASE WHEN e.team_id != home.team_id AND e.is_goal = 1 THEN 1 ELSE 0 END), 0)
+                    as away_goals,
+                MAX(e.time_seconds) / 60 as duration,
+                COUNT(DISTINCT CASE WHEN e.Player_Name IS NOT NULL AND e.Player_Name != ''
+                    THEN e.Player_Name END) as player_count,
+                SUM(e.is_goal) as total_goals
+            FROM matches m
+            LEFT JOIN teams home ON home.name = m.home_team_initial
+            LEFT JOIN events e ON e.match_id = m.match_id
+            WHERE m.away_team_initial IS NOT NULL
+            GROUP BY m.match_id
+            ORDER BY m.match_date DESC
+        """)
+        rows = cursor.fetchall()
+    
+    matches = []
+    for database, match_date, home_team, away_team, home_goals, away_goals, \
+            duration, player_count, total_goals in rows:
+        try:
+            # Samme validering som get_final_score
+            if home_goals > 100 or away_goals > 100:
+                logger.warning(f"Urealistisk høj score ({home_goals}-{away_goals}) i {database}")
+                home_goals, away_goals = 0, 0
+            
+            matches.append({
+                'date': datetime.strptime(match_date, '%Y-%m-%d').strftime('%d. %B %Y'),
+                'home_team': format_team_name(home_team),
+                'away_team': format_team_name(away_team),
+                'score': f"{home_goals}-{away_goals}",
+                'duration': duration or 0,
+                'player_count': player_count or 0,
+                'total_goals': total_goals or 0,
+                'database': database,
+                'stats': {
+                    'duration': duration or 0,
+                    'player_count': player_count or 0,
+                    'total_goals': total_goals or 0
+                }
+            })
+        except Exception as e:
+            logger.error(f"Fejl ved behandling af {database}: {str(e)}")
+            continue
+    
+    logger.info(f"Hentede {len(matches)} kampe fra {db_path}")
+    return matches
+
 def parse_database_filename(db_file: str) -> dict:
     """
     Parser database filnavn til kampinformation.
@@ -236,15 +358,16 @@ def get_match_data_from_db(db_path: str) -> dict:
         final_score = get_final_score(db_path)
         score_str = f"{final_score[0]}-{final_score[1]}"
         
-        with sqlite3.connect(db_path) as conn:
+        with connect_match_db(db_path) as conn:
             cursor = conn.cursor()
             
             # Hent holdnavne fra databasen
             cursor.execute("""
-                SELECT DISTINCT Team_initials 
+                SELECT Team_initials 
                 FROM game_events 
                 WHERE Team_initials IS NOT NULL 
-                ORDER BY Time 
+                GROUP BY Team_initials 
+                ORDER BY MIN(time_seconds) 
                 LIMIT 2
             """)
             teams = cursor.fetchall()
@@ -254,13 +377,13 @@ def get_match_data_from_db(db_path: str) -> dict:
                 logger.error(f"Kunne ikke finde begge hold i {db_path}")
                 return None
                 
-            # Hent kampstatistik
+            # Hent kampstatistik - varighed og mål slås op i indekserne
             cursor.execute("""
                 SELECT 
-                    MAX(CAST(REPLACE(REPLACE(Time, ':', ''), '.', '') AS INTEGER)) as duration,
-                    COUNT(DISTINCT CASE WHEN Player_Name IS NOT NULL AND Player_Name != '' THEN Player_Name END) as player_count,
-                    COUNT(CASE WHEN Action_1 = 'Mål' OR Action_1 = 'Mål på straffe' THEN 1 END) as total_goals
-                FROM game_events
+                    (SELECT MAX(time_seconds) / 60 FROM game_events) as duration,
+                    (SELECT COUNT(DISTINCT Player_Name) FROM game_events 
+                     WHERE Player_Name IS NOT NULL AND Player_Name != '') as player_count,
+                    (SELECT COUNT(*) FROM game_events WHERE is_goal = 1) as total_goals
             """)
             stats_row = cursor.fetchone()
             
@@ -551,16 +674,17 @@ def get_final_score(database_path: str) -> Tuple[int, int]:
     Henter og validerer kampens endelige score ved at tælle faktiske mål.
     """
     try:
-        conn = sqlite3.connect(database_path)
+        conn = connect_match_db(database_path)
         cursor = conn.cursor()
         
         try:
             # Find hjemmeholdet (første hold der optræder i databasen)
             cursor.execute("""
-                SELECT DISTINCT Team_initials 
+                SELECT Team_initials 
                 FROM game_events 
                 WHERE Team_initials IS NOT NULL 
-                ORDER BY Time 
+                GROUP BY Team_initials 
+                ORDER BY MIN(time_seconds) 
                 LIMIT 1
             """)
             home_team_row = cursor.fetchone()
@@ -570,20 +694,13 @@ def get_final_score(database_path: str) -> Tuple[int, int]:
                 logger.error(f"Kunne ikke identificere hjemmeholdet i {database_path}")
                 return (0, 0)
 
-            # Tæl faktiske mål for hvert hold
+            # Tæl faktiske mål for hvert hold fra det partielle indeks på is_goal
             cursor.execute("""
                 SELECT 
-                    SUM(CASE 
-                        WHEN Team_initials = ? AND (Action_1 = 'Mål' OR Action_1 = 'Mål på straffe') 
-                        THEN 1 ELSE 0 
-                    END) as home_goals,
-                    SUM(CASE 
-                        WHEN Team_initials != ? AND Team_initials IS NOT NULL 
-                        AND (Action_1 = 'Mål' OR Action_1 = 'Mål på straffe')
-                        THEN 1 ELSE 0 
-                    END) as away_goals
+                    SUM(CASE WHEN Team_initials = ? THEN 1 ELSE 0 END) as home_goals,
+                    SUM(CASE WHEN Team_initials != ? THEN 1 ELSE 0 END) as away_goals
                 FROM game_events
-                WHERE Action_1 IS NOT NULL
+                WHERE is_goal = 1
             """, (home_team, home_team))
             
             goal_counts = cursor.fetchone()
@@ -617,7 +734,7 @@ def get_match_details(db_path: str) -> Dict:
     Henter detaljerede kampinformationer fra alle relevante tabeller.
     """
     try:
-        with sqlite3.connect(db_path) as conn:
+        with connect_match_db(db_path) as conn:
             cursor = conn.cursor()
             
             # Hent grundlæggende kampinfo fra match_data
@@ -659,16 +776,14 @@ def get_match_details(db_path: str) -> Dict:
                 home_name = format_team_name(home_team)
                 away_name = format_team_name(away_team)
             
-            # Beregn skudstatistik fra game_events
+            # Beregn skudstatistik fra det partielle indeks på is_shot
             cursor.execute("""
                 SELECT 
                     Team_initials,
-                    COUNT(CASE WHEN Action_1 IN ('Mål', 'Mål på straffe', 
-                        'Skud reddet', 'Skud forbi', 'Skud på stolpe', 'Skud blokeret')
-                        THEN 1 END) as shots,
-                    COUNT(CASE WHEN Action_1 = 'Skud reddet' THEN 1 END) as saves
+                    COUNT(*) as shots,
+                    SUM(is_save) as saves
                 FROM game_events
-                WHERE Team_initials IS NOT NULL
+                WHERE is_shot = 1 AND Team_initials IS NOT NULL
                 GROUP BY Team_initials
             """)
             
@@ -730,6 +845,11 @@ def index():
             logger.error(f"Databases mappe ikke fundet: {databases_dir}")
             return render_template('index.html', matches=[])
         
+        # Er den samlede database slået til og opdateret, er alle kampe én forespørgsel
+        league_db_path = get_league_db_path()
+        if use_league_db(league_db_path, databases_dir):
+            return render_template('index.html', matches=get_matches_from_league_db(league_db_path))
+        
         for db_file in os.listdir(databases_dir):
             if not db_file.endswith('.db') or db_file == 'team_mapping.db':
                 continue
@@ -790,11 +910,11 @@ def match_details(database):
             return "Kunne ikke hente kampdetaljer", 500
         
         # Hent kampbegivenheder
-        with sqlite3.connect(db_path) as conn:
+        with connect_match_db(db_path) as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT * FROM game_events 
-                ORDER BY CAST(REPLACE(REPLACE(Time, ':', ''), '.', '') AS INTEGER)
+                ORDER BY time_seconds
             """)
             columns = [col[0] for col in cursor.description]
             events = [dict(zip(columns, row)) for row in cursor.fetchall()]